@@ -22,4 +22,5 @@ from .index import *  # noqa
 from .info import *  # noqa
 from .results import *  # noqa
 from .runs import *  # noqa
+from .trends import *  # noqa
 from .users import *  # noqa
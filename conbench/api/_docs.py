@@ -66,6 +66,7 @@ spec.components.response("201", {"description": "Created"})
 spec.components.response("202", {"description": "No Content (accepted)"})
 spec.components.response("204", {"description": "No Content (success)"})
 spec.components.response("302", {"description": "Found"})
+spec.components.response("304", {"description": "Not Modified"})
 spec.components.response("400", _error("Bad Request", ex.API_400, "ErrorBadRequest"))
 spec.components.response("401", _error("Unauthorized", ex.API_401, "Error"))
 spec.components.response("404", _error("Not Found", ex.API_404, "Error"))
@@ -91,6 +92,12 @@ spec.components.response(
     "HistoryList",
     _200_ok({"data": [ex.HISTORY_ENTITY], "metadata": {"next_page_cursor": None}}),
 )
+spec.components.response(
+    "HistoryBatchList", _200_ok({"data": {"some-hexdigest": ex.HISTORY_ENTITY}})
+)
+spec.components.response(
+    "HistoryPercentiles", _200_ok({"data": ex.HISTORY_PERCENTILES_ENTITY})
+)
 spec.components.response("InfoEntity", _200_ok(ex.INFO_ENTITY))
 spec.components.response("HardwareEntity", _200_ok(ex.HARDWARE_ENTITY))
 spec.components.response("HardwareList", _200_ok([ex.HARDWARE_ENTITY]))
@@ -104,6 +111,10 @@ spec.components.response(
     "RunList", _200_ok({"data": ex.RUN_LIST, "metadata": {"next_page_cursor": None}})
 )
 spec.components.response("RunCreated", _201_created({}))
+spec.components.response(
+    "TrendList",
+    _200_ok({"data": [ex.TREND_ENTITY], "metadata": {"bmrt_cache_generation": 42}}),
+)
 spec.components.response("UserEntity", _200_ok(ex.USER_ENTITY))
 spec.components.response("UserList", _200_ok(ex.USER_LIST))
 spec.components.response("UserCreated", _201_created(ex.USER_ENTITY))
@@ -121,6 +132,7 @@ tags = [
     {"name": "History", "description": "Benchmark history"},
     {"name": "Hardware", "description": "Benchmark hardware"},
     {"name": "Runs", "description": "Benchmark runs"},
+    {"name": "Trends", "description": "Recent benchmark trends"},
     {"name": "Ping", "description": "Monitor status"},
 ]
 
@@ -608,8 +608,27 @@ HISTORY_ENTITY = _api_history_entity(
     "some run name",
     "some-hexdigest",
 )
+HISTORY_PERCENTILES_ENTITY = {
+    "history_fingerprint": "some-hexdigest",
+    "count": 42,
+    "min": 1.5,
+    "max": 2.75,
+    "quantiles": {"0.5": 2.0, "0.9": 2.25, "0.99": 2.5},
+    "outlier_bounds": [-0.5, 4.5],
+}
 INFO_ENTITY = _api_info_entity("some-info-uuid-1")
 HARDWARE_ENTITY = _api_hardware_entity("some-machine-uuid-1", "some-machine-name")
+TREND_ENTITY = {
+    "benchmark_name": "file-write",
+    "case_id": "some-case-uuid-1",
+    "context_id": "some-context-uuid-1",
+    "hardware_checksum": "some-hardware-checksum",
+    "n_points": 42,
+    "slope": 0.25,
+    "ordinate": 2.5,
+    "relative_change": 0.1,
+    "r_squared": 0.8,
+}
 RUN_ENTITY_WITH_BASELINES = _api_run_entity(
     "some-run-uuid-1",
     {"arbitrary": "tags"},
@@ -1,20 +1,36 @@
 import datetime
 import functools
-from io import BytesIO
-from typing import List
+import io
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, cast
 
+import flask as f
+import marshmallow
 import orjson
 import pandas as pd
-from flask import send_file
+import pyarrow
+import pyarrow.ipc
+import pyarrow.parquet
 
 import conbench.numstr
+import conbench.outlier
 from conbench.buildinfo import BUILD_INFO
 from conbench.config import Config
 
 from ..api import rule
+from ..api._docs import spec
 from ..api._endpoint import ApiEndpoint, maybe_login_required
 from ..entities._entity import NotFound
-from ..entities.history import HistorySample, get_history_for_benchmark
+from ..entities.benchmark_result import BenchmarkResult
+from ..entities.history import (
+    HistorySample,
+    HistoryWindow,
+    get_history_for_benchmark,
+    get_history_for_fingerprint,
+    get_history_for_fingerprints,
+    get_history_sketch,
+)
+from ..entities.history_version import HistoryVersion
+from ..types import TBenchmarkName
 from ._resp import json_response_for_byte_sequence
 
 
@@ -32,10 +48,21 @@ class HistoryEntityAPI(ApiEndpoint):
             commit. More details about this analysis can be found at
             https://conbench.github.io/conbench/pages/lookback_zscore.html.
 
-            Though the response has pagination metadata, pagination is not currently
-            implemented. All matching results will be returned in one page.
+            By default, all matching results are returned in one page (in no
+            particular order). If any of the `earliest_commit_timestamp`,
+            `latest_commit_timestamp`, `cursor` or `page_size` query parameters is
+            provided, results are returned in commit timestamp order (old to new;
+            ties broken by result ID). The lookback z-score analysis always considers
+            the complete history.
+
+            The response carries a (weak) `ETag` header that changes whenever the
+            history changes (a matching result is created or deleted, or change
+            annotations are edited). Conditional requests (`If-None-Match`) are
+            answered with 304 Not Modified if the history did not change.
         responses:
             "200": "HistoryList"
+            "304": "304"
+            "400": "400"
             "401": "401"
             "404": "404"
         parameters:
@@ -43,25 +70,328 @@ class HistoryEntityAPI(ApiEndpoint):
             in: path
             schema:
                 type: string
+          - in: query
+            name: earliest_commit_timestamp
+            schema:
+              type: string
+              format: date-time
+            description: |
+                Return only results for commits authored at or after this time
+                (interpreted as UTC if no timezone is given).
+          - in: query
+            name: latest_commit_timestamp
+            schema:
+              type: string
+              format: date-time
+            description: |
+                Return only results for commits authored at or before this time
+                (interpreted as UTC if no timezone is given).
+          - in: query
+            name: cursor
+            schema:
+              type: string
+              nullable: true
+            description: |
+                A cursor for pagination through matching results in commit timestamp
+                order.
+
+                To get the first page of results, leave out this query parameter or
+                submit `null`. The response's `metadata` key will contain a
+                `next_page_cursor` key, which will contain the cursor to provide to this
+                query parameter in order to get the next page. (If there is expected to
+                be no data in the next page, the `next_page_cursor` will be `null`.)
+          - in: query
+            name: page_size
+            schema:
+              type: integer
+              minimum: 1
+              maximum: 10000
+            description: |
+                The size of pages for pagination (see `cursor`). Default: no
+                pagination. Max 10000.
+          - in: query
+            name: fields
+            schema:
+              type: string
+            description: |
+                Comma-separated list of the keys to include in each returned result
+                object (e.g. `benchmark_result_id,commit_timestamp,single_value_summary`).
+                Default: all keys.
         tags:
           - History
         """
+        window = None
+        if any(
+            f.request.args.get(name)
+            for name in (
+                "earliest_commit_timestamp",
+                "latest_commit_timestamp",
+                "cursor",
+                "page_size",
+            )
+        ):
+            window = self._history_window_from_args()
+
+        fields = None
+        if fields_arg := f.request.args.get("fields"):
+            fields = set(fields_arg.split(","))
+            if unknown := fields - HistorySample.api_json_keys():
+                self.abort_400_bad_request(
+                    f"fields: unknown key(s): {', '.join(sorted(unknown))}"
+                )
+
+        try:
+            result = BenchmarkResult.one(id=benchmark_result_id)
+        except NotFound:
+            self.abort_404_not_found()
+
+        # The response only depends on the version of the history (and on
+        # the request URL).
+        etag = "history-{}-{}".format(
+            result.history_fingerprint, HistoryVersion.get(result.history_fingerprint)
+        )
+        if f.request.if_none_match.contains_weak(etag):
+            resp = f.Response(status=304)
+            resp.set_etag(etag, weak=True)
+            return resp
+
         # TODO: think about the case where samples if of zero length. Can this
         # happen? If it can happen: which response would we want to emit to the
         # HTTP client? An empty array, or something more convenient?
+        samples = get_history_for_fingerprint(
+            result.history_fingerprint,
+            cast(TBenchmarkName, str(result.case.name)),
+            window,
+        )
+
+        next_page_cursor = None
+        if window is not None and window.limit and len(samples) == window.limit:
+            # As in other endpoints, if the last page happens to have exactly
+            # page_size results, the client will grab one more (empty) page.
+            last = samples[-1]
+            next_page_cursor = (
+                f"{last.commit_timestamp.isoformat()},{last.benchmark_result_id}"
+            )
+
+        jsonbytes: bytes = orjson.dumps(
+            {
+                "data": [s._dict_for_api_json(fields) for s in samples],
+                "metadata": {"next_page_cursor": next_page_cursor},
+            },
+            option=orjson.OPT_INDENT_2,
+        )
+        resp = json_response_for_byte_sequence(jsonbytes, 200)
+        resp.set_etag(etag, weak=True)
+        return resp
+
+    def _history_window_from_args(self) -> HistoryWindow:
+        window = HistoryWindow()
+
+        for name in ("earliest_commit_timestamp", "latest_commit_timestamp"):
+            if arg := f.request.args.get(name):
+                try:
+                    setattr(window, name, _parse_commit_timestamp(arg))
+                except ValueError:
+                    self.abort_400_bad_request(f"{name}: invalid ISO 8601 timestamp")
+
+        cursor_arg = f.request.args.get("cursor")
+        if cursor_arg and cursor_arg != "null":
+            ts_str, _, result_id = cursor_arg.partition(",")
+            try:
+                window.after = (_parse_commit_timestamp(ts_str), result_id)
+                assert result_id
+            except (ValueError, AssertionError):
+                self.abort_400_bad_request("invalid cursor")
+
+        if page_size_arg := f.request.args.get("page_size"):
+            try:
+                window.limit = int(page_size_arg)
+                assert 1 <= window.limit <= 10000
+            except Exception:
+                self.abort_400_bad_request(
+                    "page_size must be a positive integer no greater than 10000"
+                )
+
+        return window
+
+
+def _parse_commit_timestamp(value: str) -> datetime.datetime:
+    """
+    Parse ISO 8601 timestamp into a tz-naive datetime object representing UTC
+    (as Commit.timestamp does). Raise ValueError.
+    """
+    ts = pd.Timestamp(value)
+    if ts is pd.NaT:
+        raise ValueError(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return ts.to_pydatetime()
+
+
+# Upper bound for the number of history fingerprints in one batch request.
+HISTORY_BATCH_MAX_FINGERPRINTS = 100
+
+
+class HistoryBatchSchema(marshmallow.Schema):
+    history_fingerprints = marshmallow.fields.List(
+        marshmallow.fields.String(),
+        required=True,
+        validate=marshmallow.validate.Length(min=1, max=HISTORY_BATCH_MAX_FINGERPRINTS),
+        metadata={
+            "description": (
+                "The history fingerprints to get the history for "
+                f"(at most {HISTORY_BATCH_MAX_FINGERPRINTS})."
+            )
+        },
+    )
+
+
+class HistoryBatchAPI(ApiEndpoint):
+    schema = HistoryBatchSchema()
+
+    @maybe_login_required
+    def post(self):
+        """
+        ---
+        description: |
+            Get the histories of many history fingerprints in one request.
+
+            For each given history fingerprint, the response's `data` object
+            contains a key with the list of error-free benchmark results on the
+            default branch that have this history fingerprint (in no particular
+            order; possibly empty), in the format of `GET /api/history/<id>/`,
+            including the results of the lookback z-score analysis.
+        responses:
+            "200": "HistoryBatchList"
+            "400": "400"
+            "401": "401"
+        requestBody:
+            content:
+                application/json:
+                    schema: HistoryBatch
+        tags:
+          - History
+        """
+        data = self.validate(self.schema)
+        # Deduplicate, keep order.
+        fingerprints = list(dict.fromkeys(data["history_fingerprints"]))
+
+        samples_by_fp = get_history_for_fingerprints(fingerprints)
+
+        def generate():
+            # Serialize (and emit) one history at a time instead of building
+            # the complete (potentially large) response in memory.
+            yield b'{"data": {'
+            for i, fp in enumerate(fingerprints):
+                if i:
+                    yield b", "
+                yield orjson.dumps(fp)
+                yield b": "
+                yield orjson.dumps(
+                    [s._dict_for_api_json() for s in samples_by_fp.get(fp, [])]
+                )
+            yield b"}}"
+
+        return f.Response(generate(), status=200, mimetype="application/json")
+
+
+# Default for the `quantiles` query parameter of the percentiles endpoint.
+HISTORY_PERCENTILES_DEFAULT_QUANTILES = "0.5,0.9,0.99"
+
+
+class HistoryPercentilesAPI(ApiEndpoint):
+    @maybe_login_required
+    def get(self, benchmark_result_id):
+        """
+        ---
+        description: |
+            Get percentiles of the single value summaries of all error-free
+            benchmark results on the default branch that match the given benchmark
+            result's history fingerprint (the results of `GET /api/history/<id>/`).
+
+            The percentiles are estimated from a quantile sketch (t-digest) that is
+            maintained as results are submitted, i.e. without reading the history.
+            They are exact for histories of up to about 60 results; beyond that,
+            the rank error is a small fraction of a percent.
+
+            `outlier_bounds` are the bounds outside of which a result is more than
+            10 interquartile ranges away from the median (as used for outlier
+            filtering).
+
+            For an empty history, `count` is 0 and all values are null. Like
+            `GET /api/history/<id>/`, the response carries a (weak) `ETag` header.
+        responses:
+            "200": "HistoryPercentiles"
+            "304": "304"
+            "400": "400"
+            "401": "401"
+            "404": "404"
+        parameters:
+          - name: benchmark_result_id
+            in: path
+            schema:
+                type: string
+          - in: query
+            name: quantiles
+            schema:
+              type: string
+            description: |
+                Comma-separated list of the quantiles to return (each between 0
+                and 1). Default: `0.5,0.9,0.99` (p50, p90, p99).
+        tags:
+          - History
+        """
+        quantiles_arg = (
+            f.request.args.get("quantiles") or HISTORY_PERCENTILES_DEFAULT_QUANTILES
+        )
+        try:
+            quantiles = [float(q) for q in quantiles_arg.split(",")]
+            assert all(0 <= q <= 1 for q in quantiles)
+        except (ValueError, AssertionError):
+            self.abort_400_bad_request(
+                "quantiles must be a comma-separated list of numbers between 0 and 1"
+            )
+
         try:
-            samples = get_history_for_benchmark(benchmark_result_id=benchmark_result_id)
+            result = BenchmarkResult.one(id=benchmark_result_id)
         except NotFound:
             self.abort_404_not_found()
 
+        etag = "history-percentiles-{}-{}".format(
+            result.history_fingerprint, HistoryVersion.get(result.history_fingerprint)
+        )
+        if f.request.if_none_match.contains_weak(etag):
+            resp = f.Response(status=304)
+            resp.set_etag(etag, weak=True)
+            return resp
+
+        sketch = get_history_sketch(result.history_fingerprint)
+
+        def _float_or_none(value: float) -> Optional[float]:
+            return float(value) if sketch.count else None
+
         jsonbytes: bytes = orjson.dumps(
             {
-                "data": [s._dict_for_api_json() for s in samples],
-                "metadata": {"next_page_cursor": None},
+                "data": {
+                    "history_fingerprint": result.history_fingerprint,
+                    "count": sketch.count,
+                    "min": _float_or_none(sketch.min),
+                    "max": _float_or_none(sketch.max),
+                    "quantiles": {
+                        f"{q:g}": _float_or_none(v)
+                        for q, v in zip(quantiles, sketch.quantiles(quantiles))
+                    },
+                    "outlier_bounds": [
+                        _float_or_none(b)
+                        for b in conbench.outlier.iqrdist_bounds_from_sketch(sketch)
+                    ],
+                }
             },
             option=orjson.OPT_INDENT_2,
         )
-        return json_response_for_byte_sequence(jsonbytes, 200)
+        resp = json_response_for_byte_sequence(jsonbytes, 200)
+        resp.set_etag(etag, weak=True)
+        return resp
 
 
 class HistoryDownloadAPI(ApiEndpoint):
@@ -69,9 +399,17 @@ class HistoryDownloadAPI(ApiEndpoint):
     def get(self, benchmark_result_id):
         """
         ---
-        description: Download time series
+        description: |
+            Download time series (the current full history of the given benchmark
+            result).
+
+            The file is streamed. Formats: `csv` (default; metadata in `#`-prefixed
+            header lines), `parquet` (Apache Parquet) or `arrow` (Apache Arrow IPC
+            stream format). For the latter two, the metadata is a JSON document in
+            the `conbench` key of the schema metadata.
         responses:
             "200": "HistoryList"
+            "400": "400"
             "401": "401"
             "404": "404"
         parameters:
@@ -79,9 +417,21 @@ class HistoryDownloadAPI(ApiEndpoint):
             in: path
             schema:
                 type: string
+          - in: query
+            name: format
+            schema:
+              type: string
+              enum: [csv, parquet, arrow]
+            description: The file format. Default `csv`.
         tags:
           - History
         """
+        fmt = f.request.args.get("format") or "csv"
+        if fmt not in HISTORY_DOWNLOAD_FORMATS:
+            self.abort_400_bad_request(
+                f"format must be one of: {', '.join(HISTORY_DOWNLOAD_FORMATS)}"
+            )
+
         # TODO: think about the case where samples if of zero length. Can this
         # happen? If it can happen: which response would we want to emit to the
         # HTTP client? An empty array, or something more convenient?
@@ -90,21 +440,24 @@ class HistoryDownloadAPI(ApiEndpoint):
         except NotFound:
             self.abort_404_not_found()
 
-        csv_buf = generate_csv_history_for_result(benchmark_result_id, items)
+        mimetype, extension, generate = HISTORY_DOWNLOAD_FORMATS[fmt]
 
-        return send_file(
-            csv_buf,
-            as_attachment=True,
+        resp = f.Response(generate(benchmark_result_id, items), mimetype=mimetype)
+        resp.headers.set(
+            "Content-Disposition",
+            "attachment",
             # Use a history fingerprint here that represents what all data
             # points in this series have in common: benchmark name, case perm,
             # hardware, context, repo.
-            download_name=f"conbench-history-{items[0].benchmark_name}-{items[0].history_fingerprint}.csv",
-            mimetype="text/csv",
+            filename=f"conbench-history-{items[0].benchmark_name}-{items[0].history_fingerprint}.{extension}",
         )
+        return resp
 
 
 history_entity_view = HistoryEntityAPI.as_view("history")
 history_download_endpoint = HistoryDownloadAPI.as_view("history-download")
+history_batch_endpoint = HistoryBatchAPI.as_view("history-batch")
+history_percentiles_endpoint = HistoryPercentilesAPI.as_view("history-percentiles")
 
 rule(
     "/history/download/<benchmark_result_id>/",
@@ -113,37 +466,47 @@ rule(
 )
 
 
+rule(
+    "/history/percentiles/<benchmark_result_id>/",
+    view_func=history_percentiles_endpoint,
+    methods=["GET"],
+)
+
+
+rule(
+    "/history/batch/",
+    view_func=history_batch_endpoint,
+    methods=["POST"],
+)
+
+
 rule(
     "/history/<benchmark_result_id>/",
     view_func=history_entity_view,
     methods=["GET"],
 )
 
+spec.components.schema("HistoryBatch", schema=HistoryBatchSchema)
+
 # deduplicate: move to conbench.numstr
 numstr8 = functools.partial(conbench.numstr.numstr, sigfigs=8)
 
 
-def generate_csv_history_for_result(
-    input_result_id: str, items: List[HistorySample]
-) -> BytesIO:
+# Number of rows rendered (and emitted) at a time when streaming a history
+# download.
+HISTORY_DOWNLOAD_CHUNK_ROWS = 10000
+
+
+def _history_df(items: List[HistorySample]) -> pd.DataFrame:
     """
     input from `get_history_for_benchmark()`. Intrinsics of that function
     matter a lot; read its docstring and code. For example, two important
     aspects about that func: - results for default branch only - order is not
     guaranteed in returned collection.
 
-    Specification for this endpoint: Download current full history including
-    the benchmark result provided via ID.
-
-    Think: read the history fingerprint from result with given ID, get all
-    results with the same history fingerprint; construct a data file from
-    it. That file contains data for each result, but also meta data - about the
-    system emitting the file - that all results have in common
-
-    Highly experimental interface. Will change/add: file format (think: HDF5,
-    ...), set of columns, etc.
+    Return a dataframe with one row per result, indexed (and sorted) by commit
+    time.
     """
-
     assert len(items) > 0
 
     # Note that this might start to have similarities to the dataframe aspects
@@ -171,42 +534,175 @@ def generate_csv_history_for_result(
     # Sort by time. old -> new
     df = df.sort_index()
     df.index.rename("commit_time", inplace=True)
+    return df
 
+
+def _history_file_metadata(
+    input_result_id: str, items: List[HistorySample]
+) -> Dict[str, str]:
+    """
+    Meta data about the system emitting the file, and about what all results
+    in the history have in common.
+    """
     now_iso = (
         datetime.datetime.now(tz=datetime.timezone.utc)
         .replace(microsecond=0)
         .isoformat()
     )
+    return {
+        "original_url": f"{Config.INTENDED_BASE_URL}api/history/download/{input_result_id}",
+        "conbench_commit": BUILD_INFO.commit,
+        "generated_at": now_iso,
+        "result_id": input_result_id,
+        "benchmark_name": items[0].benchmark_name,
+        "case_permutation": items[0].case_text_id,
+        "hardware_hash": items[0].hardware_hash,
+        "history_fingerprint": items[0].history_fingerprint,
+        "svs_type": items[0].svs_type,
+    }
+
+
+def generate_csv_history_for_result(
+    input_result_id: str, items: List[HistorySample]
+) -> Iterator[bytes]:
+    """
+    Specification for this endpoint: Download current full history including
+    the benchmark result provided via ID.
+
+    Think: read the history fingerprint from result with given ID, get all
+    results with the same history fingerprint; construct a data file from
+    it. That file contains data for each result, but also meta data - about the
+    system emitting the file - that all results have in common
 
-    buf = BytesIO()
+    Highly experimental interface. Will change/add: set of columns, etc.
 
-    # buf.write(f"# generated by conbench {BUILD_INFO.commit}\n".encode("utf-8"))
-    # buf.write(f)
+    Emit the file in chunks of `HISTORY_DOWNLOAD_CHUNK_ROWS` rows (the text
+    representation of large histories is never in memory as a whole).
+    """
+    df = _history_df(items)
+    meta = _history_file_metadata(input_result_id, items)
 
     # We should expose all relevant meta data about this time series.
     # benchmark name, case permutation, hardware, repository, ..
-    # Maybe it makes sense to emit HDF5 or parquet or any other file format
-    # that is better at storing meta data. But here we just get going now.
+    # See the parquet and arrow formats for a more structured way.
     header = "\n".join(
         [
-            f"# original URL: {Config.INTENDED_BASE_URL}api/history/download/{input_result_id}",
-            f"# generated by conbench, commit {BUILD_INFO.commit}",
-            f"# generated at {now_iso}",
+            f"# original URL: {meta['original_url']}",
+            f"# generated by conbench, commit {meta['conbench_commit']}",
+            f"# generated at {meta['generated_at']}",
             f"# for result {input_result_id}",
-            f"# benchmark name: {items[0].benchmark_name}",
-            f"# case permutation: {items[0].case_text_id}",
-            f"# hardware hash: {items[0].hardware_hash}",
-            f"# history fingerprint: {items[0].history_fingerprint}",
-            f"# single value summary (SVS) type: {items[0].svs_type}",
+            f"# benchmark name: {meta['benchmark_name']}",
+            f"# case permutation: {meta['case_permutation']}",
+            f"# hardware hash: {meta['hardware_hash']}",
+            f"# history fingerprint: {meta['history_fingerprint']}",
+            f"# single value summary (SVS) type: {meta['svs_type']}",
         ]
     )
+    yield header.encode("utf-8") + b"\n"
+
+    for start in range(0, len(df), HISTORY_DOWNLOAD_CHUNK_ROWS):
+        end = start + HISTORY_DOWNLOAD_CHUNK_ROWS
+        chunk = df.iloc[start:end]
+        yield chunk.to_csv(
+            header=start == 0, na_rep="NaN", float_format=numstr8
+        ).encode("utf-8")
 
-    buf.write(header.encode("utf-8"))
-    buf.write(b"\n")
 
-    df.to_csv(buf, na_rep="NaN", float_format=numstr8, encoding="utf-8")
+def generate_parquet_history_for_result(
+    input_result_id: str, items: List[HistorySample]
+) -> Iterator[bytes]:
+    """
+    Like `generate_csv_history_for_result()`, but emit a (zstd-compressed)
+    Apache Parquet file (one row group per chunk), with the meta data as JSON
+    document in the `conbench` key of the schema metadata.
+    """
+    table = _history_arrow_table(input_result_id, items)
+    sink = _ChunkSink()
+    with pyarrow.parquet.ParquetWriter(
+        sink, table.schema, compression="zstd"
+    ) as writer:
+        for start in range(0, table.num_rows, HISTORY_DOWNLOAD_CHUNK_ROWS):
+            writer.write_table(table.slice(start, HISTORY_DOWNLOAD_CHUNK_ROWS))
+            yield sink.take()
+    # Footer.
+    yield sink.take()
+
+
+def generate_arrow_history_for_result(
+    input_result_id: str, items: List[HistorySample]
+) -> Iterator[bytes]:
+    """
+    Like `generate_parquet_history_for_result()`, but emit the Apache Arrow
+    IPC stream format (one zstd-compressed record batch per chunk).
+    """
+    table = _history_arrow_table(input_result_id, items)
+    sink = _ChunkSink()
+    with pyarrow.ipc.new_stream(
+        sink,
+        table.schema,
+        options=pyarrow.ipc.IpcWriteOptions(compression="zstd"),
+    ) as writer:
+        for batch in table.to_batches(max_chunksize=HISTORY_DOWNLOAD_CHUNK_ROWS):
+            writer.write_batch(batch)
+            yield sink.take()
+    # End-of-stream marker.
+    yield sink.take()
+
+
+def _history_arrow_table(
+    input_result_id: str, items: List[HistorySample]
+) -> pyarrow.Table:
+    table = pyarrow.Table.from_pandas(_history_df(items))
+    return table.replace_schema_metadata(
+        {
+            **table.schema.metadata,
+            b"conbench": orjson.dumps(_history_file_metadata(input_result_id, items)),
+        }
+    )
+
 
-    # Make it so that this can be treated as file object, with read() from start.
-    buf.seek(0)
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only file object that hands out what was written since the last call
+    to `take()`. For emitting files written by pyarrow while they are being
+    written. Tracks the position (pyarrow writers use it for offsets).
+    """
 
-    return buf
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+# Supported values for the `format` query parameter of the history download
+# endpoint: (media type, file name extension, generator).
+HISTORY_DOWNLOAD_FORMATS: Dict[
+    str, Tuple[str, str, Callable[[str, List[HistorySample]], Iterator[bytes]]]
+] = {
+    "csv": ("text/csv", "csv", generate_csv_history_for_result),
+    "parquet": (
+        "application/vnd.apache.parquet",
+        "parquet",
+        generate_parquet_history_for_result,
+    ),
+    "arrow": (
+        "application/vnd.apache.arrow.stream",
+        "arrows",
+        generate_arrow_history_for_result,
+    ),
+}
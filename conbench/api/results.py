@@ -13,6 +13,7 @@ from conbench.dbsession import current_session
 from ..api import rule
 from ..api._docs import spec
 from ..api._endpoint import ApiEndpoint, maybe_login_required
+from ..config import Config
 from ..entities._entity import NotFound
 from ..entities.benchmark_result import (
     BenchmarkResult,
@@ -20,6 +21,7 @@ from ..entities.benchmark_result import (
     BenchmarkResultSerializer,
     BenchmarkResultValidationError,
 )
+from ..entities.history import store_z_score_inputs
 from ._resp import json_response_for_byte_sequence, resp400
 
 log = logging.getLogger(__name__)
@@ -307,6 +309,20 @@ class BenchmarkListAPI(ApiEndpoint, BenchmarkValidationMixin):
         except BenchmarkResultValidationError as exc:
             return resp400(str(exc))
 
+        if Config.Z_SCORE_INPUTS_AT_INGEST:
+            # The result is stored already. This is an optimization for
+            # subsequent comparisons: any error here should not fail the HTTP
+            # request processing.
+            try:
+                store_z_score_inputs(benchmark_result)
+            except Exception as exc:
+                log.warning(
+                    "Ignoring error during store_z_score_inputs() for %s: %s",
+                    benchmark_result.id,
+                    exc,
+                )
+                current_session.rollback()
+
         # Rely on the idea that the lookup
         # `benchmark_result.commit_repo_url` always succeeds
         conbench.metrics.COUNTER_BENCHMARK_RESULTS_INGESTED.labels(
@@ -0,0 +1,117 @@
+import flask as f
+import orjson
+
+from ..api import rule
+from ..api._endpoint import ApiEndpoint, maybe_login_required
+from ..bmrt import get_bmrt_cache
+from ..bmrttrends import TREND_DIRECTIONS
+from ._resp import json_response_for_byte_sequence
+
+
+class TrendListAPI(ApiEndpoint):
+    @maybe_login_required
+    def get(self):
+        """
+        ---
+        description: |
+            Get the most-changed time series among the most recently submitted
+            benchmark results (the ones in the BMRT cache, also shown in the
+            benchmark trends UI).
+
+            A time series is defined by benchmark name, case, context and
+            hardware. For each time series with at least 10 data points
+            (after outlier removal) and with a result from the last 30 days
+            (relative to the newest result for the same benchmark name), a
+            least squares linear fit over time is precomputed.
+            `relative_change` is the change of the fit across half of the time
+            range of the series, divided by the value of the fit in the
+            middle of the time range. `r_squared` is the coefficient of
+            determination of the fit.
+        responses:
+            "200": "TrendList"
+            "400": "400"
+            "401": "401"
+        parameters:
+          - in: query
+            name: benchmark_name
+            schema:
+              type: string
+            description: Only consider time series for this benchmark name.
+          - in: query
+            name: direction
+            schema:
+              type: string
+              enum: [increasing, decreasing, absolute]
+            description: |
+                Order by relative change (`increasing`: largest first;
+                `decreasing`: smallest, i.e. most negative, first) or by the
+                absolute value of the relative change (`absolute`, the
+                default; largest first).
+          - in: query
+            name: limit
+            schema:
+              type: integer
+              minimum: 1
+              maximum: 1000
+            description: The maximum number of time series to return. Default 20.
+        tags:
+          - Trends
+        """
+        direction = f.request.args.get("direction") or "absolute"
+        if direction not in TREND_DIRECTIONS:
+            self.abort_400_bad_request(
+                f"direction must be one of: {', '.join(TREND_DIRECTIONS)}"
+            )
+
+        limit_arg = f.request.args.get("limit", 20)
+        try:
+            limit = int(limit_arg)
+            assert 1 <= limit <= 1000
+        except Exception:
+            self.abort_400_bad_request(
+                "limit must be a positive integer no greater than 1000"
+            )
+
+        # Use one cache generation for the whole response.
+        cache = get_bmrt_cache()
+        trends = cache.trends
+        rows = trends.top(limit, direction, f.request.args.get("benchmark_name"))
+
+        data = []
+        for r in rows:
+            bname, case_id, context_id, hardware_checksum = cache.by_4t_frame.keys[
+                trends.series[r]
+            ]
+            data.append(
+                {
+                    "benchmark_name": bname,
+                    "case_id": case_id,
+                    "context_id": context_id,
+                    "hardware_checksum": hardware_checksum,
+                    "n_points": int(trends.n_points[r]),
+                    "slope": float(trends.slope[r]),
+                    "ordinate": float(trends.ordinate[r]),
+                    "relative_change": float(trends.relchange[r]),
+                    "r_squared": float(trends.r_squared[r]),
+                }
+            )
+
+        jsonbytes: bytes = orjson.dumps(
+            {
+                "data": data,
+                "metadata": {"bmrt_cache_generation": cache.generation},
+            },
+            option=orjson.OPT_INDENT_2,
+        )
+        resp = json_response_for_byte_sequence(jsonbytes, 200)
+        resp.headers["ETag"] = cache.etag
+        return resp
+
+
+trend_list_view = TrendListAPI.as_view("trends")
+
+rule(
+    "/trends/",
+    view_func=trend_list_view,
+    methods=["GET"],
+)
@@ -3,21 +3,24 @@ import functools
 import logging
 import math
 import time
-from typing import Dict, List, Tuple, TypedDict, TypeVar
+from typing import Dict, List, Sequence, Tuple, TypedDict
 
 import flask
 import numpy as np
-import numpy.polynomial
 import orjson
-import pandas as pd
 
 import conbench.numstr
 import conbench.units
 from conbench.app import app
 from conbench.app._endpoint import authorize_or_terminate
-from conbench.bmrt import BMRTBenchmarkResult, TBenchmarkName, bmrt_cache
+from conbench.bmrt import (
+    BMRTBenchmarkResult,
+    BMRTCache,
+    ResultList,
+    TBenchmarkName,
+    get_bmrt_cache,
+)
 from conbench.config import Config
-from conbench.outlier import remove_outliers_by_iqrdist
 
 """
 Experimental: UX around 'conceptual benchmarks'
@@ -33,39 +36,54 @@ numstr8 = functools.partial(conbench.numstr.numstr, sigfigs=8)
 log = logging.getLogger(__name__)
 
 
-def newest_of_many_results(results: List[BMRTBenchmarkResult]) -> BMRTBenchmarkResult:
+def newest_of_many_results(
+    results: Sequence[BMRTBenchmarkResult],
+) -> BMRTBenchmarkResult:
+    if isinstance(results, ResultList):
+        # Vectorized, do not build a view object per result.
+        return results[int(np.argmax(results.started_at))]
     return max(results, key=lambda r: r.started_at)
 
 
-def time_of_newest_of_many_results(results: List[BMRTBenchmarkResult]) -> float:
-    return max(r.started_at for r in results)
+def time_of_newest_of_many_results(results: Sequence[BMRTBenchmarkResult]) -> float:
+    return float(np.max(_started_at_array(results)))
 
 
-# Make this function's return type precisely be the type of input `d`, which is
-# often more specific than just Dict.
-GenDict = TypeVar("GenDict")  # the variable name must coincide with the string
+def _started_at_array(results: Sequence[BMRTBenchmarkResult]) -> np.ndarray:
+    if isinstance(results, ResultList):
+        return results.started_at
+    return np.array([r.started_at for r in results], dtype=np.float64)
 
 
-def get_first_n_dict_subset(d: GenDict, n: int) -> GenDict:
-    # A bit of discussion here:
-    # https://stackoverflow.com/a/12980510/145400
-    assert isinstance(d, dict)
-    return {k: d[k] for k in list(d)[:n]}  # type: ignore
+def _bmrt_cache_for_request() -> BMRTCache:
+    """
+    Return the current BMRT cache generation, and expose its entity tag in
+    the response to the current request: the response is derived from this
+    generation only.
+    """
+    cache = get_bmrt_cache()
+
+    @flask.after_this_request
+    def _set_etag(response: flask.Response) -> flask.Response:
+        response.headers["ETag"] = cache.etag
+        return response
+
+    return cache
 
 
 @app.route("/c-benchmarks/", methods=["GET"])  # type: ignore
 @authorize_or_terminate
 def list_benchmarks() -> str:
+    cache = _bmrt_cache_for_request()
+
     # Sort alphabetically by string key
     benchmarks_by_name_sorted_alphabetically = dict(
-        sorted(
-            bmrt_cache["by_benchmark_name"].items(), key=lambda item: item[0].lower()
-        )
+        sorted(cache.by_benchmark_name.items(), key=lambda item: item[0].lower())
     )
 
     newest_result_by_bname: Dict[str, BMRTBenchmarkResult] = {
         bname: newest_of_many_results(bmrlist)
-        for bname, bmrlist in bmrt_cache["by_benchmark_name"].items()
+        for bname, bmrlist in cache.by_benchmark_name.items()
     }
 
     newest_result_for_each_benchmark_name_sorted = [
@@ -79,7 +97,7 @@ def list_benchmarks() -> str:
 
     benchmarks_by_name_sorted_by_resultcount = dict(
         sorted(
-            bmrt_cache["by_benchmark_name"].items(),
+            cache.by_benchmark_name.items(),
             key=lambda item: len(item[1]),
             reverse=True,
         ),
@@ -94,14 +112,10 @@ def list_benchmarks() -> str:
     # rpcr.
     now = time.time()
     benchmark_names_by_rpcr: Dict[str, str] = {}
-    for bname, results in bmrt_cache["by_benchmark_name"].items():
+    for bname, results in cache.by_benchmark_name.items():
         # Generally, there are C case permutations for this benchmark. Group
         # the results by case permutation.
-        results_per_case: Dict[str, List[BMRTBenchmarkResult]] = (
-            collections.defaultdict(list)
-        )
-        for r in results:
-            results_per_case[r.case_id].append(r)
+        results_per_case = results.split_by("case_id")
 
         # Now, build the RPCR metric for each conceptual benchmark.
         rpcr = 0.0
@@ -128,15 +142,15 @@ def list_benchmarks() -> str:
 
     return flask.render_template(
         "c-benchmarks.html",
-        benchmarks_by_name=bmrt_cache["by_benchmark_name"],
-        benchmark_result_count=len(bmrt_cache["by_id"]),
+        benchmarks_by_name=cache.by_benchmark_name,
+        benchmark_result_count=len(cache.by_id),
         benchmarks_by_name_sorted_alphabetically=benchmarks_by_name_sorted_alphabetically,
         benchmarks_by_name_sorted_by_resultcount=benchmarks_by_name_sorted_by_resultcount,
         benchmark_names_by_rpcr_sorted=benchmark_names_by_rpcr_sorted,
         newest_result_for_each_benchmark_name_topN=newest_result_for_each_benchmark_name_sorted[
             :20
         ],
-        bmr_cache_meta=bmrt_cache["meta"],
+        bmr_cache_meta=cache.meta,
         application=Config.APPLICATION_NAME,
         title=Config.APPLICATION_NAME,  # type: ignore
     )
@@ -145,153 +159,36 @@ def list_benchmarks() -> str:
 @app.route("/c-benchmarks/<bname>/trends", methods=["GET"])  # type: ignore
 @authorize_or_terminate
 def show_trends_for_benchmark(bname: TBenchmarkName) -> str:
-    # Narrow down relevant dataframes.
-    dfs_by_t3: Dict[Tuple[str, str, str], pd.DataFrame] = {}
-    for (ibname, case_id, context_id, hardware_checksum), df in bmrt_cache[
-        "by_4t_df"
-    ].items():
-        if ibname == bname:
-            dfs_by_t3[(case_id, context_id, hardware_checksum)] = df
-
-    log.info("built dfs_by_t3, len: %s", len(dfs_by_t3))
-
-    # This might be one of the most inefficient methods to get the point of
-    # time of the newest result, but shrug for now.
-    t_newest = time_of_newest_of_many_results(bmrt_cache["by_benchmark_name"][bname])
-
-    # Do this trend analysis only for those timeseries that are recent.
-    # Criterion here for now: simple cutoff relative to the time of the newest
-    # result for this conceptual benchmark.
-
-    reftime = t_newest
-    relchange_by_t3: Dict[Tuple[str, str, str], float] = {}
-
-    # Note that below we operate on one DF per each of T timeseries. We call
-    # remove_outliers_by_iqrdist() and Polynomial.fit() T times, and create
-    # many copies of smallish dataframes. It is probably a lot faster by
-    # preparing one tidy dataframe that then does outlier removal as well as
-    # linear fit in "one line of Python", for each column in the df.
-    for t3, df in dfs_by_t3.items():
-        # Note(JP): make a linear regression: derive a slope value. this is
-        # mainly about the sign of the slope. that means: we can work with the
-        # absolute t/time values we have. for the y values the goal is to make
-        # change comparable across different scenarios. Not across different
-        # units, though.
-        #
-        # Interesting: benchmark result time distribution vs. commit
-        # distribution over time. assume that code evolution is highly
-        # correlated with benchmark start time evolution.
-
-        # Ignore df rows in here where results reported SVS being NAN.
-        # Update: do this later below where we have to dropna anyway.
-        # df = df[df["svs"].notna()]
-
-        # count(): number of non-NaN values
-        if df["svs"].count() < 10:
-            # Skip if there's little history anyway.
-            continue
-
-        # Recency criterion.
-        newest_timestamp = df.index[-1].timestamp()
-        if reftime - newest_timestamp > 86400 * 30:
-            continue
-
-        # TODO: basic outlier detection before the fit.
-        # Either rolling window median based, or maybe
-        # huber loss https://stackoverflow.com/a/61144766
-
-        # Did some of that before here:
-        # https://github.com/jgehrcke/covid-19-analysis/blob/4950649a27c51c2bf36baba258757249385f2808/process.py#L227
-        # it's a bit of a seemingly complex(?) converstion from pd
-        # datetimeindex back to float values. Remove 10^15 from these
-        # nanoseconds-since-epoch to make the numeric values a little less
-        # extreme for printing/debugging.
-
-        # Do not modify dataframe objects in BMRT cache.
-        df = df.copy()
-        remove_outliers_by_iqrdist(df, "svs")
-
-        # Now it's important to drop nans again because the outliers have been
-        # marked with NaN, and the linear regression method chosen below does
-        # not tolerate NaN in input.
-        df = df.dropna()
-        if len(df.index) < 10:
-            # Skip if after outlier removal there's little history left.
-            continue
-
-        # The .astype(float) conversion from a pandas DateTimeIndex yields
-        # numbers proportional to time, but not in unit 'seconds'. The division
-        # is not necessary for obtaining a meaningful fit. It's just so that
-        # numbers are not so huge when printing/debugging. Also see
-        # https://stackoverflow.com/a/46501718
-        tfloats = df.index.values.astype(float)  # / 10**15
-        yfloats = df["svs"].values
-
-        # Least squares linear fit using modern numpy API.
-        fitted_series = numpy.polynomial.Polynomial.fit(tfloats, yfloats, 1)
-
-        # print(fitted_series)
-        # https://numpy.org/doc/stable/reference/generated/numpy.polynomial.polynomial.Polynomial.fit.html#numpy.polynomial.polynomial.Polynomial.fit
-        slope, ordinate = fitted_series.coef[1], fitted_series.coef[0]
-        # print(slope, ordinate)
-
-        # these values might be nan if the fit failed. if the input has a
-        # nan then the fit fails: clean the input! But even then maybe the
-        # fit might fail? Looks like nan has high sort order.
-        # check for this value upon data emission? No.
-        if math.isnan(slope):
-            continue
-
-        # Do a 'normalization' here to find _relative change_. For the offset
-        # use data from the linear fit (the constant part of the linearity).
-        # Think: the smaller most of the values are, the _more_ does the _same_
-        # slope reflect relative change.
-        relchange = slope / ordinate
-        #  print(f"slope: {slope}")
-        relchange_by_t3[t3] = relchange
-
-    # sort by relative change, largest first.
-    relchange_by_t3_sorted_inctrend: Dict[Tuple[str, str, str], float] = dict(
-        sorted(
-            relchange_by_t3.items(),
-            key=lambda item: item[1],
-            reverse=True,
-        )
-    )
-
-    relchange_by_t3_sorted_decrtrend: Dict[Tuple[str, str, str], float] = dict(
-        sorted(
-            relchange_by_t3.items(),
-            key=lambda item: item[1],
-            reverse=False,
-        )
-    )
-
-    log.info("made %s linear regressions", len(relchange_by_t3))
-
-    # for t3, relchange in relchange_by_t3_sorted.items():
-    #     print(t3, ": ", relchange)
+    cache = _bmrt_cache_for_request()
 
     context_json_by_context_id: Dict[str, str] = {}
     case_json_by_case_id: Dict[str, str] = {}
     infos_for_uplots_incrtrend: Dict[str, TypeUIPlotInfo]
     infos_for_uplots_decrtrend: Dict[str, TypeUIPlotInfo]
 
-    # Input type equals output type, yeah
-    topn_t3_dict_incr = get_first_n_dict_subset(relchange_by_t3_sorted_inctrend, 15)
-    topn_t3_dict_decr = get_first_n_dict_subset(relchange_by_t3_sorted_decrtrend, 15)
+    # Outlier removal and the linear fits were done for all timeseries at once
+    # when this cache generation was built (see conbench/bmrttrends.py). Only
+    # timeseries that are recent (relative to the newest result for this
+    # conceptual benchmark) have a trend. Largest relative change first, and
+    # smallest (most negative) relative change first.
+    topn_t3_dict_incr = _relchange_by_t3(
+        cache, cache.trends.top(15, "increasing", bname)
+    )
+    topn_t3_dict_decr = _relchange_by_t3(
+        cache, cache.trends.top(15, "decreasing", bname)
+    )
 
     # topn_t3 = list(relchange_by_t3_sorted.keys())[:6]
     # log.info("topn for plot: %s", topn_t3_dict_incr)
 
     infos_for_uplots_incrtrend, ctd, cased = _build_plotinfo_from_topnt3_dict(
-        bname, topn_t3_dict_incr
+        cache, bname, topn_t3_dict_incr
     )
     context_json_by_context_id |= ctd
     case_json_by_case_id |= cased
 
     infos_for_uplots_decrtrend, ctd, cased = _build_plotinfo_from_topnt3_dict(
-        bname, topn_t3_dict_decr
+        cache, bname, topn_t3_dict_decr
     )
     context_json_by_context_id |= ctd
     case_json_by_case_id |= cased
@@ -312,7 +209,7 @@ def show_trends_for_benchmark(bname: TBenchmarkName) -> str:
     return flask.render_template(
         "c-benchmark-trends.html",
         benchmark_name=bname,
-        bmr_cache_meta=bmrt_cache["meta"],
+        bmr_cache_meta=cache.meta,
         context_json_by_context_id=context_json_by_context_id,
         case_json_by_case_id=case_json_by_case_id,
         # y_unit_for_all_plots="foo",
@@ -325,8 +222,28 @@ def show_trends_for_benchmark(bname: TBenchmarkName) -> str:
     )
 
 
+def _relchange_by_t3(
+    cache: BMRTCache, rows: np.ndarray
+) -> Dict[Tuple[str, str, str], float]:
+    """
+    Map rows of the cache's trend table to {(case_id, context_id,
+    hardware_checksum): relative change}, preserving row order.
+    """
+    relchange_by_t3: Dict[Tuple[str, str, str], float] = {}
+    for r in rows:
+        _, case_id, context_id, hardware_checksum = cache.by_4t_frame.keys[
+            cache.trends.series[r]
+        ]
+        relchange_by_t3[(case_id, context_id, hardware_checksum)] = float(
+            cache.trends.relchange[r]
+        )
+    return relchange_by_t3
+
+
 def _build_plotinfo_from_topnt3_dict(
-    bname: TBenchmarkName, topn_t3_dict: Dict[Tuple[str, str, str], float]
+    cache: BMRTCache,
+    bname: TBenchmarkName,
+    topn_t3_dict: Dict[Tuple[str, str, str], float],
 ) -> Tuple[Dict[str, "TypeUIPlotInfo"], Dict[str, str], Dict[str, str]]:
     context_json_by_context_id: Dict[str, str] = {}
     case_json_by_case_id: Dict[str, str] = {}
@@ -337,9 +254,9 @@ def _build_plotinfo_from_topnt3_dict(
         # Only include those cases where there are at least three results.
         # (this structure is used for plotting only).
         caseid, ctxid, hwchecksum = t3
-        results = bmrt_cache["by_4t_list"][(bname, caseid, ctxid, hwchecksum)]
+        results = cache.by_4t_list[(bname, caseid, ctxid, hwchecksum)]
 
-        # dfts = bmrt_cache["by_4t_df"][(bname, caseid, ctxid, hwchecksum)]
+        # dfts = cache.series_df((bname, caseid, ctxid, hwchecksum))
         # print()
         # print()
         # print((bname, caseid, ctxid, hwchecksum))
@@ -396,19 +313,17 @@ def _build_plotinfo_from_topnt3_dict(
 @app.route("/c-benchmarks/<bname>", methods=["GET"])  # type: ignore
 @authorize_or_terminate
 def show_benchmark_cases(bname: TBenchmarkName) -> str:
+    cache = _bmrt_cache_for_request()
+
     # Do not catch KeyError upon lookup for checking for key, because this
     # would insert the key into the defaultdict(list) (as an empty list).
-    if bname not in bmrt_cache["by_benchmark_name"]:
+    if bname not in cache.by_benchmark_name:
         return f"benchmark name not known: `{bname}`"
 
-    matching_results = bmrt_cache["by_benchmark_name"][bname]
-    results_by_case_id: Dict[str, List[BMRTBenchmarkResult]] = collections.defaultdict(
-        list
-    )
+    matching_results = cache.by_benchmark_name[bname]
 
     # First, group results by case.
-    for r in matching_results:
-        results_by_case_id[r.case_id].append(r)
+    results_by_case_id = matching_results.split_by("case_id")
 
     # Observe each unique key/value pair, but also keep track of how often
     # particular value was set for a key.
@@ -422,26 +337,27 @@ def show_benchmark_cases(bname: TBenchmarkName) -> str:
     # not seem to be recent anymore.
     time_of_last_result_with_casekey_set: Dict[str, float] = {}
 
-    for r in matching_results:
+    for cresults in results_by_case_id.values():
+        # All results in this group share the same case dictionary: process
+        # it once per case permutation, not once per result (that two-dim loop
+        # took ~0.5 s for 10^5 results).
+        case_dict = cresults[0].case_dict
+        t_newest_in_case = time_of_newest_of_many_results(cresults)
+
         # Today, there might be any kind of type here for key and value in the
-        # r.case_dict (coming straight from DB). Difficult. See
+        # case_dict (coming straight from DB). Difficult. See
         # https://github.com/conbench/conbench/pull/948 and
         # https://github.com/conbench/conbench/issues/940. Change both to
         # string here. Might be error-prone and a nest of bees, but we will have to see
-        for case_parm_key, case_parm_value in r.case_dict.items():
-            # Note that this two-dim loop that we're in can get expensive,
-            # maybe takes 0.5 s for 10^5 results? I suspect there is lots of
-            # low-hanging fruit potential for speeding this up by 10 or 100 x
-            # -- However, really let's not do premature optimization. First,
-            # make this 'correct', then maybe later measure and optimize.
+        for case_parm_key, case_parm_value in case_dict.items():
             k = str(case_parm_key)
             v = str(case_parm_value)
 
-            # The Counter update with a single value seems stupid :shrug:.
-            all_values_per_case_key[k].update([v])
+            # Count results (not case permutations) per value.
+            all_values_per_case_key[k][v] += len(cresults)
 
-            if r.started_at > time_of_last_result_with_casekey_set.get(k, 0):
-                time_of_last_result_with_casekey_set[k] = r.started_at
+            if t_newest_in_case > time_of_last_result_with_casekey_set.get(k, 0):
+                time_of_last_result_with_casekey_set[k] = t_newest_in_case
 
     # Translate absolute time(stamp) into age (in seconds) relative to ... not
     # to _now_ but relative to the more-or-less average time that the most
@@ -493,20 +409,20 @@ def show_benchmark_cases(bname: TBenchmarkName) -> str:
     hardware_count_per_case_id = {}
     for case_id, results in results_by_case_id.items():
         hardware_count_per_case_id[case_id] = len(
-            set([r.hardware_checksum for r in results])
+            set(results.column("hardware_checksum"))
         )
 
     last_result_per_case_id: Dict[str, BMRTBenchmarkResult] = {}
 
     context_count_per_case_id: Dict[str, int] = {}
     for case_id, results in results_by_case_id.items():
-        context_count_per_case_id[case_id] = len(set([r.context_id for r in results]))
+        context_count_per_case_id[case_id] = len(set(results.column("context_id")))
         last_result_per_case_id[case_id] = newest_of_many_results(results)
 
     return flask.render_template(
         "c-benchmark-cases.html",
         benchmark_name=bname,
-        bmr_cache_meta=bmrt_cache["meta"],
+        bmr_cache_meta=cache.meta,
         results_by_case_id=results_by_case_id,
         hardware_count_per_case_id=hardware_count_per_case_id,
         last_result_per_case_id=last_result_per_case_id,
@@ -534,57 +450,36 @@ class TypeUIPlotInfo(TypedDict):
 @app.route("/c-benchmarks/<bname>/<caseid>", methods=["GET"])  # type: ignore
 @authorize_or_terminate
 def show_benchmark_results(bname: TBenchmarkName, caseid: str) -> str:
-    # First, filter by benchmark name.
+    cache = _bmrt_cache_for_request()
+
+    # Look up all time series for this benchmark name and case ID: (hardware
+    # checksum, context ID) -> results (newest first).
     try:
-        results_all_with_bname = bmrt_cache["by_benchmark_name"][bname]
+        series_by_hwctx = cache.by_bname_case_hwctx[bname]
     except KeyError:
         return f"benchmark name not known: `{bname}`"
 
-    # Now, filter those that have the required case ID set.
-    matching_results = []
-    for r in results_all_with_bname:
-        if r.case_id == caseid:
-            matching_results.append(r)
-
-    # log.info(
-    #     "results_all_with_bname: %s, results with caseid and bname: %s",
-    #     len(results_all_with_bname),
-    #     len(matching_results),
-    # )
-
-    # Be explicit that this is now of no use.
-    del results_all_with_bname
-
-    if not matching_results:
+    if caseid not in series_by_hwctx:
         return f"no results found for benchmark `{bname}` and case `{caseid}`"
 
-    results_by_hardware_and_context: Dict[Tuple, List[BMRTBenchmarkResult]] = (
-        collections.defaultdict(list)
-    )
-
-    # Build up timeseries of results (group results, don't sort them yet).
-    for result in matching_results:
-        # Store hardware name in dictionary key, for convenience.
-        hwchecksum, hwname, ctxid = (
-            result.hardware_checksum,
-            result.hardware_name,
-            result.context_id,
-        )
-        results_by_hardware_and_context[(hwchecksum, ctxid, hwname)].append(result)
-
     # Make it so that infos_for_uplots is sorted by result count, i.e. show
     # most busy plots first. Instead, it might make sense to sort by recency!
     results_by_hardware_and_context_sorted = dict(
         sorted(
-            results_by_hardware_and_context.items(),
+            series_by_hwctx[caseid].items(),
             key=lambda item: len(item[1]),
             reverse=True,
         )
     )
+    matching_result_count = sum(
+        len(r) for r in results_by_hardware_and_context_sorted.values()
+    )
+    # Rely on at least one result being in each time series.
+    some_result = next(iter(results_by_hardware_and_context_sorted.values()))[0]
 
     # In the table show at most ~3000 results (for now, it's not really OK
     # to render it for 10000 results)
-    results_for_table = []
+    results_for_table: List[BMRTBenchmarkResult] = []
     for _, results in results_by_hardware_and_context_sorted.items():
         results_for_table.extend(results[:3000])
         if len(results_for_table) >= 3000:
@@ -602,7 +497,6 @@ def show_benchmark_results(bname: TBenchmarkName, caseid: str) -> str:
     for (
         hwchecksum,
         ctxid,
-        _,
     ), results in results_by_hardware_and_context_sorted.items():
         # Only include those cases where there are at least three results.
         # (this structure is used for plotting only).
@@ -677,15 +571,15 @@ def show_benchmark_results(bname: TBenchmarkName, caseid: str) -> str:
 
     return flask.render_template(
         "c-benchmark-results-for-case.html",
-        matching_benchmark_result_count=len(matching_results),
+        matching_benchmark_result_count=matching_result_count,
         benchmark_results_for_table=results_for_table,
         y_unit_for_all_plots=y_unit_for_all_plots,
         benchmark_name=bname,
-        bmr_cache_meta=bmrt_cache["meta"],
+        bmr_cache_meta=cache.meta,
         infos_for_uplots=infos_for_uplots,
         infos_for_uplots_json=infos_for_uplots_json,
-        this_case_id=matching_results[0].case_id,
-        this_case_text_id=matching_results[0].case_text_id,
+        this_case_id=some_result.case_id,
+        this_case_text_id=some_result.case_text_id,
         context_json_by_context_id=context_json_by_context_id,
         application=Config.APPLICATION_NAME,
         title=Config.APPLICATION_NAME,  # type: ignore
@@ -711,7 +605,7 @@ def maybe_longer_unit(unit: str) -> str:
 
 
 def avg_starttime_of_newest_n_percent_of_results(
-    results: List[BMRTBenchmarkResult], npc: int
+    results: Sequence[BMRTBenchmarkResult], npc: int
 ) -> float:
     """
     Return average start time of the newest N percent of those results in the
@@ -724,7 +618,7 @@ def avg_starttime_of_newest_n_percent_of_results(
     """
     # Sort by age: newer items last -> smaller  values first -> asc (default
     # sort direction).
-    timestamps = list(sorted((r.started_at for r in results)))
+    timestamps = np.sort(_started_at_array(results))
 
     # Take a most recent fraction of this list and build the mean value
     # (example:mean age in seconds of the last 10 % of the results)
@@ -6,7 +6,7 @@ from urllib.parse import urlparse
 
 import flask
 
-from conbench.bmrt import bmrt_cache
+from conbench.bmrt import get_bmrt_cache
 from conbench.cachetools import lru_cache_with_ttl
 
 from ..app import rule
@@ -159,11 +159,12 @@ def _get_recent_runs() -> List["RunForDisplay"]:
     bmrs = fetch_one_result_per_each_of_n_recent_runs()
 
     runs_for_display: List[RunForDisplay] = []
+    by_run_id = get_bmrt_cache().by_run_id
 
     for bmr in bmrs:
         result_count = "n/a"
-        if bmr.run_id in bmrt_cache["by_run_id"]:
-            result_count = str(len(bmrt_cache["by_run_id"][bmr.run_id]))
+        if bmr.run_id in by_run_id:
+            result_count = str(len(by_run_id[bmr.run_id]))
 
         runs_for_display.append(
             RunForDisplay(
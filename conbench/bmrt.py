@@ -14,43 +14,86 @@ deployments we run).
 
 Current implementation properties:
 
-- Central cache data structure are CPython dictionaries (with thread-safe
-  atomic set/get operations). Shared across threads: one populating thread
-  (write), multiple HTTP-handling threads (read; 'should not' mutate). The
-  HTTP-handling threads can accidentally mutate the cache (no protection; watch
-  out)
-- Periodic full fetch / population: this can take minutes of time as of today
-  and defines the delay between incoming data and them being represented in the
-  UI
-- This dominates web application process memory consumption; the individual
-  Python objects stored in the cache should be kept as small as possible;
-  potentially using advanced techniques (already using dataclass+slots)
+- Central cache data structure is an immutable object (`BMRTCache`) holding
+  a columnar store of all cached results (see conbench/bmrtstore.py) and
+  read-only index mappings built on top of it. Each update builds a new
+  object (a new generation) and publishes it with a single reference swap.
+  Shared across threads: one populating thread (write), multiple
+  HTTP-handling threads (read). A request handler should call
+  `get_bmrt_cache()` once and then only use the returned object: all data
+  seen by that handler is then consistent (from the same generation).
+- Periodic incremental update: only results that were inserted into the
+  database since the last update are fetched (the primary key of a benchmark
+  result is a UUID7, i.e. sortable by insertion time; the newest one seen is
+  kept as high-water mark). These are merged into the cache, and results that
+  fell out of the time window / size limit are evicted. That makes an update
+  take seconds instead of minutes.
+- Every now and then (and after process startup) a full fetch / population is
+  performed: that can take minutes of time as of today. This is required for
+  reflecting deletions in the database (which the incremental update cannot
+  see).
+- This dominates web application process memory consumption. Results are
+  therefore not stored as individual Python objects, but column by column in
+  numpy arrays (with integer-coded categorical columns for strings). Objects
+  representing individual results are built on demand.
+- Optionally (`Config.BMRT_SNAPSHOT_DIR`), the cache is populated by a
+  dedicated builder process which writes generation-numbered snapshots to
+  disk. Web application processes then only memory-map the newest snapshot
+  (see conbench/bmrtsnapshot.py).
 
 """
 
 import dataclasses
 import hashlib
+import itertools
 import logging
+import select
+import sys
 import threading
 import time
-from collections import defaultdict
+import uuid
+from collections.abc import Mapping
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, TypedDict, cast
+from typing import Callable, Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
+import psycopg2
+import psycopg2.extensions
 import sqlalchemy
 import sqlalchemy.orm
+from sqlalchemy.dialects.postgresql import ARRAY
 
+import conbench.bmrtsnapshot
+import conbench.db
 import conbench.job
 import conbench.metrics
-import conbench.util
+from conbench.bmrtstore import (  # noqa: F401 (re-export)
+    BMRTBenchmarkResult,
+    BMRTStore,
+    BMRTStoreBuilder,
+    GroupIndex,
+    ResultList,
+    ResultsById,
+    TimeseriesFrame,
+    approx_sizeof_items,
+)
+from conbench.bmrttrends import TrendTable, build_trend_table
+from conbench.cachetools import BoundedLRUCache
 from conbench.config import Config
 from conbench.db import session_maker
 from conbench.entities.benchmark_result import (
+    BENCHMARK_RESULT_CREATED_CHANNEL,
     BenchmarkResult,
-    ui_mean_and_uncertainty,
-    ui_rel_sem,
+    result_is_failed,
+    single_value_summary,
+    svs_type_for_unit,
+    ui_hardware_short,
 )
+from conbench.entities.case import Case, case_text_id
+from conbench.entities.commit import Commit
+from conbench.entities.context import Context
+from conbench.entities.hardware import Hardware
 from conbench.types import TBenchmarkName
 
 # A memory profiler, and a CPU profiler that are both tested to work well
@@ -61,10 +104,52 @@ from conbench.types import TBenchmarkName
 
 log = logging.getLogger(__name__)
 
-BMRT_CACHE_SIZE = 0.8 * 10**6
-if Config.TESTING:
-    # quicker update in testing
-    BMRT_CACHE_SIZE = 0.05 * 10**6
+# Maximum number of results in the cache (see Config.BMRT_CACHE_SIZE).
+BMRT_CACHE_SIZE = Config.BMRT_CACHE_SIZE
+
+# Only results with a (user-given) start time in this window enter the cache.
+BMRT_CACHE_WINDOW = timedelta(days=Config.BMRT_CACHE_WINDOW_DAYS)
+
+# Perform a full cache rebuild (instead of an incremental update) when the last
+# full rebuild was longer ago than this. A full rebuild reflects deletions in
+# the database, which the incremental update does not see.
+BMRT_FULL_REFRESH_INTERVAL_SECONDS = 3600.0
+
+# The incremental update fetches all results whose primary key (UUID7, i.e.
+# prefixed with the insertion time in milliseconds) is newer than the
+# high-water mark minus this overlap. The overlap is meant to catch results
+# that were committed to the DB _after_ the last update, but with an ID
+# generated _before_ the newest one seen in the last update (concurrent
+# inserts, long-running transactions). Results seen twice are simply replaced.
+BMRT_INCREMENTAL_OVERLAP_SECONDS = 120
+
+# In snapshot mode (see module docstring): how often to check for a new
+# snapshot generation.
+BMRT_SNAPSHOT_POLL_INTERVAL_SECONDS = 5.0
+
+# Benchmark result creation emits a notification (see
+# BENCHMARK_RESULT_CREATED_CHANNEL) which triggers an incremental update. Wait
+# this long after a notification before updating, so that a burst of
+# submissions (e.g. one CI job submitting hundreds of results) results in one
+# update.
+BMRT_NOTIFY_DEBOUNCE_SECONDS = 2.0
+
+# While listening for notifications: update at least this often anyway (that
+# is also when a due full refresh happens). When not listening (e.g. the
+# connection broke), poll as usual.
+BMRT_NOTIFY_FALLBACK_POLL_INTERVAL_SECONDS = 300.0
+
+# When not listening: attempt to (re-)establish the listener connection at
+# most this often.
+BMRT_NOTIFY_RECONNECT_INTERVAL_SECONDS = 30.0
+
+# With Config.BMRT_WARM_START_DIR set: persist the cache at most this often.
+# The incremental update after a restart catches up with what was missed.
+BMRT_WARM_START_WRITE_INTERVAL_SECONDS = 300.0
+
+# Maximum number of per-timeseries dataframes kept around (built on demand,
+# see `BMRTCache.series_df()`).
+BMRT_SERIES_DF_CACHE_SIZE = 2000
 
 
 @dataclasses.dataclass
@@ -75,89 +160,75 @@ class CacheUpdateMetaInfo:
     n_results: int
 
 
-# CPython 3.10/3.11 feature:  dataclass nicely integrated with slots. __slots__
-# saves memory: prevents the automatic creation of __dict__ and __weakref__ for
-# each instance. See
-# https://docs.python.org/3/reference/datamodel.html#object.__slots__
-# https://www.trueblade.com/blogs/news/python-3-10-new-dataclass-features
-@dataclasses.dataclass(slots=True)
-class BMRTBenchmarkResult:
-    id: str
-    case_id: str
-    context_id: str
-    run_id: str
-    data: List[float]
-    svs: float
-    svs_type: str
-    unit: str
-    benchmark_name: str
-    # POSIX timestamp
-    started_at: float
-    hardware_checksum: str
-    hardware_name: str
-    case_text_id: str
-    case_dict: Dict[str, str]
-    context_dict: Dict
-    ui_time_started_at: str
-    ui_hardware_short: str
-    ui_non_null_sample_count: str
-    run_reason: str
-
-    # There is conceptual duplication between the class BenchmarkResult
-    # and this class BMRTBenchmarkResult. Fundamentally, it might make sense
-    # that we have two types of classes, with distinct values:
-    # - one for database abstraction (the 'big instances', mutable, ...)
-    # - one for data mangling (small mem footprint, immutable, ...)
-    @property
-    def ui_mean_and_uncertainty(self) -> str:
-        return ui_mean_and_uncertainty(self.data, self.unit)
-
-    @property
-    def ui_rel_sem(self) -> Tuple[str, str]:
-        return ui_rel_sem(self.data)
-
-    @property
-    def started_at_iso(self) -> str:
-        """
-        Add an ISO timestring on the object so that JavaScript's `new
-        Date(input)` can parse this into a tz-aware object.
-        """
-        return conbench.util.tznaive_dt_to_aware_iso8601_for_api(
-            datetime.fromtimestamp(self.started_at)
-        )
-
-
 # This type is used often. It's the famous 4-tuple defining a timeseries. Or
 # maybe turn this into a namedtuple or sth like this. Watch out a bit for mem
 # consumption. Strongly related concept: timeseries fingerprint, see
 # https://github.com/conbench/conbench/issues/862
 Tt4 = Tuple[TBenchmarkName, str, str, str]
 
+# The store columns making up the 4-tuple, in that order.
+T4_COLUMNS = ("benchmark_name", "case_id", "context_id", "hardware_checksum")
+
 
-@dataclasses.dataclass(slots=True)
-class ResultTimeseries:
-    t4: Tt4
-    benchmark_name: str
-    df: pd.DataFrame
-    bmrlist: List[BMRTBenchmarkResult]
+# Read-only mapping (a GroupIndex): key is 4-tuple, value is the list of
+# results in this time series (newest first).
+TDict4tlist = Mapping[Tt4, ResultList]
 
+# Nested index: benchmark name -> case ID -> (hardware checksum, context ID) ->
+# list of results in this time series (newest first).
+TDictNestedSeries = Dict[TBenchmarkName, Dict[str, Dict[Tuple[str, str], ResultList]]]
 
-# A type for a dictionary: key is 4-tuple defining a time series, and value is
-# a pandas dataframe containing the time series (index: pd.DateTimeIndex
-# tz-aware, one column: single value summary).
-TDict4tdf = Dict[Tt4, pd.DataFrame]
-TDict4tlist = Dict[Tt4, List[BMRTBenchmarkResult]]
+# Benchmark name -> 4-tuples of all time series for this benchmark name.
+TDictBname4t = Dict[TBenchmarkName, List[Tt4]]
 
 
-class CacheDict(TypedDict):
-    by_id: Dict[str, BMRTBenchmarkResult]
-    by_benchmark_name: Dict[TBenchmarkName, List[BMRTBenchmarkResult]]
-    by_case_id: Dict[str, List[BMRTBenchmarkResult]]
-    by_run_id: Dict[str, List[BMRTBenchmarkResult]]
-    by_4t_df: TDict4tdf
-    by_4t_list: TDict4tlist
+@dataclasses.dataclass(frozen=True)
+class BMRTCache:
+    """
+    One generation of the BMRT cache: the store, and all indexes built on top
+    of it. Never mutated after publication.
+    """
+
+    # Increases with each publication. In snapshot mode: the snapshot
+    # generation number (same across all processes).
+    generation: int
+    store: BMRTStore
+    by_id: Mapping[str, BMRTBenchmarkResult]
+    # Group indexes (see TDict4tlist for the type of keys and values).
+    by_benchmark_name: GroupIndex
+    by_case_id: GroupIndex
+    by_run_id: GroupIndex
+    by_4t_frame: TimeseriesFrame
+    by_4t_list: GroupIndex
+    by_bname_case_hwctx: TDictNestedSeries
+    t4s_by_bname: TDictBname4t
+    # Linear trends of all (recent) time series in `by_4t_frame`.
+    trends: TrendTable
     meta: CacheUpdateMetaInfo
 
+    @property
+    def etag(self) -> str:
+        """
+        Weak HTTP entity tag for responses derived from (only) this generation.
+        """
+        return f'W/"bmrt-{_GENERATION_NAMESPACE}-{self.generation}"'
+
+    def series_df(self, t4: Tt4) -> pd.DataFrame:
+        """
+        Return the timeseries dataframe for the 4-tuple `t4` (see
+        `TimeseriesFrame.to_tsdf()`). Raise `KeyError` for an unknown 4-tuple.
+
+        The dataframe is built on first access, and then kept in a bounded LRU
+        cache (keyed by generation). Do not mutate it.
+        """
+        df, hit = _series_df_cache.get_or_compute(
+            (self.generation, t4), lambda: self.by_4t_frame.to_tsdf(t4)
+        )
+        conbench.metrics.COUNTER_BMRT_SERIES_DF_CACHE_LOOKUPS.labels(
+            result="hit" if hit else "miss"
+        ).inc()
+        return df
+
 
 _init_metainfo = CacheUpdateMetaInfo(
     newest_result_time_str="n/a",
@@ -168,37 +239,156 @@ _init_metainfo = CacheUpdateMetaInfo(
 
 _FIRST_REFRESH_DONE_EVENT = threading.Event()
 
-# Think: future: do work in a child process, provide dictionary via shared
-# memory to parent, maybe via https://pypi.org/project/shared-memory-dict/ this
-# is _not_ as stdlib pickling dict
-# https://github.com/luizalabs/shared-memory-dict/issues/10 This initial state
-# might result in exceptions raised in certain request handlers; healing after
-# first update.
-
-# For now the idea is not re-create the wrapping dict during lifetime of the
-# cache.
-bmrt_cache: CacheDict = {
-    "by_id": {},
-    "by_benchmark_name": {},
-    "by_case_id": {},
-    "by_4t_list": {},
-    "by_4t_df": {},
-    "by_run_id": {},
-    "meta": _init_metainfo,
-}
+# Generation numbers are only meaningful within this namespace: a random token
+# per process, unless generation numbers come from the (shared) snapshot
+# directory. That way, an entity tag never refers to different data across
+# web application processes.
+_GENERATION_NAMESPACE = (
+    "snap" if Config.BMRT_SNAPSHOT_DIR is not None else uuid.uuid4().hex[:8]
+)
+_generation_counter = itertools.count(1)
+
+# Per-timeseries dataframes, keyed by (generation, 4-tuple). Most timeseries
+# are not looked at between two cache updates: do not build these upfront.
+_series_df_cache: BoundedLRUCache[pd.DataFrame] = BoundedLRUCache(
+    BMRT_SERIES_DF_CACHE_SIZE
+)
+
+
+def get_bmrt_cache() -> BMRTCache:
+    """
+    Return the currently published cache generation.
+
+    Call this once per request and work with the returned object (do not
+    call this again later during the same request: that may return a newer
+    generation).
+    """
+    return _current
 
 
 def reinit():
-    for k in bmrt_cache:
-        if k == "meta":
-            bmrt_cache[k] = _init_metainfo
-        else:
-            bmrt_cache[k] = {}
+    _publish(BMRTStore.empty())
+
+    # Next update must be a full refresh.
+    _refresh_state.high_water_mark = None
+    _refresh_state.last_full_refresh_monotonic = 0.0
+    _refresh_state.last_full_refresh_unixtime = 0.0
+    _refresh_state.snapshot_generation = None
+    _refresh_state.warm_start_attempted = False
+    _refresh_state.last_persisted_store = None
+    _refresh_state.last_persisted_monotonic = 0.0
+
+
+@dataclasses.dataclass
+class _RefreshState:
+    # The newest BenchmarkResult.id (UUID7 hex) seen during the last update, or
+    # `None` if there is no state to build upon (full refresh required).
+    high_water_mark: Optional[str] = None
+    # time.monotonic() of the last full refresh.
+    last_full_refresh_monotonic: float = 0.0
+    # Same, as wall-clock time (persisted across restarts).
+    last_full_refresh_unixtime: float = 0.0
+    # In snapshot mode: the generation currently published in this process.
+    snapshot_generation: Optional[int] = None
+    # For warm start (Config.BMRT_WARM_START_DIR).
+    warm_start_attempted: bool = False
+    last_persisted_store: Optional[BMRTStore] = None
+    last_persisted_monotonic: float = 0.0
+
+
+_refresh_state = _RefreshState()
+
+# Set in the snapshot builder process. That process only needs the store (for
+# merging, and for writing snapshots), not the indexes and dataframes derived
+# from it. It also does not have to yield the CPU to HTTP-handling threads.
+_snapshot_builder_mode = False
+
+
+def _publish(store: BMRTStore, generation: Optional[int] = None) -> None:
+    """
+    Build the index mappings for `store` (including the timeseries frame) and
+    make all of that visible to the HTTP-handling threads, as a new cache
+    generation.
+
+    `generation`: use this generation number (snapshot mode) instead of the
+    next one from the process-local counter.
+    """
+    global _current
+
+    if generation is None:
+        generation = next(_generation_counter)
+
+    if _snapshot_builder_mode:
+        # The index fields remain those of the empty cache.
+        _current = dataclasses.replace(
+            _EMPTY_CACHE,
+            generation=generation,
+            store=store,
+            meta=_build_metainfo(store),
+        )
+        return
+
+    t0 = time.monotonic()
+    cache = _build_cache(store, generation)
 
+    # Publish with a single (atomic) reference swap. Threads that have
+    # obtained the previous generation keep working with that one.
+    _current = cache
+    # Entries for older generations are not going to be looked up anymore
+    # (by new requests); free memory.
+    _series_df_cache.clear()
+    conbench.metrics.GAUGE_BMRT_CACHE_GENERATION.set(generation)
 
-# Set initial state during import of this module. Rely on this happening once
-# during Pythons import machinery: re-import does not have this side effect.
-reinit()
+    log.info(
+        "BMRT cache: built indexes for generation %s in %.3f s (%s time series, "
+        "%s trends)",
+        generation,
+        time.monotonic() - t0,
+        len(cache.by_4t_frame),
+        len(cache.trends),
+    )
+
+
+def _build_cache(store: BMRTStore, generation: int) -> BMRTCache:
+    by_4t_list = store.group_index(*T4_COLUMNS)
+    by_4t_frame = store.series_frame(*T4_COLUMNS)
+    by_bname_case_hwctx, t4s_by_bname = _build_nested_indexes(by_4t_list)
+    return BMRTCache(
+        generation=generation,
+        store=store,
+        by_id=ResultsById(store),
+        by_benchmark_name=store.group_index("benchmark_name"),
+        by_case_id=store.group_index("case_id"),
+        by_run_id=store.group_index("run_id"),
+        by_4t_frame=by_4t_frame,
+        by_4t_list=by_4t_list,
+        by_bname_case_hwctx=by_bname_case_hwctx,
+        t4s_by_bname=t4s_by_bname,
+        trends=build_trend_table(by_4t_frame),
+        meta=_build_metainfo(store),
+    )
+
+
+def _build_nested_indexes(
+    by_4t_list: TDict4tlist,
+) -> Tuple[TDictNestedSeries, TDictBname4t]:
+    """
+    Build the per-benchmark indexes from the 4-tuple index (one entry per time
+    series), so that request handlers can look up all time series for a
+    benchmark name, or for a benchmark name and case ID, without scanning
+    unrelated results.
+    """
+    nested: TDictNestedSeries = {}
+    t4s_by_bname: TDictBname4t = {}
+
+    for t4 in by_4t_list:
+        bname, case_id, context_id, hardware_checksum = t4
+        t4s_by_bname.setdefault(bname, []).append(t4)
+        nested.setdefault(bname, {}).setdefault(case_id, {})[
+            (hardware_checksum, context_id)
+        ] = by_4t_list[t4]
+
+    return nested, t4s_by_bname
 
 
 def wait_for_first_bmrt_cache_population(timeout=20):
@@ -222,237 +412,566 @@ def _fetch_and_cache_most_recent_results() -> None:
 
     # This pattern is weird, see https://github.com/sqlalchemy/sqlalchemy/issues/6519
     # not trivial!
+    wsdir = Config.BMRT_WARM_START_DIR
+    if wsdir is not None and not _refresh_state.warm_start_attempted:
+        _refresh_state.warm_start_attempted = True
+        if _warm_start(wsdir):
+            # Catch up with the database in the next iteration.
+            return
+
     dbsession = session_maker()
     with dbsession:
         with dbsession.begin():
-            _fetch_and_cache_most_recent_results_guts(dbsession)
+            if _full_refresh_required():
+                _fetch_and_cache_most_recent_results_guts(dbsession)
+            else:
+                _fetch_and_merge_new_results_guts(dbsession)
             # commits transaction, closes session
 
+    if wsdir is not None:
+        _persist_for_warm_start(wsdir)
+
+
+def _full_refresh_required() -> bool:
+    if _refresh_state.high_water_mark is None:
+        return True
+
+    since_last_full_s = time.monotonic() - _refresh_state.last_full_refresh_monotonic
+    return since_last_full_s > BMRT_FULL_REFRESH_INTERVAL_SECONDS
+
 
 def _fetch_and_cache_most_recent_results_guts(
     dbsession: sqlalchemy.orm.session.Session,
 ):
     log.debug(
         "BMRT cache: keys in cache: %s",
-        len(bmrt_cache["by_id"]),
+        len(_current.by_id),
     )
     t0 = time.monotonic()
 
+    builder, high_water_mark = _fetch_into_builder(
+        dbsession, [BenchmarkResult.timestamp > datetime.now() - BMRT_CACHE_WINDOW]
+    )
+    t1 = time.monotonic()
+
+    store = builder.build()
+    _report_dedup_ratios(builder)
+    t2 = time.monotonic()
+
+    # The next update can build upon what was fetched here (also when nothing
+    # entered the cache).
+    _refresh_state.high_water_mark = high_water_mark
+    _refresh_state.last_full_refresh_monotonic = t0
+    _refresh_state.last_full_refresh_unixtime = time.time()
+
+    if len(store) == 0:
+        log.info("BMRT cache: no results")
+        return
+
+    # Group all benchmark results into timeseries, build indexes, publish.
+    _publish(store)
+    t3 = time.monotonic()
+
+    _report_update(
+        "population",
+        len(builder),
+        {"fetch": t1 - t0, "build": t2 - t1, "index": t3 - t2},
+    )
+
+
+def _fetch_and_merge_new_results_guts(
+    dbsession: sqlalchemy.orm.session.Session,
+):
+    """
+    Fetch only those results that were inserted into the database since the
+    last update (as of the high-water mark), and merge them into the cache.
+
+    Evict results that fell out of the time window, or that exceed the cache
+    size limit (oldest first).
+    """
+    t0 = time.monotonic()
+
+    high_water_mark = _refresh_state.high_water_mark
+    assert high_water_mark is not None
+
+    # Use a datetime object with a local notion of time; as in the full
+    # refresh. `started_at` is derived in the same way below.
+    cutoff = datetime.now() - BMRT_CACHE_WINDOW
+
+    builder, newest_id = _fetch_into_builder(
+        dbsession,
+        [
+            BenchmarkResult.id
+            > _uuid7_hex_lower_bound(high_water_mark, BMRT_INCREMENTAL_OVERLAP_SECONDS),
+            BenchmarkResult.timestamp > cutoff,
+        ],
+    )
+    if newest_id is not None:
+        high_water_mark = max(high_water_mark, newest_id)
+    t1 = time.monotonic()
+
+    new_store = builder.build()
+    _report_dedup_ratios(builder)
+    t2 = time.monotonic()
+
+    merged, n_evicted = _merge_with_cached_results(new_store, cutoff.timestamp())
+    t3 = time.monotonic()
+
+    if merged is not None:
+        _publish(merged)
+    _refresh_state.high_water_mark = high_water_mark
+    t4 = time.monotonic()
+
+    _report_update(
+        f"incremental update ({len(new_store)} new, {n_evicted} evicted)",
+        len(builder),
+        {"fetch": t1 - t0, "build": t2 - t1, "merge": t3 - t2, "index": t4 - t3},
+    )
+
+
+def _report_update(kind: str, n_rows_fetched: int, phase_seconds: Dict[str, float]):
+    """
+    Export timing and size metrics for the cache update that just completed,
+    and write a summary log line.
+    """
+    for phase, seconds in phase_seconds.items():
+        conbench.metrics.GAUGE_BMRT_CACHE_PHASE_SECONDS.labels(phase=phase).set(seconds)
+    conbench.metrics.GAUGE_BMRT_CACHE_LAST_UPDATE_SECONDS.set(
+        sum(phase_seconds.values())
+    )
+
+    fetch_seconds = phase_seconds["fetch"]
+    rows_per_second = n_rows_fetched / fetch_seconds if fetch_seconds > 0 else 0.0
+    conbench.metrics.GAUGE_BMRT_CACHE_FETCH_ROWS_PER_SECOND.set(rows_per_second)
+
+    cache = _current
+    nbytes_by_component = _report_cache_size(cache)
+
+    log.info(
+        (
+            "BMRT cache %s done: generation %s, %s results, %s timeseries, "
+            "%s benchmark names, ~%.1f MB; fetched %s rows (%.0f rows/s); %s"
+        ),
+        kind,
+        cache.generation,
+        len(cache.store),
+        len(cache.by_4t_frame),
+        len(cache.by_benchmark_name),
+        sum(nbytes_by_component.values()) / 10**6,
+        n_rows_fetched,
+        rows_per_second,
+        ", ".join(f"{p} took {s:.3f} s" for p, s in phase_seconds.items()),
+    )
+
+
+def _report_cache_size(cache: BMRTCache) -> Dict[str, int]:
+    """
+    Export cardinality and (approximate) memory consumption of `cache` as
+    metrics. Return the number of bytes by component.
+    """
+    nbytes_by_component = {
+        "store_arrays": cache.store.approx_nbytes(),
+        "store_objects": cache.store.approx_object_nbytes(),
+        "by_benchmark_name": cache.by_benchmark_name.approx_nbytes(),
+        "by_case_id": cache.by_case_id.approx_nbytes(),
+        "by_run_id": cache.by_run_id.approx_nbytes(),
+        "by_4t_list": cache.by_4t_list.approx_nbytes(),
+        "by_4t_frame": cache.by_4t_frame.approx_nbytes(),
+        "by_bname_case_hwctx": _approx_nested_index_nbytes(cache.by_bname_case_hwctx),
+    }
+
+    for component, nbytes in nbytes_by_component.items():
+        conbench.metrics.GAUGE_BMRT_CACHE_BYTES.labels(component=component).set(nbytes)
+    conbench.metrics.GAUGE_BMRT_CACHE_RESULTS.set(len(cache.store))
+    conbench.metrics.GAUGE_BMRT_CACHE_TIMESERIES.set(len(cache.by_4t_frame))
+    conbench.metrics.GAUGE_BMRT_CACHE_BENCHMARK_NAMES.set(len(cache.by_benchmark_name))
+
+    return nbytes_by_component
+
+
+def _approx_nested_index_nbytes(nested: TDictNestedSeries) -> int:
+    def _sizeof_bname_entry(by_case: Dict[str, Dict[Tuple[str, str], ResultList]]):
+        size = sys.getsizeof(by_case)
+        for by_hwctx in by_case.values():
+            size += sys.getsizeof(by_hwctx)
+            for key, results in by_hwctx.items():
+                # The result lists are views on the rows array of the 4-tuple
+                # index (not counted here).
+                size += sys.getsizeof(key) + sys.getsizeof(results)
+        return size
+
+    return sys.getsizeof(nested) + approx_sizeof_items(
+        list(nested.values()), _sizeof_bname_entry
+    )
+
+
+def _fetch_into_builder(
+    dbsession: sqlalchemy.orm.session.Session,
+    conditions: List[sqlalchemy.ColumnElement[bool]],
+) -> Tuple[BMRTStoreBuilder, Optional[str]]:
+    """
+    Fetch the most recent benchmark results matching `conditions` (at most
+    BMRT_CACHE_SIZE), and add them to a new builder.
+
+    Return the builder, and the newest UUID7 result ID seen (or `None`).
+
+    Only results obtained for a commit on the default branch are considered.
+
+    This does not hydrate ORM objects: the result query projects only the
+    columns needed for the cache. Case, context and hardware properties are
+    fetched once per distinct entity ID (these are shared by many results).
+    """
+    # Results obtained for a commit on the default branch.
+    conditions = conditions + [Commit.sha == Commit.fork_point_sha]
+
+    props = _EntityProps(dbsession, conditions)
+
     # Note(JP): process query result rows in a streaming-like fashion in
-    # smaller chunks to keep peak memory usage in check. Also see
+    # smaller chunks (server-side cursor) to keep peak memory usage in check.
+    # Also see
     # https://docs.sqlalchemy.org/en/20/core/connections.html#using-server-side-cursors-a-k-a-stream-results
-    # https://docs.sqlalchemy.org/en/20/orm/queryguide/api.html#fetching-large-result-sets-with-yield-per
+    # Have the database convert NUMERIC to float (instead of creating one
+    # Decimal object per value).
     query_statement = (
-        sqlalchemy.select(BenchmarkResult)
+        sqlalchemy.select(
+            BenchmarkResult.id,
+            BenchmarkResult.timestamp,
+            sqlalchemy.cast(BenchmarkResult.data, ARRAY(sqlalchemy.Float)).label(
+                "data"
+            ),
+            BenchmarkResult.unit,
+            # `error` may be SQL NULL or JSON null.
+            (
+                sqlalchemy.func.coalesce(
+                    sqlalchemy.func.jsonb_typeof(BenchmarkResult.error), "null"
+                )
+                != "null"
+            ).label("has_error"),
+            sqlalchemy.cast(BenchmarkResult.mean, sqlalchemy.Float).label("mean"),
+            sqlalchemy.cast(BenchmarkResult.min, sqlalchemy.Float).label("min"),
+            sqlalchemy.cast(BenchmarkResult.max, sqlalchemy.Float).label("max"),
+            BenchmarkResult.run_id,
+            BenchmarkResult.run_reason,
+            BenchmarkResult.case_id,
+            BenchmarkResult.context_id,
+            BenchmarkResult.hardware_id,
+        )
+        .join(Commit, BenchmarkResult.commit_id == Commit.id)
+        .where(*conditions)
         .order_by(BenchmarkResult.timestamp.desc())
-        .where(BenchmarkResult.timestamp > datetime.now() - timedelta(days=14))
-        .limit(int(BMRT_CACHE_SIZE))
+        .limit(BMRT_CACHE_SIZE)
     ).execution_options(yield_per=2000)
 
-    # Corresponding to the `yield_per` magic, consume the returned value as an
-    # iterator. `all()` would consume all results and would defeat the purpose
-    # of the memory-saving exercise. The following line of code does not do
-    # much of the work yet; that begins once the iterator is consumed (maybe it
-    # fetches the first chunk?).
-    result_rows_iterator = dbsession.scalars(query_statement)
-
-    by_id_dict: Dict[str, BMRTBenchmarkResult] = {}
-    by_name_dict: Dict[TBenchmarkName, List[BMRTBenchmarkResult]] = defaultdict(list)
-    by_case_id_dict: Dict[str, List[BMRTBenchmarkResult]] = defaultdict(list)
-    by_run_id_dict: Dict[str, List[BMRTBenchmarkResult]] = defaultdict(list)
-
-    first_result = None
-    last_result = None
-    for result in result_rows_iterator:  # pylint: disable=E1133
+    builder = BMRTStoreBuilder()
+    newest_id: Optional[str] = None
+
+    for i, row in enumerate(dbsession.execute(query_statement)):
         # Note that the DB might feed us so quickly that this loop body becomes
         # CPU-bound. In that case, given the current deployment model, we
         # starve the other threads (hello, GIL!) that want to process HTTP
-        # requests. Pragmatic solution could be to sleep a bit in each loop
-        # iteration here (e.g. 0.1 s). We will see. Better would be do do the
-        # update from a separate process, and share the outcome via shared mem
-        # (e.g. SHM, but anything goes as long as we don't re-serialize).
-        # Update: Spread out the CPU work a little more.
-        time.sleep(0.0001)
-
-        # Keep track of the first (newest) and last (oldest) result
-        # while consuming the iterator. If n=1 they are the same.
-        last_result = result
-        if first_result is None:
-            first_result = result
-
-        # For now: put both, failed and non-failed results into the cache.
-        # It would be a nice code simplification to only consider succeeded
-        # ones, but then we miss out on reporting about the failed ones.
-
-        # Important decision for now: skip results that have not been obtained
-        # for the default code branch.
-        bmrcommit = result.commit
-
-        if bmrcommit is None:
-            continue
-
-        if not bmrcommit.on_default_branch:
-            continue
-
-        # The str() indirections below are here to quickly make sure that there
-        # is no more SQLAlchemy magic associated to objects we store here.
-        # Maybe that is not needed but instead of making that experiment I took
-        # the quick way.
-
-        # Note: with named types it's here not enough to to # type: ...
-        # but an explicit cast is required? perf impact? dunno.
-        # Related: https://github.com/python/typing/discussions/1146
-        benchmark_name = cast(TBenchmarkName, str(result.case.name))
-
-        # A textual representation of the case permutation. As it is 'complete'
-        # it should also work as a proper identifier (like primary key).
-        casedict = result.case.to_dict()
-        case_text_id = result.case.text_id
-
-        bmr = BMRTBenchmarkResult(
-            id=str(result.id),
-            benchmark_name=benchmark_name,
-            started_at=result.timestamp.timestamp(),
-            data=result.measurements,
-            svs=result.svs,
-            svs_type=result.svs_type,
-            unit=str(result.unit) if result.unit else "n/a",
-            # Current `hardware.hash` is a string (not byte sequence), and does
-            # not have a predictable charset. I hoped it would be just the
-            # hexdigest of a popular hash function. What we have contains
-            # user-given data, i.e. the string is brittle to work with in code
-            # and generated documents. E.g. may not work in JavaScript var
-            # declaration statements). Translate this Conbench business logic
-            # "hardware hash" into one with predictable charset. This is for
-            # grouping/sorting purposes, and for building UI. Use MD5 (fast,
-            # unlikely collision, good enough). Can clean up when reworking
-            # hardware/platform/env:
-            # https://github.com/conbench/conbench/issues/1340
-            hardware_checksum=hashlib.md5(
-                result.hardware.hash.encode("utf-8")
-            ).hexdigest(),
-            hardware_name=str(result.hardware.name),
-            case_id=str(result.case_id),
-            context_id=str(result.context_id),
-            run_id=str(result.run_id),
-            # These context dictionaries are often the largest part of these
-            # BMRTBenchmarkResult object (in terms of memory usage) -- they can
-            # be a rather big collection of strings. However, by the nature of
-            # the processed data there can be a high degree of duplication
-            # across benchmark results. The data source uses a unique
-            # constraint (enforced in DB) with an index on the entire
-            # dictionary, i.e. use the _same_ object here and assume it may be
-            # shared across potentially many BMRTBenchmarkResult objects.
-            context_dict=result.context.to_dict(),
-            case_text_id=case_text_id,
-            case_dict=casedict,
-            ui_hardware_short=str(result.ui_hardware_short),
-            ui_time_started_at=str(result.ui_time_started_at),
-            ui_non_null_sample_count=result.ui_non_null_sample_count,
-            run_reason=result.run_reason if result.run_reason else "n/a",
+        # requests. Spread out the CPU work a little (not required in the
+        # snapshot builder process).
+        if not _snapshot_builder_mode and i % 500 == 0:
+            time.sleep(0.01)
+
+        newest_id = _newer_high_water_mark(newest_id, row.id)
+        _add_row_to_builder(builder, row, props)
+
+    return builder, newest_id
+
+
+class _EntityProps:
+    """
+    Case, context and hardware properties for one cache refresh, keyed by
+    entity ID.
+
+    Pre-fetched with one query per entity table for all entities referred to
+    by results matching `conditions`. Entities not seen in that pre-fetch
+    (referred to by results inserted in the meantime) are fetched one by one.
+    """
+
+    def __init__(
+        self,
+        dbsession: sqlalchemy.orm.session.Session,
+        conditions: List[sqlalchemy.ColumnElement[bool]],
+    ):
+        self._dbsession = dbsession
+
+        def _ids_in_window(col):
+            return (
+                sqlalchemy.select(col)
+                .join(Commit, BenchmarkResult.commit_id == Commit.id)
+                .where(*conditions)
+                .distinct()
+            )
+
+        self._case_stmt = sqlalchemy.select(Case.id, Case.name, Case.tags)
+        self._context_stmt = sqlalchemy.select(Context.id, Context.tags)
+        self._hardware_stmt = sqlalchemy.select(
+            Hardware.id, Hardware.name, Hardware.hash
         )
 
-        by_id_dict[str(result.id)] = bmr
-        by_name_dict[benchmark_name].append(bmr)
-        by_run_id_dict[str(result.run_id)].append(bmr)
+        self.cases = self._fetch(
+            self._case_stmt.where(Case.id.in_(_ids_in_window(BenchmarkResult.case_id)))
+        )
+        self.contexts = self._fetch(
+            self._context_stmt.where(
+                Context.id.in_(_ids_in_window(BenchmarkResult.context_id))
+            )
+        )
+        self.hardwares = self._fetch(
+            self._hardware_stmt.where(
+                Hardware.id.in_(_ids_in_window(BenchmarkResult.hardware_id))
+            )
+        )
 
-        # Add a property on the Case object, on the fly.
-        # Build the textual representation of this case which should also
-        # uniquely / unambiguously define/identify this specific case.
-        by_case_id_dict[str(result.case_id)].append(bmr)
+    def _fetch(self, stmt) -> Dict[str, sqlalchemy.Row]:
+        return {row.id: row for row in self._dbsession.execute(stmt)}
 
-    t1 = time.monotonic()
+    def case(self, case_id: str) -> sqlalchemy.Row:
+        if case_id not in self.cases:
+            self.cases |= self._fetch(self._case_stmt.where(Case.id == case_id))
+        return self.cases[case_id]
+
+    def context(self, context_id: str) -> sqlalchemy.Row:
+        if context_id not in self.contexts:
+            self.contexts |= self._fetch(
+                self._context_stmt.where(Context.id == context_id)
+            )
+        return self.contexts[context_id]
+
+    def hardware(self, hardware_id: str) -> sqlalchemy.Row:
+        if hardware_id not in self.hardwares:
+            self.hardwares |= self._fetch(
+                self._hardware_stmt.where(Hardware.id == hardware_id)
+            )
+        return self.hardwares[hardware_id]
 
-    if len(by_name_dict) == 0:
-        log.info("BMRT cache: no results")
-        return
 
-    # This helps mypy, too.
-    assert first_result
-    assert last_result
-
-    # Group all benchmark results into timeseries
-    dict4tdf, bmrlist_by_4tuple = _generate_tsdf_per_4tuple(by_name_dict)
-
-    # Mutate the dictionary which is accessed by other threads, do this in a
-    # quick fashion -- each of this assignments is atomic (thread-safe), but
-    # between those two assignments a thread might perform read access. (minor
-    # inconsistency is possible). Of course we can add another lookup
-    # indirection layer by assembling a completely new dictionary here and then
-    # re-defining the name bmrt_cache.
-    bmrt_cache["by_id"] = by_id_dict
-    bmrt_cache["by_benchmark_name"] = by_name_dict
-    bmrt_cache["by_case_id"] = by_case_id_dict
-    bmrt_cache["by_4t_df"] = dict4tdf
-    bmrt_cache["by_4t_list"] = bmrlist_by_4tuple
-    bmrt_cache["by_run_id"] = by_run_id_dict
-    bmrt_cache["meta"] = CacheUpdateMetaInfo(
-        newest_result_time_str=first_result.ui_time_started_at,
+def _add_row_to_builder(
+    builder: BMRTStoreBuilder, row: sqlalchemy.Row, props: _EntityProps
+) -> None:
+    """
+    Add the cache representation of a benchmark result (row from the query in
+    `_fetch_into_builder()`) to `builder`.
+
+    For now: put both, failed and non-failed results into the cache. It would
+    be a nice code simplification to only consider succeeded ones, but then we
+    miss out on reporting about the failed ones.
+    """
+    # Case, context and hardware properties are shared by many results. Build
+    # their cache representation once per refresh (and per entity), and make
+    # all results refer to the same (canonical) objects.
+    case_id = row.case_id
+    bname, case_text_id, case_dict = builder.intern(
+        "case", case_id, lambda: _case_props(props.case(case_id))
+    )
+
+    context_id = row.context_id
+    # These context dictionaries can be a rather big collection of strings. By
+    # the nature of the processed data there is a high degree of duplication
+    # across benchmark results. The data source uses a unique constraint
+    # (enforced in DB) with an index on the entire dictionary.
+    context_dict = builder.intern(
+        "context", context_id, lambda: props.context(context_id).tags
+    )
+
+    hardware_checksum, hardware_name, hardware_short = builder.intern(
+        "hardware",
+        row.hardware_id,
+        lambda: _hardware_props(props.hardware(row.hardware_id)),
+    )
+
+    # Same criteria and logic as `BenchmarkResult.is_failed`,
+    # `BenchmarkResult.measurements` and `BenchmarkResult.svs`.
+    data = row.data
+    failed = result_is_failed(row.unit, data, row.has_error)
+    measurements = [] if failed else data
+
+    builder.append(
+        id=row.id,
+        benchmark_name=bname,
+        started_at=row.timestamp.timestamp(),
+        data=measurements,
+        n_nonnull_samples=0 if data is None else sum(d is not None for d in data),
+        svs=single_value_summary(measurements, row.unit, row.mean, row.min, row.max),
+        svs_type=svs_type_for_unit(row.unit),
+        unit=row.unit if row.unit else "n/a",
+        hardware_checksum=hardware_checksum,
+        hardware_name=hardware_name,
+        case_id=case_id,
+        context_id=context_id,
+        run_id=row.run_id,
+        context_dict=context_dict,
+        case_text_id=case_text_id,
+        case_dict=case_dict,
+        ui_hardware_short=hardware_short,
+        run_reason=row.run_reason if row.run_reason else "n/a",
+    )
+
+
+def _case_props(case: sqlalchemy.Row) -> Tuple[str, str, Dict]:
+    """
+    Return (name, text ID, case dictionary). The text ID is a textual
+    representation of the case permutation, see `Case.text_id`.
+    """
+    return case.name, case_text_id(case.tags), case.tags
+
+
+def _report_dedup_ratios(builder: BMRTStoreBuilder) -> None:
+    for table, ratio in builder.dedup_ratios().items():
+        conbench.metrics.GAUGE_BMRT_CACHE_DEDUP_RATIO.labels(table=table).set(ratio)
+
+
+def _hardware_props(hardware: sqlalchemy.Row) -> Tuple[str, str, str]:
+    """
+    Return (checksum, name, short UI string) for hardware.
+    """
+    # Current `hardware.hash` is a string (not byte sequence), and does not
+    # have a predictable charset. I hoped it would be just the hexdigest of a
+    # popular hash function. What we have contains user-given data, i.e. the
+    # string is brittle to work with in code and generated documents. E.g. may
+    # not work in JavaScript var declaration statements). Translate this
+    # Conbench business logic "hardware hash" into one with predictable
+    # charset. This is for grouping/sorting purposes, and for building UI. Use
+    # MD5 (fast, unlikely collision, good enough). Can clean up when reworking
+    # hardware/platform/env: https://github.com/conbench/conbench/issues/1340
+    return (
+        hashlib.md5(hardware.hash.encode("utf-8")).hexdigest(),
+        hardware.name,
+        ui_hardware_short(hardware.id, hardware.name),
+    )
+
+
+def _merge_with_cached_results(
+    new_store: BMRTStore, cutoff_ts: float
+) -> Tuple[Optional[BMRTStore], int]:
+    """
+    Merge the results in `new_store` with the cached results and evict old
+    results. Results already in the cache (same ID) are replaced.
+
+    Builds a new store (the current one is not mutated: it may still be used
+    by other threads).
+
+    Return the new store (`None` if nothing changed), and the number of
+    evicted results.
+    """
+    current = _current.store
+
+    replaced = np.isin(current.ids, new_store.ids)
+    keep = ~replaced & (current.started_at > cutoff_ts)
+    new_store = new_store.take(np.flatnonzero(new_store.started_at > cutoff_ts))
+
+    merged = BMRTStore.concat(current.take(np.flatnonzero(keep)), new_store)
+
+    if len(merged) > BMRT_CACHE_SIZE:
+        # Evict the oldest results.
+        newest, _ = np.split(
+            np.argsort(-merged.started_at, kind="stable"), [BMRT_CACHE_SIZE]
+        )
+        merged = merged.take(np.sort(newest))
+
+    n_evicted = len(current) - int(replaced.sum()) + len(new_store) - len(merged)
+
+    if len(new_store) == 0 and n_evicted == 0:
+        # Nothing changed.
+        return None, 0
+
+    return merged, n_evicted
+
+
+def _build_metainfo(store: BMRTStore) -> CacheUpdateMetaInfo:
+    if len(store) == 0:
+        return _init_metainfo
+
+    newest = store.result(int(np.argmax(store.started_at)))
+    oldest = store.result(int(np.argmin(store.started_at)))
+
+    return CacheUpdateMetaInfo(
+        newest_result_time_str=newest.ui_time_started_at,
         covered_timeframe_days_approx=str(
-            (first_result.timestamp - last_result.timestamp).days
+            int((newest.started_at - oldest.started_at) / 86400)
         ),
-        oldest_result_time_str=last_result.ui_time_started_at,
-        n_results=len(by_id_dict),
+        oldest_result_time_str=oldest.ui_time_started_at,
+        n_results=len(store),
     )
 
-    conbench.metrics.GAUGE_BMRT_CACHE_LAST_UPDATE_SECONDS.set(t1 - t0)
 
-    log.info(
-        ("BMRT cache population done (%s results, took %.3f s)"),
-        len(bmrt_cache["by_id"]),
-        t1 - t0,
-    )
+# The initial state (before the first update): empty. Request handlers work
+# with that just fine (they report 'not found', 'no results', etc.).
+_EMPTY_CACHE = _build_cache(BMRTStore.empty(), 0)
+_current = _EMPTY_CACHE
 
 
-def periodically_fetch_last_n_benchmark_results() -> threading.Thread:
+def _newer_high_water_mark(current: Optional[str], result_id: str) -> Optional[str]:
     """
-    Return right after having spawned a thread that triggers periodic action.
+    Return the newer of the two IDs. Ignore IDs that are not UUID7 hex strings
+    (legacy entities may have a different primary key format): these do not
+    have a meaningful sort order.
     """
-    first_sleep_seconds = 3
-    min_delay_between_runs_seconds = 120
+    if not _is_uuid7_hex(result_id):
+        return current
 
-    if Config.TESTING:
-        first_sleep_seconds = 0
-        min_delay_between_runs_seconds = 20
+    if current is None or result_id > current:
+        return result_id
 
-    def _run_forever():
-        delay_s = first_sleep_seconds
+    return current
 
-        while True:
-            # Build responsive sleep loop that inspects SHUTDOWN often.
-            deadline = time.monotonic() + delay_s
-            while time.monotonic() < deadline:
-                if conbench.job.SHUTDOWN:
-                    log.debug("_run_forever: shut down")
-                    return
 
-                time.sleep(0.01)
+def _is_uuid7_hex(s: str) -> bool:
+    # Version nibble is the 13th hex character.
+    return len(s) == 32 and s[12] == "7" and all(c in _HEXCHARS for c in s)
 
-            t0 = time.monotonic()
 
-            # yappi.start()
+_HEXCHARS = frozenset("0123456789abcdef")
 
-            try:
-                # filprofile(lambda: _fetch_and_cache_most_recent_results(), "fil-result")
-                _fetch_and_cache_most_recent_results()
-            except Exception as exc:
-                # For now, log all error detail. (but handle all exceptions; do
-                # some careful log-reading after rolling this out).
-                log.exception("BMRT cache: exception during update: %s", exc)
 
-            # yappi.stop()
-            # yappi_print_threads_stats()
+def _uuid7_hex_lower_bound(uuid7hex: str, shift_seconds: float) -> str:
+    """
+    Return a 32-character hex string that sorts lower than all UUID7 hex
+    strings generated at or after `shift_seconds` before `uuid7hex` was
+    generated.
+
+    The first 48 bits (12 hex characters) of a UUID7 are the time of
+    generation, in milliseconds since epoch.
+    """
+    ms = int(uuid7hex[:12], 16) - int(shift_seconds * 1000)
+    return f"{max(ms, 0):012x}" + "0" * 20
 
-            _FIRST_REFRESH_DONE_EVENT.set()
-            last_call_duration_s = time.monotonic() - t0
 
-            # Goal: spend the majority of the time _not_ doing this thing here.
-            # So, if the last iteration lasted for e.g. ~60 seconds, then keep
-            # waiting for ~five minutes until triggering the next run.
-            delay_s = max(min_delay_between_runs_seconds, 5 * last_call_duration_s)
-            log.info("BMRT cache: trigger next fetch in %.3f s", delay_s)
+def periodically_fetch_last_n_benchmark_results() -> threading.Thread:
+    """
+    Return right after having spawned a thread that triggers periodic action.
+
+    In snapshot mode, that action is loading the newest snapshot (if it
+    changed) instead of querying the database.
+    """
+    first_sleep_seconds = 3
+    # Most updates are incremental (quick, cheap), i.e. this can be short. The
+    # 5x rule below makes sure that the occasional full refresh does not
+    # dominate.
+    min_delay_between_runs_seconds = 15
 
-    t = threading.Thread(target=_run_forever, name="bmrt-cache-refresh")
+    if Config.TESTING:
+        first_sleep_seconds = 0
+        min_delay_between_runs_seconds = 20
+
+    update = _fetch_and_cache_most_recent_results
+    if Config.BMRT_SNAPSHOT_DIR is not None:
+        update = _load_newest_snapshot
+        min_delay_between_runs_seconds = int(BMRT_SNAPSHOT_POLL_INTERVAL_SECONDS)
+
+    # In snapshot mode, there is no need to know about new results: the
+    # snapshot builder does.
+    listener = None
+    if Config.BMRT_SNAPSHOT_DIR is None:
+        listener = _ResultNotificationListener()
+
+    t = threading.Thread(
+        target=_run_forever,
+        args=(update, first_sleep_seconds, min_delay_between_runs_seconds, listener),
+        name="bmrt-cache-refresh",
+    )
     t.start()
     return t
     # GOal: terminate thread cleanly as part of gunicorn's worker process
@@ -462,95 +981,327 @@ def periodically_fetch_last_n_benchmark_results() -> threading.Thread:
     # join the thread.
 
 
-def _generate_tsdf_per_4tuple(
-    by_name_dict: Dict[TBenchmarkName, List[BMRTBenchmarkResult]]
-) -> Tuple[TDict4tdf, TDict4tlist]:
-    t2 = time.monotonic()
-    by_name_dict_with_timeseries_tuplekeys: Dict[
-        TBenchmarkName, Dict[Tuple, List[BMRTBenchmarkResult]]
-    ] = {}
-
-    for bname, results in by_name_dict.items():
-        # The magic time series 4-tuple is
-        # bname, caseid, hwchecksum, ctxid (plus repo, i.e. 5 tuple)
-        by_ts_tuple: Dict[Tuple, List[BMRTBenchmarkResult]] = defaultdict(list)
-        for r in results:
-            by_ts_tuple[(r.case_id, r.context_id, r.hardware_checksum)].append(r)
-        by_name_dict_with_timeseries_tuplekeys[bname] = by_ts_tuple
+def _snapshot_state() -> Dict:
+    return {
+        "high_water_mark": _refresh_state.high_water_mark,
+        "last_full_refresh_unixtime": _refresh_state.last_full_refresh_unixtime,
+    }
 
-    t3 = time.monotonic()
 
-    tsdf_by_4tuple: TDict4tdf = {}
-    bmrlist_by_4tuple: TDict4tlist = {}
-
-    # Brutal, slow, approach: (ideally we find a way to represent all data in a
-    # single dataframe with decent multi-index -- that could be a major speedup
-    # for timeseries analysis on all of these series in a bulk.) one dataframe
-    # per 4-tuple: (bname, case_id, context_id, hardware_checksum).
-    # I have seen this below DF construction loop to take 3 seconds for 2*10^5
-    # results.
-    for bname, unsorted_timeseries in by_name_dict_with_timeseries_tuplekeys.items():
-        for (
-            case_id,
-            context_id,
-            hardware_checksum,
-        ), usresults in unsorted_timeseries.items():
-            # Think: `usresults` is a list not yet sorted by time.
-
-            df = pd.DataFrame(
-                # Note(jp:): cannot use a generator expression here, len needs
-                # to be known.
-                {"svs": [r.svs for r in usresults]},
-                # Note(jp): also no generator expression possible. The
-                # `unit="s"` is the critical ingredient to convert this list of
-                # floaty unix timestamps to datetime representation. `utc=True`
-                # is required to localize the pandas DateTimeIndex to UTC
-                # (input is tz-naive).
-                index=pd.to_datetime(
-                    [r.started_at for r in usresults], unit="s", utc=True
-                ),
-            )
-            # Sort by time.
-            df = df.sort_index()
-            df.index.rename("time", inplace=True)
-            tsdf_by_4tuple[(bname, case_id, context_id, hardware_checksum)] = df
-            bmrlist_by_4tuple[(bname, case_id, context_id, hardware_checksum)] = (
-                usresults
-            )
+def _warm_start(rootdir: str) -> bool:
+    """
+    Load and publish the newest snapshot in `rootdir`, and restore the refresh
+    state written along with it. After that, the next update is an
+    incremental one (unless a full refresh is due anyway).
+
+    Return `True` if that worked. Return `False` if there is no usable
+    snapshot (then a full refresh is required).
+    """
+    gen = conbench.bmrtsnapshot.newest_generation(rootdir)
+    if gen is None:
+        log.info("BMRT cache warm start: no snapshot in %s", rootdir)
+        return False
+
+    t0 = time.monotonic()
+    try:
+        state = conbench.bmrtsnapshot.load_generation_state(rootdir, gen)
+        store = conbench.bmrtsnapshot.load_generation(rootdir, gen)
+    except Exception as exc:
+        # For example: snapshot written by a different version of Conbench
+        # (incompatible format), or a partial/corrupt file.
+        log.warning("BMRT cache warm start: cannot load snapshot %s: %s", gen, exc)
+        return False
+
+    hwm = state.get("high_water_mark")
+    if hwm is None or not _is_uuid7_hex(hwm):
+        log.info("BMRT cache warm start: snapshot %s has no high-water mark", gen)
+        return False
+
+    _publish(store)
+    _report_cache_size(_current)
+
+    _refresh_state.high_water_mark = hwm
+    # Translate wall-clock time of the last full refresh into this process'
+    # monotonic clock, so that the full refresh schedule carries over.
+    full_ts = float(state.get("last_full_refresh_unixtime", 0.0))
+    _refresh_state.last_full_refresh_unixtime = full_ts
+    _refresh_state.last_full_refresh_monotonic = time.monotonic() - (
+        time.time() - full_ts
+    )
+    # No need to write this back right away.
+    _refresh_state.last_persisted_store = store
+    _refresh_state.last_persisted_monotonic = time.monotonic()
 
-    t4 = time.monotonic()
-    log.info("BMRT cache pop: quadratic sort loop took %.3f s", t3 - t2)
     log.info(
-        "BMRT cache pop: df constr took %.3f s (%s time series)",
-        t4 - t3,
-        len(tsdf_by_4tuple),
+        "BMRT cache warm start: published snapshot %s (%s results) in %.3f s",
+        gen,
+        len(store),
+        time.monotonic() - t0,
     )
+    return True
 
-    # The following comment is provides insight into the structure of the
-    # return value. It shows one example for the key (4-tuple) and
-    # corresponding value (and its properties; Index, h)
-
-    # for i, (t4, dffff) in enumerate(tsdf_per_4tuple.items()):
-    #     if i % 1000 == 0:
-    #         print(t4)
-    #         print(dffff)
-    # ('tpch-foobar', '750317efddda4b76a80f72d9ac44f882', 'c99e3d44ccf9415996209006244d6b10', '31ce04b765d44f32a4f2c6a7762e2ddb')
-    #                                             svs
-    # 2022-09-28 02:25:54.315165043+00:00   93.072853
-    # 2022-09-28 10:32:56.099033117+00:00  100.253622
-    # 2022-09-28 13:51:49.347893+00:00     102.833077
-    # 2022-09-28 15:57:35.356076002+00:00   99.807175
-    # 2022-09-28 17:06:46.327281952+00:00  102.777138
-    # 2022-09-28 17:14:14.036443949+00:00  100.854897
-    # 2022-09-28 20:08:16.950268984+00:00   99.565141
-    # 2022-09-28 20:10:27.393528938+00:00   93.057321
-    # 2022-09-29 00:02:27.419251919+00:00   99.077197
-    # 2022-09-29 00:17:44.202492952+00:00   96.842827
-    # 2022-09-29 02:26:19.996010065+00:00   91.103735
-    # 2022-09-29 03:18:40.925746918+00:00         NaN
-    # 2022-09-29 03:52:28.406414986+00:00         NaN
-
-    return tsdf_by_4tuple, bmrlist_by_4tuple
+
+def _persist_for_warm_start(rootdir: str) -> None:
+    """
+    Write the current cache state to `rootdir` if it changed since last
+    written, and if the last write is longer than
+    BMRT_WARM_START_WRITE_INTERVAL_SECONDS ago.
+    """
+    store = _current.store
+    if store is _refresh_state.last_persisted_store:
+        return
+
+    since_last_s = time.monotonic() - _refresh_state.last_persisted_monotonic
+    if (
+        _refresh_state.last_persisted_store is not None
+        and since_last_s < BMRT_WARM_START_WRITE_INTERVAL_SECONDS
+    ):
+        return
+
+    t0 = time.monotonic()
+    try:
+        gen = conbench.bmrtsnapshot.write_generation(rootdir, store, _snapshot_state())
+    except OSError as exc:
+        log.warning("BMRT cache: could not persist snapshot to %s: %s", rootdir, exc)
+        return
+
+    _refresh_state.last_persisted_store = store
+    _refresh_state.last_persisted_monotonic = time.monotonic()
+    log.info(
+        "BMRT cache: persisted snapshot %s (%s results) in %.3f s",
+        gen,
+        len(store),
+        time.monotonic() - t0,
+    )
+
+
+def run_snapshot_builder(rootdir: str) -> None:
+    """
+    Run the snapshot builder loop in the calling thread (until shutdown is
+    requested, see conbench.job): keep the cache up-to-date with the database,
+    and write a new snapshot generation to `rootdir` whenever it changed.
+    """
+    global _snapshot_builder_mode
+    _snapshot_builder_mode = True
+
+    last_written: Optional[BMRTStore] = None
+
+    # Warm start from the newest generation written by a previous instance of
+    # the builder.
+    if _warm_start(rootdir):
+        last_written = _current.store
+
+    def _update_and_write():
+        nonlocal last_written
+        _fetch_and_cache_most_recent_results()
+
+        store = _current.store
+        if store is last_written:
+            log.info("BMRT snapshot builder: no change, do not write snapshot")
+            return
+
+        t0 = time.monotonic()
+        gen = conbench.bmrtsnapshot.write_generation(rootdir, store, _snapshot_state())
+        last_written = store
+        log.info(
+            "BMRT snapshot builder: wrote generation %s (%s results) in %.3f s",
+            gen,
+            len(store),
+            time.monotonic() - t0,
+        )
+
+    _run_forever(_update_and_write, 0, 15, _ResultNotificationListener())
+
+
+def _load_newest_snapshot() -> None:
+    """
+    Publish the newest snapshot generation found on disk, if it is not already
+    published.
+    """
+    rootdir = Config.BMRT_SNAPSHOT_DIR
+    assert rootdir is not None
+
+    gen = conbench.bmrtsnapshot.newest_generation(rootdir)
+    if gen is None:
+        log.info("BMRT cache: no snapshot found in %s yet", rootdir)
+        return
+
+    if gen == _refresh_state.snapshot_generation:
+        return
+
+    t0 = time.monotonic()
+    store = conbench.bmrtsnapshot.load_generation(rootdir, gen)
+    _publish(store, generation=gen)
+    _refresh_state.snapshot_generation = gen
+    _report_cache_size(_current)
+
+    conbench.metrics.GAUGE_BMRT_CACHE_LAST_UPDATE_SECONDS.set(time.monotonic() - t0)
+    log.info(
+        "BMRT cache: published snapshot generation %s (%s results) in %.3f s",
+        gen,
+        len(store),
+        time.monotonic() - t0,
+    )
+
+
+class _ResultNotificationListener:
+    """
+    Receive notifications about newly created benchmark results (see
+    BENCHMARK_RESULT_CREATED_CHANNEL) on a dedicated database connection.
+
+    Only to be used from one thread. If the connection cannot be established
+    (or breaks), `listening` is `False`: the caller is expected to fall back to
+    polling. Re-connecting is attempted every now and then.
+    """
+
+    def __init__(self) -> None:
+        self._conn: Optional[psycopg2.extensions.connection] = None
+        self._last_connect_attempt_monotonic = -BMRT_NOTIFY_RECONNECT_INTERVAL_SECONDS
+
+    @property
+    def listening(self) -> bool:
+        return self._conn is not None
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Wait for notifications (at most `timeout` seconds), and consume them.
+
+        Return `True` if there was at least one notification. Also return
+        `True` right after (re-)establishing the connection: results might have
+        been created while not listening.
+        """
+        if self._conn is None:
+            since_attempt_s = time.monotonic() - self._last_connect_attempt_monotonic
+            if since_attempt_s >= BMRT_NOTIFY_RECONNECT_INTERVAL_SECONDS:
+                if self._connect():
+                    return True
+            time.sleep(timeout)
+            return False
+
+        try:
+            readable, _, _ = select.select([self._conn], [], [], timeout)
+            if not readable:
+                return False
+            self._conn.poll()
+        except (psycopg2.Error, OSError) as exc:
+            log.warning("BMRT cache: lost notification listener connection: %s", exc)
+            self.close()
+            return False
+
+        n_received = len(self._conn.notifies)
+        self._conn.notifies.clear()
+        return n_received > 0
+
+    def _connect(self) -> bool:
+        self._last_connect_attempt_monotonic = time.monotonic()
+        try:
+            assert conbench.db.engine is not None, "DB engine not configured"
+            pooled = conbench.db.engine.raw_connection()
+            # This connection is used for the lifetime of the process: take it
+            # out of the pool.
+            pooled.detach()
+            conn = pooled.dbapi_connection
+            assert conn is not None
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {BENCHMARK_RESULT_CREATED_CHANNEL}")
+        except Exception as exc:
+            log.warning(
+                "BMRT cache: cannot listen for notifications, poll instead: %s", exc
+            )
+            return False
+
+        self._conn = conn
+        log.info("BMRT cache: listening on %s", BENCHMARK_RESULT_CREATED_CHANNEL)
+        return True
+
+    def close(self) -> None:
+        if self._conn is None:
+            return
+        try:
+            self._conn.close()
+        except psycopg2.Error:
+            pass
+        self._conn = None
+
+
+def _run_forever(
+    update: Callable[[], None],
+    first_sleep_seconds: float,
+    min_delay_between_runs_seconds: float,
+    listener: Optional[_ResultNotificationListener] = None,
+) -> None:
+    """
+    Call `update` over and over again (until shutdown is requested).
+
+    With `listener`: do not wait for the regular delay when a new benchmark
+    result was created. Update a few seconds later instead (debounced).
+    """
+    delay_s = first_sleep_seconds
+    # Minimal delay when notified (see below).
+    notified_delay_s = 0.0
+
+    while True:
+        # Build responsive sleep loop that inspects SHUTDOWN often.
+        t_wait_start = time.monotonic()
+        deadline = t_wait_start + delay_s
+        notified = False
+        while time.monotonic() < deadline:
+            if conbench.job.SHUTDOWN:
+                log.debug("_run_forever: shut down")
+                if listener is not None:
+                    listener.close()
+                return
+
+            if listener is None:
+                time.sleep(0.01)
+                continue
+
+            if listener.wait(0.01) and not notified:
+                notified = True
+                deadline = min(
+                    deadline,
+                    max(
+                        time.monotonic() + BMRT_NOTIFY_DEBOUNCE_SECONDS,
+                        t_wait_start + notified_delay_s,
+                    ),
+                )
+
+        t0 = time.monotonic()
+
+        # yappi.start()
+
+        try:
+            # filprofile(lambda: _fetch_and_cache_most_recent_results(), "fil-result")
+            update()
+        except Exception as exc:
+            # For now, log all error detail. (but handle all exceptions; do
+            # some careful log-reading after rolling this out).
+            log.exception("BMRT cache: exception during update: %s", exc)
+
+        # yappi.stop()
+        # yappi_print_threads_stats()
+
+        _FIRST_REFRESH_DONE_EVENT.set()
+        last_call_duration_s = time.monotonic() - t0
+
+        # Goal: spend the majority of the time _not_ doing this thing here.
+        # So, if the last iteration lasted for e.g. ~60 seconds, then keep
+        # waiting for ~five minutes until triggering the next run.
+        delay_s = max(min_delay_between_runs_seconds, 5 * last_call_duration_s)
+
+        # When notified about new results, the usual minimum delay between
+        # runs does not apply (but the 5x rule does). While listening, polling
+        # is just a fallback.
+        notified_delay_s = 5 * last_call_duration_s
+        if listener is not None and listener.listening:
+            delay_s = max(delay_s, BMRT_NOTIFY_FALLBACK_POLL_INTERVAL_SECONDS)
+            log.info(
+                "BMRT cache: trigger next fetch upon notification, or in %.3f s",
+                delay_s,
+            )
+        else:
+            log.info("BMRT cache: trigger next fetch in %.3f s", delay_s)
 
 
 # def yappi_print_threads_stats():
@@ -0,0 +1,153 @@
+"""
+Generation-numbered on-disk snapshots of the BMRT cache.
+
+When `Config.BMRT_SNAPSHOT_DIR` is set, the BMRT cache is populated by a
+dedicated builder process (run `python -m conbench.bmrtsnapshot`) instead of
+by each web application process. The builder periodically updates its own copy
+of the cache from the database and writes it into a new generation directory:
+
+    <BMRT_SNAPSHOT_DIR>/gen-000000000042/{ids.npy, samples.npy, ..., meta.json}
+
+A generation directory is written under a temporary name and then renamed;
+i.e. a directory with the `gen-` prefix is always complete. The web
+application processes poll for the newest generation and memory-map its arrays
+read-only. That means:
+
+- the HTTP-handling threads do not compete (GIL) with a thread that consumes
+  and processes millions of database rows.
+- the (large) arrays exist only once in memory per host (page cache), no
+  matter how many web application processes map them.
+
+Older generations are deleted by the builder. That is fine for processes that
+still have them mapped (on POSIX systems, the data stays accessible until the
+last mapping goes away).
+
+The same format is used for warm-starting the BMRT cache after a process
+restart (see `Config.BMRT_WARM_START_DIR`). A generation can carry a small
+JSON document with refresh state (e.g. the high-water mark) for that purpose.
+"""
+
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+from typing import Dict, List, Optional
+
+from conbench.bmrtstore import BMRTStore
+
+log = logging.getLogger(__name__)
+
+# Number of generations to keep on disk (the newest ones).
+BMRT_SNAPSHOT_KEEP_GENERATIONS = 3
+
+_GEN_DIR_REGEX = re.compile(r"^gen-(\d{12})$")
+
+
+def _gen_dirname(generation: int) -> str:
+    return f"gen-{generation:012d}"
+
+
+def list_generations(rootdir: str) -> List[int]:
+    """
+    Return the numbers of all complete generations in `rootdir`, sorted
+    ascending. Return an empty list if `rootdir` does not exist.
+    """
+    try:
+        names = os.listdir(rootdir)
+    except FileNotFoundError:
+        return []
+
+    gens = []
+    for name in names:
+        m = _GEN_DIR_REGEX.match(name)
+        if m:
+            gens.append(int(m.group(1)))
+    return sorted(gens)
+
+
+def newest_generation(rootdir: str) -> Optional[int]:
+    gens = list_generations(rootdir)
+    if not gens:
+        return None
+    return gens[-1]
+
+
+def write_generation(
+    rootdir: str, store: BMRTStore, state: Optional[Dict] = None
+) -> int:
+    """
+    Write `store` (and optionally the JSON-serializable `state`) as new
+    generation into `rootdir` and return the generation number. Delete old
+    generations.
+
+    This assumes that there is only one writer per `rootdir`.
+    """
+    os.makedirs(rootdir, exist_ok=True)
+
+    newest = newest_generation(rootdir)
+    generation = 1 if newest is None else newest + 1
+
+    # Write to a temporary directory next to the final location (same file
+    # system), then atomically rename.
+    tmpdir = tempfile.mkdtemp(prefix=".tmp-gen-", dir=rootdir)
+    try:
+        store.save(tmpdir)
+        if state is not None:
+            with open(os.path.join(tmpdir, "state.json"), "w", encoding="utf-8") as f:
+                json.dump(state, f)
+        os.rename(tmpdir, os.path.join(rootdir, _gen_dirname(generation)))
+    except BaseException:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+        raise
+
+    for old in list_generations(rootdir)[:-BMRT_SNAPSHOT_KEEP_GENERATIONS]:
+        shutil.rmtree(os.path.join(rootdir, _gen_dirname(old)), ignore_errors=True)
+
+    return generation
+
+
+def load_generation(rootdir: str, generation: int) -> BMRTStore:
+    """
+    Load the given generation, with arrays memory-mapped read-only.
+    """
+    return BMRTStore.load(os.path.join(rootdir, _gen_dirname(generation)), mmap=True)
+
+
+def load_generation_state(rootdir: str, generation: int) -> Dict:
+    """
+    Return the state document written along with the given generation (empty
+    dictionary if there is none).
+    """
+    path = os.path.join(rootdir, _gen_dirname(generation), "state.json")
+    try:
+        with open(path, "rb") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def main():
+    # Import here: the web application imports this module (for loading
+    # snapshots), and does not need the builder machinery.
+    import conbench.bmrt
+    import conbench.logger
+    from conbench.config import Config
+    from conbench.db import configure_engine
+
+    conbench.logger.setup(
+        level_stderr=Config.LOG_LEVEL_STDERR,
+        level_file=Config.LOG_LEVEL_FILE,
+        level_sqlalchemy=Config.LOG_LEVEL_SQLALCHEMY,
+    )
+
+    if Config.BMRT_SNAPSHOT_DIR is None:
+        raise SystemExit("CONBENCH_BMRT_SNAPSHOT_DIR is required but not set")
+
+    configure_engine(Config.SQLALCHEMY_DATABASE_URI)
+    conbench.bmrt.run_snapshot_builder(Config.BMRT_SNAPSHOT_DIR)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,911 @@
+"""
+Columnar storage engine for the BMRT cache (see conbench/bmrt.py).
+
+Instead of keeping one Python object (with ~20 Python objects attached to it)
+per benchmark result, all results are stored in a small number of numpy
+arrays:
+
+- float64 arrays for `svs` and `started_at`
+- integer-coded categorical columns for string properties with low
+  cardinality (benchmark name, case ID, context ID, hardware checksum, run ID,
+  unit, ...): one int32 array of codes plus one (short) list of labels
+- a flat float64 buffer holding the samples (`data`) of all results, plus an
+  offsets array (the samples of result `i` are
+  `samples[sample_offsets[i]:sample_offsets[i+1]]`)
+- a fixed-width bytes array for the result IDs; rows are sorted by ID so that
+  looking up a result by ID is a binary search.
+
+Objects representing individual results (`BMRTBenchmarkResult`) are thin views
+(store reference plus row number) that are built on demand, for example when
+rendering a template. Collections of results (`ResultList`) are views, too
+(store reference plus an array of row numbers).
+
+A `BMRTStore` is never mutated after construction. Updating the cache means
+building a new store (see `BMRTStore.concat()` and `BMRTStore.take()`).
+
+A store can be written to a directory (one .npy file per array, plus a JSON
+document for label tables and case/context dictionaries) and loaded from there
+with the arrays memory-mapped read-only (see `BMRTStore.save()` and
+`BMRTStore.load()`). That allows for sharing one copy of the cache across
+processes, see conbench/bmrtsnapshot.py.
+"""
+
+import json
+import os
+import sys
+from collections.abc import Mapping
+from datetime import datetime
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+    overload,
+)
+
+import numpy as np
+import pandas as pd
+
+import conbench.util
+from conbench.entities.benchmark_result import ui_mean_and_uncertainty, ui_rel_sem
+
+T = TypeVar("T")
+
+# Names of the integer-coded categorical columns.
+CATEGORICAL_COLUMNS = (
+    "benchmark_name",
+    "case_id",
+    "context_id",
+    "hardware_checksum",
+    "hardware_name",
+    "ui_hardware_short",
+    "run_id",
+    "run_reason",
+    "unit",
+    "svs_type",
+)
+
+# Names of the (non-categorical) array attributes of BMRTStore.
+ARRAY_ATTRIBUTES = (
+    "ids",
+    "started_at",
+    "svs",
+    "n_nonnull_samples",
+    "sample_offsets",
+    "samples",
+)
+
+# Bump this when changing the on-disk layout written by `BMRTStore.save()`.
+SNAPSHOT_FORMAT_VERSION = 1
+
+# Number of items to look at when estimating the memory consumption of a
+# (large) collection of Python objects.
+SIZEOF_SAMPLE_SIZE = 200
+
+
+def approx_sizeof_items(
+    items: Sequence, sizeof: Callable[[Any], int] = sys.getsizeof
+) -> int:
+    """
+    Estimate the total size (bytes) of the objects in `items` by applying
+    `sizeof` to (at most) SIZEOF_SAMPLE_SIZE evenly spaced items.
+
+    The default `sizeof` only counts the objects themselves (for example,
+    tuples referring to strings that are accounted for elsewhere). Use
+    `deep_sizeof` to also count contained objects.
+    """
+    n = len(items)
+    if n == 0:
+        return 0
+
+    step = max(1, n // SIZEOF_SAMPLE_SIZE)
+    sample = [items[i] for i in range(0, n, step)]
+    return int(sum(sizeof(o) for o in sample) / len(sample) * n)
+
+
+def deep_sizeof(o: Any) -> int:
+    """
+    Return the size of `o` including the objects contained in (nested)
+    dictionaries, lists and tuples.
+    """
+    size = sys.getsizeof(o)
+    if isinstance(o, dict):
+        size += sum(deep_sizeof(k) + deep_sizeof(v) for k, v in o.items())
+    elif isinstance(o, (list, tuple)):
+        size += sum(deep_sizeof(v) for v in o)
+    return size
+
+
+class BMRTStore:
+    """
+    Immutable collection of benchmark results, stored column by column.
+
+    Use `BMRTStoreBuilder` for building an instance from individual results.
+    """
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        started_at: np.ndarray,
+        svs: np.ndarray,
+        n_nonnull_samples: np.ndarray,
+        sample_offsets: np.ndarray,
+        samples: np.ndarray,
+        codes: Dict[str, np.ndarray],
+        labels: Dict[str, List[str]],
+        case_dicts: Dict[str, Dict],
+        case_text_ids: Dict[str, str],
+        context_dicts: Dict[str, Dict],
+    ):
+        # Invariant: rows are sorted by ID.
+        self.ids = ids
+        # POSIX timestamps.
+        self.started_at = started_at
+        self.svs = svs
+        self.n_nonnull_samples = n_nonnull_samples
+        self.sample_offsets = sample_offsets
+        self.samples = samples
+        self.codes = codes
+        self.labels = labels
+        # Keyed by case ID / context ID. These dictionaries are shared across
+        # all results with the same case / context.
+        self.case_dicts = case_dicts
+        self.case_text_ids = case_text_ids
+        self.context_dicts = context_dicts
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def empty(cls) -> "BMRTStore":
+        return BMRTStoreBuilder().build()
+
+    def label(self, column: str, row: int) -> str:
+        return self.labels[column][self.codes[column][row]]
+
+    def result(self, row: int) -> "BMRTBenchmarkResult":
+        return BMRTBenchmarkResult(self, row)
+
+    def row_for_id(self, result_id: str) -> Optional[int]:
+        """
+        Return row number for result ID, or `None` if not in this store.
+        """
+        try:
+            needle = result_id.encode("ascii")
+        except UnicodeEncodeError:
+            return None
+
+        row = int(np.searchsorted(self.ids, needle))
+        if row < len(self.ids) and self.ids[row] == needle:
+            return row
+        return None
+
+    def samples_for_row(self, row: int) -> np.ndarray:
+        start, end = self.sample_offsets[row], self.sample_offsets[row + 1]
+        return self.samples[start:end]
+
+    def take(self, rows: np.ndarray) -> "BMRTStore":
+        """
+        Return new store with a subset of rows. `rows` must be sorted
+        (ascending) to maintain the sort-by-ID invariant.
+
+        Label tables are shared with this store (they may then contain labels
+        that are not used anymore, that is fine).
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        starts = self.sample_offsets[rows]
+        lengths = self.sample_offsets[rows + 1] - starts
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        # Gather the variable-length segments of the flat samples buffer:
+        # position j in the output buffer reads from
+        # starts[k] + (j - offsets[k]) where k is the row the position
+        # belongs to.
+        sample_idx = np.repeat(starts - offsets[:-1], lengths) + np.arange(
+            offsets[-1], dtype=np.int64
+        )
+
+        return BMRTStore(
+            ids=self.ids[rows],
+            started_at=self.started_at[rows],
+            svs=self.svs[rows],
+            n_nonnull_samples=self.n_nonnull_samples[rows],
+            sample_offsets=offsets,
+            samples=self.samples[sample_idx],
+            codes={col: c[rows] for col, c in self.codes.items()},
+            labels=self.labels,
+            case_dicts=self.case_dicts,
+            case_text_ids=self.case_text_ids,
+            context_dicts=self.context_dicts,
+        )
+
+    @staticmethod
+    def concat(a: "BMRTStore", b: "BMRTStore") -> "BMRTStore":
+        """
+        Return a new store containing the rows of both `a` and `b` (sorted by
+        ID). The caller must make sure that IDs are unique across both.
+        """
+        labels: Dict[str, List[str]] = {}
+        codes: Dict[str, np.ndarray] = {}
+        for col in CATEGORICAL_COLUMNS:
+            # Extend label table of `a` with labels only seen in `b`, and
+            # translate codes of `b` into the extended label table.
+            merged_labels = list(a.labels[col])
+            code_by_label = {label: i for i, label in enumerate(merged_labels)}
+            translation = np.empty(len(b.labels[col]), dtype=np.int32)
+            for i, label in enumerate(b.labels[col]):
+                if label not in code_by_label:
+                    code_by_label[label] = len(merged_labels)
+                    merged_labels.append(label)
+                translation[i] = code_by_label[label]
+            labels[col] = merged_labels
+            codes[col] = np.concatenate(
+                [a.codes[col], translation[b.codes[col]]]
+            ).astype(np.int32)
+
+        offsets = np.concatenate(
+            [a.sample_offsets, b.sample_offsets[1:] + a.sample_offsets[-1]]
+        )
+
+        unsorted = BMRTStore(
+            ids=np.concatenate([a.ids, b.ids]),
+            started_at=np.concatenate([a.started_at, b.started_at]),
+            svs=np.concatenate([a.svs, b.svs]),
+            n_nonnull_samples=np.concatenate(
+                [a.n_nonnull_samples, b.n_nonnull_samples]
+            ),
+            sample_offsets=offsets,
+            samples=np.concatenate([a.samples, b.samples]),
+            codes=codes,
+            labels=labels,
+            case_dicts=a.case_dicts | b.case_dicts,
+            case_text_ids=a.case_text_ids | b.case_text_ids,
+            context_dicts=a.context_dicts | b.context_dicts,
+        )
+
+        # Restore sort-by-ID invariant. In the common case (new results have
+        # newer UUID7 IDs) this is already sorted.
+        if len(unsorted) > 1 and np.any(unsorted.ids[1:] < unsorted.ids[:-1]):
+            return unsorted.take(np.argsort(unsorted.ids, kind="stable"))
+        return unsorted
+
+    def save(self, dirpath: str) -> None:
+        """
+        Write this store to the (existing, empty) directory `dirpath`.
+        """
+        for attr in ARRAY_ATTRIBUTES:
+            np.save(os.path.join(dirpath, f"{attr}.npy"), getattr(self, attr))
+
+        for col in CATEGORICAL_COLUMNS:
+            np.save(os.path.join(dirpath, f"codes_{col}.npy"), self.codes[col])
+
+        with open(os.path.join(dirpath, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "format_version": SNAPSHOT_FORMAT_VERSION,
+                    "labels": self.labels,
+                    "case_dicts": self.case_dicts,
+                    "case_text_ids": self.case_text_ids,
+                    "context_dicts": self.context_dicts,
+                },
+                f,
+            )
+
+    @classmethod
+    def load(cls, dirpath: str, mmap: bool = True) -> "BMRTStore":
+        """
+        Load a store written by `save()`. With `mmap=True` the arrays are
+        memory-mapped read-only: the data is not copied into the memory of this
+        process (but shared via the page cache with all other processes mapping
+        the same files).
+
+        Raise `ValueError` if the snapshot was written in an incompatible
+        format.
+        """
+        mmap_mode: Any = "r" if mmap else None
+
+        with open(os.path.join(dirpath, "meta.json"), "rb") as f:
+            meta = json.load(f)
+
+        if meta.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(
+                f"unsupported snapshot format version: {meta.get('format_version')}"
+            )
+
+        def _load(name: str) -> np.ndarray:
+            return np.load(os.path.join(dirpath, f"{name}.npy"), mmap_mode=mmap_mode)
+
+        arrays = {attr: _load(attr) for attr in ARRAY_ATTRIBUTES}
+        return cls(
+            codes={col: _load(f"codes_{col}") for col in CATEGORICAL_COLUMNS},
+            labels=meta["labels"],
+            case_dicts=meta["case_dicts"],
+            case_text_ids=meta["case_text_ids"],
+            context_dicts=meta["context_dicts"],
+            **arrays,
+        )
+
+    def group_index(self, *columns: str) -> "GroupIndex":
+        return GroupIndex(self, columns)
+
+    def series_frame(self, *columns: str) -> "TimeseriesFrame":
+        return TimeseriesFrame(self, columns)
+
+    def approx_nbytes(self) -> int:
+        """
+        Return the size of the numpy arrays in this store (ignoring label
+        tables and case/context dictionaries).
+        """
+        arrays = [getattr(self, attr) for attr in ARRAY_ATTRIBUTES]
+        arrays += list(self.codes.values())
+        return sum(a.nbytes for a in arrays)
+
+    def approx_object_nbytes(self) -> int:
+        """
+        Estimate the size of the Python objects in this store: label tables
+        and case/context dictionaries (by sampling).
+        """
+        size = sum(approx_sizeof_items(lbls) for lbls in self.labels.values())
+        for d in (self.case_dicts, self.case_text_ids, self.context_dicts):
+            size += sys.getsizeof(d) + approx_sizeof_items(
+                list(d.values()), deep_sizeof
+            )
+        return size
+
+
+class BMRTStoreBuilder:
+    """
+    Collect benchmark results one by one (in any order), then build a
+    `BMRTStore` from them.
+    """
+
+    def __init__(self):
+        self._ids: List[str] = []
+        self._started_at: List[float] = []
+        self._svs: List[float] = []
+        self._n_nonnull_samples: List[int] = []
+        self._sample_lengths: List[int] = []
+        self._samples: List[float] = []
+        self._codes: Dict[str, List[int]] = {c: [] for c in CATEGORICAL_COLUMNS}
+        self._code_by_label: Dict[str, Dict[str, int]] = {
+            c: {} for c in CATEGORICAL_COLUMNS
+        }
+        self._case_dicts: Dict[str, Dict] = {}
+        self._case_text_ids: Dict[str, str] = {}
+        self._context_dicts: Dict[str, Dict] = {}
+        # Dedup (interning) tables, see `intern()`: table name -> (key ->
+        # canonical object). These live as long as this builder, i.e. for one
+        # cache refresh.
+        self._intern_tables: Dict[str, Dict[str, Any]] = {}
+        self._intern_lookups: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def intern(self, table: str, key: str, factory: Callable[[], T]) -> T:
+        """
+        Return the canonical object for `key` in the dedup table `table`.
+
+        `factory()` is called for building that object only when `key` was
+        not seen before by this builder. That is, all results sharing the same
+        key (e.g. case ID) share the same object, and the (potentially
+        expensive) construction happens once per key instead of once per
+        result.
+        """
+        self._intern_lookups[table] = self._intern_lookups.get(table, 0) + 1
+        entries = self._intern_tables.setdefault(table, {})
+        if key not in entries:
+            entries[key] = factory()
+        return entries[key]
+
+    def dedup_ratios(self) -> Dict[str, float]:
+        """
+        Return the dedup ratio (number of lookups / number of distinct
+        values) for each dedup table, and for each categorical column (where
+        the number of lookups is the number of results).
+        """
+        ratios = {
+            table: self._intern_lookups[table] / len(entries)
+            for table, entries in self._intern_tables.items()
+            if entries
+        }
+        for col, code_by_label in self._code_by_label.items():
+            if code_by_label:
+                ratios[col] = len(self._ids) / len(code_by_label)
+        return ratios
+
+    def append(
+        self,
+        *,
+        id: str,
+        started_at: float,
+        svs: float,
+        data: List[float],
+        n_nonnull_samples: int,
+        case_dict: Dict,
+        case_text_id: str,
+        context_dict: Dict,
+        **categoricals: str,
+    ) -> None:
+        """
+        `categoricals` must contain one value for each of
+        CATEGORICAL_COLUMNS.
+        """
+        self._ids.append(id)
+        self._started_at.append(started_at)
+        self._svs.append(svs)
+        self._n_nonnull_samples.append(n_nonnull_samples)
+        self._sample_lengths.append(len(data))
+        self._samples.extend(data)
+
+        for col in CATEGORICAL_COLUMNS:
+            value = categoricals[col]
+            code_by_label = self._code_by_label[col]
+            code = code_by_label.get(value)
+            if code is None:
+                code = len(code_by_label)
+                code_by_label[value] = code
+            self._codes[col].append(code)
+
+        # Keep one dictionary object per case / context ID.
+        case_id = categoricals["case_id"]
+        if case_id not in self._case_dicts:
+            self._case_dicts[case_id] = case_dict
+            self._case_text_ids[case_id] = case_text_id
+
+        context_id = categoricals["context_id"]
+        if context_id not in self._context_dicts:
+            self._context_dicts[context_id] = context_dict
+
+    def build(self) -> BMRTStore:
+        offsets = np.zeros(len(self._ids) + 1, dtype=np.int64)
+        np.cumsum(np.array(self._sample_lengths, dtype=np.int64), out=offsets[1:])
+
+        store = BMRTStore(
+            # Fixed-width bytes (ASCII) instead of Python str objects. Use at
+            # least width 1 (numpy cannot create an empty S0 array).
+            ids=np.array(
+                [i.encode("ascii") for i in self._ids],
+                dtype=f"S{max([1] + [len(i) for i in self._ids])}",
+            ),
+            started_at=np.array(self._started_at, dtype=np.float64),
+            svs=np.array(self._svs, dtype=np.float64),
+            n_nonnull_samples=np.array(self._n_nonnull_samples, dtype=np.int32),
+            sample_offsets=offsets,
+            samples=np.array(self._samples, dtype=np.float64),
+            codes={
+                col: np.array(codes, dtype=np.int32)
+                for col, codes in self._codes.items()
+            },
+            labels={
+                col: list(code_by_label)
+                for col, code_by_label in self._code_by_label.items()
+            },
+            case_dicts=self._case_dicts,
+            case_text_ids=self._case_text_ids,
+            context_dicts=self._context_dicts,
+        )
+
+        if len(store) > 1:
+            return store.take(np.argsort(store.ids, kind="stable"))
+        return store
+
+
+class BMRTBenchmarkResult:
+    """
+    Thin view on one row in a `BMRTStore`; built on demand.
+
+    There is conceptual duplication between the class BenchmarkResult and this
+    class BMRTBenchmarkResult. Fundamentally, it might make sense that we have
+    two types of classes, with distinct values:
+    - one for database abstraction (the 'big instances', mutable, ...)
+    - one for data mangling (small mem footprint, immutable, ...)
+    """
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store: BMRTStore, row: int):
+        self._store = store
+        self._row = row
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, BMRTBenchmarkResult):
+            return NotImplemented
+        return self.id == other.id
+
+    def __hash__(self) -> int:
+        return hash(self.id)
+
+    def __repr__(self) -> str:
+        return f"<BMRTBenchmarkResult {self.id}>"
+
+    @property
+    def id(self) -> str:
+        return self._store.ids[self._row].decode("ascii")
+
+    @property
+    def benchmark_name(self) -> str:
+        return self._store.label("benchmark_name", self._row)
+
+    @property
+    def case_id(self) -> str:
+        return self._store.label("case_id", self._row)
+
+    @property
+    def context_id(self) -> str:
+        return self._store.label("context_id", self._row)
+
+    @property
+    def run_id(self) -> str:
+        return self._store.label("run_id", self._row)
+
+    @property
+    def hardware_checksum(self) -> str:
+        return self._store.label("hardware_checksum", self._row)
+
+    @property
+    def hardware_name(self) -> str:
+        return self._store.label("hardware_name", self._row)
+
+    @property
+    def ui_hardware_short(self) -> str:
+        return self._store.label("ui_hardware_short", self._row)
+
+    @property
+    def run_reason(self) -> str:
+        return self._store.label("run_reason", self._row)
+
+    @property
+    def unit(self) -> str:
+        return self._store.label("unit", self._row)
+
+    @property
+    def svs_type(self) -> str:
+        return self._store.label("svs_type", self._row)
+
+    @property
+    def case_dict(self) -> Dict:
+        return self._store.case_dicts[self.case_id]
+
+    @property
+    def case_text_id(self) -> str:
+        return self._store.case_text_ids[self.case_id]
+
+    @property
+    def context_dict(self) -> Dict:
+        return self._store.context_dicts[self.context_id]
+
+    @property
+    def svs(self) -> float:
+        return float(self._store.svs[self._row])
+
+    @property
+    def started_at(self) -> float:
+        """
+        POSIX timestamp
+        """
+        return float(self._store.started_at[self._row])
+
+    @property
+    def data(self) -> List[float]:
+        return self._store.samples_for_row(self._row).tolist()
+
+    @property
+    def ui_non_null_sample_count(self) -> str:
+        return str(self._store.n_nonnull_samples[self._row])
+
+    @property
+    def ui_time_started_at(self) -> str:
+        # Same as BenchmarkResult.ui_time_started_at: `started_at` was derived
+        # from the tz-naive (UTC) DB timestamp via datetime.timestamp(), and
+        # fromtimestamp() is its inverse.
+        return (
+            datetime.fromtimestamp(self.started_at).strftime("%Y-%m-%d %H:%M:%S")
+            + " UTC"
+        )
+
+    @property
+    def ui_mean_and_uncertainty(self) -> str:
+        return ui_mean_and_uncertainty(self.data, self.unit)
+
+    @property
+    def ui_rel_sem(self) -> Tuple[str, str]:
+        return ui_rel_sem(self.data)
+
+    @property
+    def started_at_iso(self) -> str:
+        """
+        Add an ISO timestring on the object so that JavaScript's `new
+        Date(input)` can parse this into a tz-aware object.
+        """
+        return conbench.util.tznaive_dt_to_aware_iso8601_for_api(
+            datetime.fromtimestamp(self.started_at)
+        )
+
+
+class ResultList(Sequence[BMRTBenchmarkResult]):
+    """
+    View on a number of rows in a `BMRTStore`; behaves like a list of
+    `BMRTBenchmarkResult` objects. Lists built by the BMRT cache are sorted by
+    time, newest first.
+
+    Column data for all results in this list can be obtained in vectorized
+    form via `column()` and the `started_at` / `svs` properties.
+    """
+
+    __slots__ = ("_store", "rows")
+
+    def __init__(self, store: BMRTStore, rows: np.ndarray):
+        self._store = store
+        self.rows = rows
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @overload
+    def __getitem__(self, i: int) -> BMRTBenchmarkResult: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> "ResultList": ...
+
+    def __getitem__(
+        self, i: Union[int, slice]
+    ) -> Union[BMRTBenchmarkResult, "ResultList"]:
+        if isinstance(i, slice):
+            return ResultList(self._store, self.rows[i])
+        return BMRTBenchmarkResult(self._store, int(self.rows[i]))
+
+    def __iter__(self) -> Iterator[BMRTBenchmarkResult]:
+        store = self._store
+        for row in self.rows:
+            yield BMRTBenchmarkResult(store, int(row))
+
+    def __repr__(self) -> str:
+        return f"<ResultList ({len(self)} results)>"
+
+    @property
+    def started_at(self) -> np.ndarray:
+        return self._store.started_at[self.rows]
+
+    @property
+    def svs(self) -> np.ndarray:
+        return self._store.svs[self.rows]
+
+    def column(self, name: str) -> List[str]:
+        """
+        Return list of labels of categorical column `name`, one per result.
+        """
+        labels = self._store.labels[name]
+        return [labels[c] for c in self._store.codes[name][self.rows]]
+
+    def split_by(self, name: str) -> Dict[str, "ResultList"]:
+        """
+        Group by categorical column `name`. Maintain order within each group.
+        """
+        codes = self._store.codes[name][self.rows]
+        order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[order]
+        boundaries = np.flatnonzero(np.diff(sorted_codes)) + 1
+        labels = self._store.labels[name]
+        return {
+            labels[sorted_codes[group[0]]]: ResultList(
+                self._store, self.rows[order[group]]
+            )
+            for group in np.split(np.arange(len(order)), boundaries)
+            if len(group)
+        }
+
+    def to_tsdf(self) -> pd.DataFrame:
+        """
+        Build timeseries dataframe: pd.DateTimeIndex (tz-aware, UTC, sorted,
+        name: `time`), one column: single value summary (`svs`).
+        """
+        df = pd.DataFrame(
+            {"svs": self.svs},
+            # The `unit="s"` is the critical ingredient to convert floaty unix
+            # timestamps to datetime representation. `utc=True` is required
+            # to localize the pandas DateTimeIndex to UTC (input is tz-naive).
+            index=pd.to_datetime(self.started_at, unit="s", utc=True),
+        )
+        # Sort by time.
+        df = df.sort_index()
+        df.index.rename("time", inplace=True)
+        return df
+
+
+class GroupIndex(Mapping):
+    """
+    Read-only mapping: group key -> `ResultList` (sorted by time, newest
+    first). Group by one categorical column (key: label), or by multiple
+    categorical columns (key: tuple of labels).
+
+    Built once per store with a handful of vectorized operations. Only the
+    group keys are Python objects; the `ResultList` values are created on
+    access (they share one array of row numbers).
+    """
+
+    def __init__(self, store: BMRTStore, columns: Tuple[str, ...]):
+        self._store = store
+        n = len(store)
+
+        # Sort rows by group (the last key passed to lexsort is the primary
+        # one), and within a group by time, newest first.
+        codes = [store.codes[c] for c in columns]
+        self._order = np.lexsort([-store.started_at] + codes[::-1])
+
+        if n:
+            changed = np.zeros(n - 1, dtype=bool)
+            for c in codes:
+                sc = c[self._order]
+                changed |= sc[1:] != sc[:-1]
+            starts = np.concatenate([[0], np.flatnonzero(changed) + 1])
+        else:
+            starts = np.zeros(0, dtype=np.int64)
+
+        self._offsets = np.append(starts, n)
+
+        # Group key -> group number.
+        self._groups: Dict[Any, int] = {}
+        for g, start in enumerate(starts):
+            row = self._order[start]
+            labels = tuple(store.label(c, row) for c in columns)
+            self._groups[labels[0] if len(columns) == 1 else labels] = g
+
+    def approx_nbytes(self) -> int:
+        """
+        Estimate the size of this index (arrays, and group keys by sampling).
+        Labels are accounted for by the store.
+        """
+        return (
+            self._order.nbytes
+            + self._offsets.nbytes
+            + sys.getsizeof(self._groups)
+            + approx_sizeof_items(list(self._groups))
+        )
+
+    def __getitem__(self, key) -> ResultList:
+        g = self._groups[key]
+        start, end = self._offsets[g], self._offsets[g + 1]
+        return ResultList(self._store, self._order[start:end])
+
+    def __contains__(self, key) -> bool:
+        return key in self._groups
+
+    def __iter__(self) -> Iterator:
+        return iter(self._groups)
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+
+class TimeseriesFrame:
+    """
+    All results of a store, grouped into timeseries (one series per distinct
+    combination of the categorical `columns`) in a single layout: rows sorted
+    by series, and within a series by time (oldest first). Series `g` is the
+    row range `offsets[g]:offsets[g+1]`.
+
+    Series are ordered by their (codes of) `columns`; i.e. all series sharing
+    the same value in the first column (e.g. benchmark name) are adjacent.
+
+    `series()` returns zero-copy slices. Operations over many series can be
+    done in vectorized fashion on `t`, `svs` and `offsets` (see for example
+    `conbench.outlier.outlier_mask_by_iqrdist_grouped()`).
+    """
+
+    def __init__(self, store: BMRTStore, columns: Tuple[str, ...]):
+        self._store = store
+        n = len(store)
+
+        codes = [store.codes[c] for c in columns]
+        order = np.lexsort([store.started_at] + codes[::-1])
+
+        # POSIX timestamps and single value summaries, in series order.
+        self.t = store.started_at[order]
+        self.svs = store.svs[order]
+        # Row numbers in `store`, in series order.
+        self.rows = order
+
+        if n:
+            changed = np.zeros(n - 1, dtype=bool)
+            for c in codes:
+                sc = c[order]
+                changed |= sc[1:] != sc[:-1]
+            starts = np.concatenate([[0], np.flatnonzero(changed) + 1])
+        else:
+            starts = np.zeros(0, dtype=np.int64)
+
+        self.offsets = np.append(starts, n).astype(np.int64)
+
+        # Series key (tuple of labels) for each series number, and vice versa.
+        self.keys: List[Tuple[str, ...]] = [
+            tuple(store.label(c, order[start]) for c in columns) for start in starts
+        ]
+        self._series_by_key = {k: g for g, k in enumerate(self.keys)}
+
+        # First label -> (first series, last series + 1).
+        self._range_by_first_label: Dict[str, Tuple[int, int]] = {}
+        for g, k in enumerate(self.keys):
+            first, _ = self._range_by_first_label.get(k[0], (g, g))
+            self._range_by_first_label[k[0]] = (first, g + 1)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def approx_nbytes(self) -> int:
+        """
+        Estimate the size of this frame (arrays, and series keys by sampling).
+        Labels are accounted for by the store.
+        """
+        return (
+            sum(a.nbytes for a in (self.t, self.svs, self.rows, self.offsets))
+            + sys.getsizeof(self.keys)
+            + approx_sizeof_items(self.keys)
+            + sys.getsizeof(self._series_by_key)
+            + sys.getsizeof(self._range_by_first_label)
+        )
+
+    def __contains__(self, key) -> bool:
+        return key in self._series_by_key
+
+    def series_number(self, key: Tuple[str, ...]) -> int:
+        return self._series_by_key[key]
+
+    def series(self, key: Tuple[str, ...]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (t, svs) for the series `key`: zero-copy views, sorted by time
+        (oldest first). Raise `KeyError` for an unknown key.
+        """
+        g = self._series_by_key[key]
+        start, end = self.offsets[g], self.offsets[g + 1]
+        return self.t[start:end], self.svs[start:end]
+
+    def series_range_for(self, first_label: str) -> Tuple[int, int]:
+        """
+        Return (g0, g1): the series with number g0 <= g < g1 are those with
+        `first_label` as value of the first column. (0, 0) if there is no
+        such series.
+        """
+        return self._range_by_first_label.get(first_label, (0, 0))
+
+    def to_tsdf(self, key: Tuple[str, ...]) -> pd.DataFrame:
+        """
+        Build timeseries dataframe for series `key` (see
+        `ResultList.to_tsdf()`).
+        """
+        t, svs = self.series(key)
+        df = pd.DataFrame({"svs": svs}, index=pd.to_datetime(t, unit="s", utc=True))
+        df.index.rename("time", inplace=True)
+        return df
+
+
+class ResultsById(Mapping):
+    """
+    Read-only mapping: result ID -> `BMRTBenchmarkResult`.
+    """
+
+    def __init__(self, store: BMRTStore):
+        self._store = store
+
+    def __getitem__(self, key: str) -> BMRTBenchmarkResult:
+        row = self._store.row_for_id(key)
+        if row is None:
+            raise KeyError(key)
+        return BMRTBenchmarkResult(self._store, row)
+
+    def __contains__(self, key) -> bool:
+        return isinstance(key, str) and self._store.row_for_id(key) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for i in self._store.ids:
+            yield i.decode("ascii")
+
+    def __len__(self) -> int:
+        return len(self._store)
@@ -0,0 +1,221 @@
+"""
+Linear trends of all time series in the BMRT cache.
+
+The trend table is computed once per cache generation (see
+`conbench.bmrt._build_cache()`), for all time series at once: outlier removal
+and least squares linear fits are done as grouped, vectorized operations over
+the concatenated series of the timeseries frame. Request handlers (the
+benchmark trends page, the trends API) then only look up precomputed, sorted
+rows.
+"""
+
+import dataclasses
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from conbench.bmrtstore import TimeseriesFrame
+from conbench.outlier import outlier_mask_by_iqrdist_grouped
+
+# Minimum number of data points (non-NaN, and again after outlier removal) for
+# a time series to get a trend.
+TREND_MIN_POINTS = 10
+
+# Only series with a result not older than this (relative to the newest result
+# for the same benchmark name) get a trend.
+TREND_RECENCY_SECONDS = 86400 * 30
+
+TREND_DIRECTIONS = ("increasing", "decreasing", "absolute")
+
+
+@dataclasses.dataclass(frozen=True)
+class TrendTable:
+    """
+    One row per time series with a trend. All arrays have one entry per row.
+    Rows are sorted by benchmark name, and then by relative change (largest
+    first).
+
+    The fit is equivalent to `numpy.polynomial.Polynomial.fit(t, y, 1)`: the
+    time range of the series is mapped onto the window [-1, 1], i.e. `slope`
+    is the change of the fit across half of that time range, and `ordinate`
+    is the value of the fit in the middle of the time range. `relchange` is
+    `slope / ordinate`. `r_squared` is the coefficient of determination of the
+    fit (quality: 1 means that all data points are on the line).
+    """
+
+    # Series number in the timeseries frame.
+    series: np.ndarray
+    # Number of data points used for the fit (after outlier removal).
+    n_points: np.ndarray
+    slope: np.ndarray
+    ordinate: np.ndarray
+    relchange: np.ndarray
+    r_squared: np.ndarray
+    # Benchmark name -> (r0, r1): rows r0 <= r < r1.
+    range_by_bname: Dict[str, Tuple[int, int]]
+    # All rows, by relative change (largest first), and by absolute relative
+    # change (largest first).
+    order_by_relchange: np.ndarray
+    order_by_abs_relchange: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.series)
+
+    def top(self, n: int, direction: str, bname: Optional[str] = None) -> np.ndarray:
+        """
+        Return the row numbers of the `n` most-changed series (for benchmark
+        name `bname`, or across all benchmark names). `direction` is one of
+        `TREND_DIRECTIONS`: largest relative change first, smallest (most
+        negative) relative change first, or largest absolute relative change
+        first.
+        """
+        if bname is None:
+            rows = self.order_by_relchange
+        else:
+            r0, r1 = self.range_by_bname.get(bname, (0, 0))
+            rows = np.arange(r0, r1)
+
+        if direction == "increasing":
+            return rows[:n]
+        if direction == "decreasing":
+            return rows[::-1][:n]
+        if direction == "absolute":
+            if bname is None:
+                return self.order_by_abs_relchange[:n]
+            # Stable: ties keep the order by relative change.
+            return rows[np.argsort(-np.abs(self.relchange[rows]), kind="stable")][:n]
+        raise ValueError(f"unknown direction: {direction}")
+
+
+def build_trend_table(frame: TimeseriesFrame) -> TrendTable:
+    """
+    Make a linear regression (after outlier removal) for each series in
+    `frame` (keyed by 4-tuples, benchmark name first). Skip series with little
+    history, and series that are not recent (relative to the newest result for
+    the same benchmark name).
+    """
+    nseries = len(frame)
+    if nseries == 0:
+        empty = np.zeros(0, dtype=np.float64)
+        return _table_from_rows(
+            frame,
+            np.zeros(0, dtype=np.int64),
+            {
+                "n_points": np.zeros(0, dtype=np.int64),
+                "slope": empty,
+                "ordinate": empty,
+                "relchange": empty,
+                "r_squared": empty,
+            },
+        )
+
+    offsets = frame.offsets
+    t = frame.t
+    y = frame.svs
+    starts = offsets[:-1]
+    lengths = np.diff(offsets)
+
+    # Note(JP): make a linear regression: derive a slope value. this is mainly
+    # about the sign of the slope. that means: we can work with the absolute
+    # t/time values we have. for the y values the goal is to make change
+    # comparable across different scenarios. Not across different units,
+    # though.
+    #
+    # Interesting: benchmark result time distribution vs. commit distribution
+    # over time. assume that code evolution is highly correlated with
+    # benchmark start time evolution.
+
+    # Series of the same benchmark name are adjacent in the frame: one block
+    # per benchmark name.
+    bnames = np.array([k[0] for k in frame.keys], dtype=object)
+    block_starts = np.flatnonzero(np.r_[True, bnames[1:] != bnames[:-1]])
+    block_lengths = np.diff(np.r_[block_starts, nseries])
+
+    # Recency criterion (each series is sorted by time, oldest first):
+    # relative to the newest result for the same benchmark name.
+    t_last = t[offsets[1:] - 1]
+    reftime = np.repeat(np.maximum.reduceat(t_last, block_starts), block_lengths)
+    recent = reftime - t_last <= TREND_RECENCY_SECONDS
+
+    # Skip if there's little history anyway (number of non-NaN values).
+    n_valid = np.add.reduceat((~np.isnan(y)).astype(np.int64), starts)
+
+    # Mark outliers, then ignore them (and NaNs) for the fit: the linear
+    # regression does not tolerate NaN in input.
+    keep = ~outlier_mask_by_iqrdist_grouped(y, offsets) & ~np.isnan(y)
+    n = np.add.reduceat(keep.astype(np.int64), starts)
+
+    # Closed-form least squares per series, on the kept data points.
+    w = keep.astype(np.float64)
+    nf = np.maximum(n, 1).astype(np.float64)
+    tw = np.where(keep, t, 0.0)
+    yw = np.where(keep, y, 0.0)
+    tmean = np.add.reduceat(tw, starts) / nf
+    ymean = np.add.reduceat(yw, starts) / nf
+    tc = (t - np.repeat(tmean, lengths)) * w
+    yc = (yw - np.repeat(ymean, lengths)) * w
+    sxx = np.add.reduceat(tc * tc, starts)
+    sxy = np.add.reduceat(tc * yc, starts)
+    syy = np.add.reduceat(yc * yc, starts)
+    tmin = np.minimum.reduceat(np.where(keep, t, np.inf), starts)
+    tmax = np.maximum.reduceat(np.where(keep, t, -np.inf), starts)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dydt = sxy / sxx
+        slope = dydt * (tmax - tmin) / 2
+        ordinate = ymean + dydt * ((tmin + tmax) / 2 - tmean)
+        # Do a 'normalization' here to find _relative change_. For the offset
+        # use data from the linear fit (the constant part of the linearity).
+        # Think: the smaller most of the values are, the _more_ does the
+        # _same_ slope reflect relative change.
+        relchange = slope / ordinate
+        # Constant series: perfect fit.
+        r_squared = np.where(syy > 0, sxy * sxy / (sxx * syy), 1.0)
+
+    # These values might be NaN if the fit failed (e.g. all data points at the
+    # same time), or infinite (ordinate zero).
+    candidates = (
+        (n_valid >= TREND_MIN_POINTS)
+        & recent
+        & (n >= TREND_MIN_POINTS)
+        & np.isfinite(relchange)
+    )
+    block_of_series = np.repeat(np.arange(len(block_starts)), block_lengths)
+    selected = np.flatnonzero(candidates)
+
+    # Sort by block (benchmark name), then by relative change, largest first.
+    # Note that lexsort uses the last key as the primary one.
+    rows = selected[np.lexsort((-relchange[selected], block_of_series[selected]))]
+
+    return _table_from_rows(
+        frame,
+        rows,
+        {
+            "n_points": n,
+            "slope": slope,
+            "ordinate": ordinate,
+            "relchange": relchange,
+            "r_squared": r_squared,
+        },
+    )
+
+
+def _table_from_rows(
+    frame: TimeseriesFrame, rows: np.ndarray, columns: Dict[str, np.ndarray]
+) -> TrendTable:
+    columns = {name: values[rows] for name, values in columns.items()}
+
+    range_by_bname: Dict[str, Tuple[int, int]] = {}
+    for r, g in enumerate(rows):
+        bname = frame.keys[g][0]
+        r0, _ = range_by_bname.get(bname, (r, r))
+        range_by_bname[bname] = (r0, r + 1)
+
+    relchange = columns["relchange"]
+    return TrendTable(
+        series=rows.astype(np.int64),
+        range_by_bname=range_by_bname,
+        order_by_relchange=np.argsort(-relchange, kind="stable"),
+        order_by_abs_relchange=np.argsort(-np.abs(relchange), kind="stable"),
+        **columns,
+    )
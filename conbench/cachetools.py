@@ -1,5 +1,10 @@
+import threading
 import time
+from collections import OrderedDict
 from functools import lru_cache, wraps
+from typing import Callable, Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
 
 
 def lru_cache_with_ttl(maxsize=None, typed=False, ttl=60):
@@ -37,3 +42,55 @@ def lru_cache_with_ttl(maxsize=None, typed=False, ttl=60):
         return wrapper
 
     return decorator
+
+
+class BoundedLRUCache(Generic[V]):
+    """
+    Thread-safe mapping with a maximum number of entries. When full, the least
+    recently used entry is dropped.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, V]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], V]) -> Tuple[V, bool]:
+        """
+        Return the value for `key`, and whether it was found in the cache. If
+        it was not, call `compute()` and store the return value.
+        """
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                return self._data[key], True
+
+        # Do not hold the lock while computing (concurrently computing the
+        # value for the same key is wasteful, but harmless).
+        value = compute()
+        self.put(key, value)
+        return value, False
+
+    def get(self, key: Hashable) -> Optional[V]:
+        """
+        Return the value for `key`, or None if it is not in the cache.
+        """
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key: Hashable, value: V) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -36,6 +36,38 @@ class ConfigClass:
     # - "mean": Use the mean.
     SVS_TYPE = os.environ.get("SVS_TYPE") or "best"
 
+    # The method for detecting distribution changes (steps) and outliers in the
+    # history of a benchmark (see conbench/entities/history.py).
+    # - "trimmed" (default): z-scores of the differences between consecutive
+    #                        results, using trimmed rolling estimators.
+    # - "binseg": Binary segmentation of the history into segments of constant
+    #             mean, after setting aside outliers. Detects smaller
+    #             (sustained) steps, at similar cost for long histories.
+    CHANGE_POINT_DETECTION = os.environ.get("CHANGE_POINT_DETECTION") or "trimmed"
+
+    # When this is `true`, the lookback z-score inputs (distribution mean,
+    # standard deviation and size) are calculated when a benchmark result is
+    # submitted, with its commit as baseline commit, and stored in the
+    # database. Comparisons against that commit then read them instead of
+    # calculating them. This makes result submission a bit slower.
+    Z_SCORE_INPUTS_AT_INGEST = (
+        os.environ.get("Z_SCORE_INPUTS_AT_INGEST", "false") == "true"
+    )
+
+    # When set, the BMRT cache is not populated by the web application
+    # processes themselves. Instead, they memory-map the newest snapshot found
+    # in this directory, written by a separate builder process (see
+    # conbench/bmrtsnapshot.py). All processes on a host must agree on this
+    # path.
+    BMRT_SNAPSHOT_DIR = os.environ.get("CONBENCH_BMRT_SNAPSHOT_DIR") or None
+
+    # When set, the process populating the BMRT cache persists it to this
+    # (local) directory every now and then, and after a restart loads it from
+    # there before catching up with the database incrementally. That makes the
+    # BMRT cache-backed views useful right away after a restart, and avoids
+    # all replicas doing a full cache population at the same time.
+    BMRT_WARM_START_DIR = os.environ.get("CONBENCH_BMRT_WARM_START_DIR") or None
+
     LOG_LEVEL_STDERR = os.environ.get("CONBENCH_LOG_LEVEL_STDERR", "INFO")
     LOG_LEVEL_FILE = None
     LOG_LEVEL_SQLALCHEMY = "WARNING"
@@ -54,10 +86,28 @@ class ConfigClass:
     if os.environ.get("FLASK_ENV") == "development":
         TESTING = True
 
+    # Maximum number of benchmark results in the BMRT cache (the most recently
+    # started ones), and the time window (in days, relative to now) that a
+    # benchmark result's start time must be in for it to enter the BMRT cache.
+    # Larger values mean more memory consumption and longer cache updates. The
+    # conbench_bmrt_cache_* metrics help with tuning these.
+    BMRT_CACHE_SIZE = int(
+        os.environ.get("CONBENCH_BMRT_CACHE_SIZE") or (50000 if TESTING else 800000)
+    )
+    BMRT_CACHE_WINDOW_DAYS = float(
+        os.environ.get("CONBENCH_BMRT_CACHE_WINDOW_DAYS") or 14
+    )
+
     def __init__(self):
         self.INTENDED_BASE_URL = self._get_intended_base_url_from_env_or_exit()
         self.OIDC_ISSUER_URL = self._get_oidc_issuer_url_from_env_or_exit()
 
+        if self.CHANGE_POINT_DETECTION not in ("trimmed", "binseg"):
+            sys.exit(
+                "CHANGE_POINT_DETECTION must be one of 'trimmed', 'binseg'. "
+                f"Got instead: `{self.CHANGE_POINT_DETECTION}`"
+            )
+
     def _get_intended_base_url_from_env_or_exit(self) -> str:
         """
         If this function returns then the output is guaranteed to start with 'http'
@@ -52,10 +52,19 @@ from ..entities.hardware import (
     Machine,
     MachineSchema,
 )
+from ..entities.history_sketch import HistorySketch
+from ..entities.history_stats import HistoryStats
+from ..entities.history_version import HistoryVersion
 from ..entities.info import Info
+from ..entities.z_score_inputs import ZScoreInputs
 
 log = logging.getLogger(__name__)
 
+# PostgreSQL notification channel. The ID of each newly created benchmark
+# result is sent to this channel (delivered to listeners upon commit). The
+# BMRT cache refresh job listens on it, see conbench/bmrt.py.
+BENCHMARK_RESULT_CREATED_CHANNEL = "conbench_benchmark_result_created"
+
 
 class BenchmarkResultValidationError(Exception):
     pass
@@ -301,7 +310,23 @@ class BenchmarkResult(Base, EntityMixin):
             repo_url=repo_url,
         )
         benchmark_result = BenchmarkResult(**result_data_for_db)
-        benchmark_result.save()
+        current_session.add(benchmark_result)
+        # Same transaction: derived history data (e.g. cached history API
+        # responses) becomes stale exactly when this result becomes visible.
+        HistoryVersion.bump(benchmark_result.history_fingerprint)
+        ZScoreInputs.invalidate(
+            benchmark_result.history_fingerprint, commit.timestamp if commit else None
+        )
+        # Flush for the primary key to be assigned; send it along with the
+        # notification as part of the same transaction.
+        current_session.flush()
+        _add_to_history_sketch(benchmark_result, commit)
+        current_session.execute(
+            s.select(
+                s.func.pg_notify(BENCHMARK_RESULT_CREATED_CHANNEL, benchmark_result.id)
+            )
+        )
+        current_session.commit()
 
         return benchmark_result
 
@@ -320,8 +345,26 @@ class BenchmarkResult(Base, EntityMixin):
             if value is not None
         }
 
+        # Segments (and therefore all rolling stats) of this result's history
+        # may change.
+        if data["change_annotations"] != old_change_annotations:
+            HistoryStats.invalidate(self.history_fingerprint)
+            HistoryVersion.bump(self.history_fingerprint)
+            self._invalidate_z_score_inputs()
+
         super().update(data)
 
+    def delete(self):
+        HistoryVersion.bump(self.history_fingerprint)
+        self._invalidate_z_score_inputs()
+        HistorySketch.invalidate(self.history_fingerprint)
+        super().delete()
+
+    def _invalidate_z_score_inputs(self) -> None:
+        ZScoreInputs.invalidate(
+            self.history_fingerprint, self.commit.timestamp if self.commit else None
+        )
+
     def to_dict_for_json_api(benchmark_result, include_joins=True):
         # `self` is just convention :-P
         out_dict = {
@@ -407,19 +450,7 @@ class BenchmarkResult(Base, EntityMixin):
         The criteria are conventions that we (hopefully) apply consistently
         across components.
         """
-        if self.unit is None:
-            return True
-
-        if self.data is None:
-            return True
-
-        if self.error is not None:
-            return True
-
-        if do_iteration_samples_look_like_error(self.data):
-            return True
-
-        return False
+        return result_is_failed(self.unit, self.data, self.error is not None)
 
     @property
     def svs(self) -> float:
@@ -434,17 +465,7 @@ class BenchmarkResult(Base, EntityMixin):
         """
         Return single value summary type.
         """
-        if Config.SVS_TYPE == "mean":
-            return "mean"
-
-        assert Config.SVS_TYPE == "best"
-
-        if self.unit is None:
-            return "n/a"
-        elif less_is_better(self.unit):
-            return "min"
-        else:
-            return "max"
+        return svs_type_for_unit(self.unit)
 
     def _single_value_summary(self) -> float:
         """
@@ -492,29 +513,13 @@ class BenchmarkResult(Base, EntityMixin):
         - https://github.com/conbench/conbench/issues/640
         - https://github.com/conbench/conbench/issues/530
         """
-        values = self.measurements
-
-        if not values:
-            return math.nan
-
-        if Config.SVS_TYPE == "mean":
-            if self.mean is None:
-                # See https://github.com/conbench/conbench/issues/1169 -- Legacy
-                # database might have mean being None _despite the benchmark not
-                # being failed_. Because of a temporary logic error. Let's remove
-                # this code path again for sanity. `values` (from
-                # self.measurements) has only numbers.
-                return statistics.mean(values)
-            return float(self.mean)
-
-        assert Config.SVS_TYPE == "best"
-        # If there are values, a unit should be present.
-        assert self.unit is not None
-
-        if less_is_better(self.unit):
-            return float(self.min) if self.min is not None else min(values)
-        else:
-            return float(self.max) if self.max is not None else max(values)
+        return single_value_summary(
+            self.measurements,
+            self.unit,
+            self.mean,
+            self.min,
+            self.max,
+        )
 
     @functools.cached_property
     def measurements(self) -> List[float]:
@@ -581,11 +586,7 @@ class BenchmarkResult(Base, EntityMixin):
         Return hardware-representing short string, including user-given name
         and ID prefix.
         """
-        hw = self.hardware
-        if len(hw.name) > 15:
-            return f"{hw.id[:4]}: " + hw.name[:15]
-
-        return f"{hw.id[:4]}: " + hw.name
+        return ui_hardware_short(self.hardware.id, self.hardware.name)
 
     def ui_commit_url_anchor(self) -> str:
         if self.commit is None:
@@ -610,6 +611,171 @@ class BenchmarkResult(Base, EntityMixin):
         return conbench.units.legacy_convert(self.unit)
 
 
+def result_is_failed(
+    unit: Optional[TUnit], data: Optional[List[Any]], has_error: bool
+) -> bool:
+    """
+    See `BenchmarkResult.is_failed`. Also used where no `BenchmarkResult`
+    object is at hand (BMRT cache population).
+    """
+    if unit is None:
+        return True
+
+    if data is None:
+        return True
+
+    if has_error:
+        return True
+
+    if do_iteration_samples_look_like_error(data):
+        return True
+
+    return False
+
+
+def svs_type_for_unit(unit: Optional[TUnit]) -> str:
+    """
+    See `BenchmarkResult.svs_type`.
+    """
+    if Config.SVS_TYPE == "mean":
+        return "mean"
+
+    assert Config.SVS_TYPE == "best"
+
+    if unit is None:
+        return "n/a"
+    elif less_is_better(unit):
+        return "min"
+    else:
+        return "max"
+
+
+def single_value_summary(
+    values: List[float],
+    unit: Optional[TUnit],
+    agg_mean: Optional[float],
+    agg_min: Optional[float],
+    agg_max: Optional[float],
+) -> float:
+    """
+    See `BenchmarkResult._single_value_summary()`. `values` are the
+    measurements (empty for a failed result). `agg_*` are the aggregates
+    stored in the database (may be `None`).
+    """
+    if not values:
+        return math.nan
+
+    if Config.SVS_TYPE == "mean":
+        if agg_mean is None:
+            # See https://github.com/conbench/conbench/issues/1169 -- Legacy
+            # database might have mean being None _despite the benchmark not
+            # being failed_. Because of a temporary logic error. Let's remove
+            # this code path again for sanity. `values` (from
+            # self.measurements) has only numbers.
+            return statistics.mean(values)
+        return float(agg_mean)
+
+    assert Config.SVS_TYPE == "best"
+    # If there are values, a unit should be present.
+    assert unit is not None
+
+    if less_is_better(unit):
+        return float(agg_min) if agg_min is not None else min(values)
+    else:
+        return float(agg_max) if agg_max is not None else max(values)
+
+
+def svs_sql_expression():
+    """
+    Return the SQL expression for the single value summary of a result, see
+    `BenchmarkResult._single_value_summary()`.
+
+    For results with error None and mean not None (which is what this should
+    be used for), this is equivalent to `BenchmarkResult.svs`.
+    """
+    if Config.SVS_TYPE == "mean":
+        return BenchmarkResult.mean
+    elif Config.SVS_TYPE == "best":
+        return s.case(
+            # Min/max are missing when there's 1 rep, but mean is always populated
+            (BenchmarkResult.max.is_(None), BenchmarkResult.mean),
+            # Right now less is always better unless the unit is per second
+            (BenchmarkResult.unit.like("%/s"), BenchmarkResult.max),
+            else_=BenchmarkResult.min,
+        )  # type: ignore
+    else:
+        raise ValueError("server is not configured properly")
+
+
+def history_svs_values(history_fingerprint: THistFingerprint) -> np.ndarray:
+    """
+    Return the single value summaries of the results in the history of
+    `history_fingerprint`: error-free results on the default branch (see
+    `conbench.entities.history._history_query()`), in no particular order.
+    """
+    values = current_session.scalars(
+        s.select(svs_sql_expression())
+        .join(Commit, Commit.id == BenchmarkResult.commit_id)
+        .filter(
+            BenchmarkResult.history_fingerprint == history_fingerprint,
+            BenchmarkResult.error.is_(None),
+            BenchmarkResult.mean.is_not(None),
+            Commit.sha == Commit.fork_point_sha,
+        )
+    ).all()
+    return np.array(values, dtype=np.float64)
+
+
+def _add_to_history_sketch(
+    benchmark_result: BenchmarkResult, commit: Optional[Commit]
+) -> None:
+    """
+    Add the single value summary of the (new, flushed) `benchmark_result` to
+    the sketch of its history (see `HistorySketch`), if there is one. Call
+    this in the transaction that creates the result.
+
+    A missing sketch is built from the history when it is needed (see
+    `get_history_sketch()`), not here: that reads the whole history. Upon
+    failure, log and delete the sketch (so that it is rebuilt) rather than
+    fail the creation of the result.
+    """
+    if (
+        benchmark_result.error is not None
+        or benchmark_result.mean is None
+        or commit is None
+        or commit.sha != commit.fork_point_sha
+    ):
+        # Not part of the history.
+        return
+
+    fp = benchmark_result.history_fingerprint
+    try:
+        with current_session.begin_nested():
+            HistorySketch.lock(fp)
+            digest = HistorySketch.get(fp)
+            if digest is not None:
+                digest.update([benchmark_result.svs])
+                HistorySketch.put(fp, digest)
+    except Exception as exc:
+        log.warning("could not add result to history sketch of %s: %s", fp, exc)
+        try:
+            with current_session.begin_nested():
+                HistorySketch.invalidate(fp)
+        except s.exc.SQLAlchemyError as exc:
+            log.warning("could not invalidate history sketch of %s: %s", fp, exc)
+
+
+def ui_hardware_short(hardware_id: str, hardware_name: str) -> str:
+    """
+    Return hardware-representing short string, including user-given name
+    and ID prefix.
+    """
+    if len(hardware_name) > 15:
+        return f"{hardware_id[:4]}: " + hardware_name[:15]
+
+    return f"{hardware_id[:4]}: " + hardware_name
+
+
 def ui_rel_sem(values: List[float]) -> Tuple[str, str]:
     """
     The first string in the tuple is a stringified float for sorting in a
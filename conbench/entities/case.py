@@ -35,9 +35,14 @@ class Case(Base, EntityMixin["Case"]):
 
         An attempt towards sanity, but of course things are still confusing.
         """
-        return " ".join(
-            [f"{k}={v}" for k, v in sorted(self.tags.items()) if k not in ("name")]
-        )
+        return case_text_id(self.tags)
+
+
+def case_text_id(tags: Dict) -> str:
+    """
+    See `Case.text_id`.
+    """
+    return " ".join([f"{k}={v}" for k, v in sorted(tags.items()) if k not in ("name")])
 
 
 s.Index("case_index", Case.name, Case.tags, unique=True)
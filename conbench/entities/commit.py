@@ -11,6 +11,7 @@ from typing import Dict, List, Optional, TypedDict
 import flask as f
 import requests
 import sqlalchemy as s
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import Mapped, Query
 
 from conbench import metrics, util
@@ -25,6 +26,7 @@ from ..entities._entity import (
     Nullable,
     genprimkey,
 )
+from ..entities.commit_ancestry import CommitAncestry
 
 log = logging.getLogger(__name__)
 
@@ -220,6 +222,12 @@ class Commit(Base, EntityMixin):
         E2 :  E2, C2, F, D, B, A
         G  :  G, F, D, B, A
 
+        This uses the generation numbers in the commit_ancestry table (see
+        ``CommitAncestry``) if both this commit and its fork point commit are in
+        there: then the most recent N ancestors are an index range scan. Commits
+        are added to that table in the transaction that inserts them (see
+        ``create()``), so their lineages there are complete.
+
         Might raise CantFindAncestorCommitsError.
         """
         if not self.branch:
@@ -235,6 +243,76 @@ class Commit(Base, EntityMixin):
         if not fork_point_commit.timestamp:
             raise CantFindAncestorCommitsError("fork_point_commit timestamp is null")
 
+        own_lineage_row = CommitAncestry.get(self.id)
+        fork_point_lineage_row = (
+            own_lineage_row
+            if self == fork_point_commit
+            else CommitAncestry.get(fork_point_commit.id)
+        )
+        if (
+            own_lineage_row is not None
+            and fork_point_lineage_row is not None
+            # The fork point is expected to be on the default branch.
+            and fork_point_lineage_row.branch is None
+        ):
+            return self._commit_ancestry_query_from_lineages(
+                own_lineage_row, fork_point_lineage_row
+            )
+
+        # Fall back to deriving the lineages from the commit table, for
+        # commits that are not in the commit_ancestry table (e.g. the fork
+        # point is not on the default branch).
+        return self._commit_ancestry_query_from_commits(fork_point_commit)
+
+    def _commit_ancestry_query_from_lineages(
+        self,
+        own_lineage_row: CommitAncestry,
+        fork_point_lineage_row: CommitAncestry,
+    ) -> Query:
+        # Get default branch commits before/including the fork point: the
+        # most recent ones first is a backward index range scan.
+        query = (
+            current_session.query(
+                Commit.id.label("ancestor_id"),
+                Commit.sha.label("ancestor_hash"),
+                Commit.timestamp.label("ancestor_timestamp"),
+                s.sql.expression.literal(True, s.Boolean).label("on_default_branch"),
+                CommitAncestry.position.label("commit_order"),
+            )
+            .join(CommitAncestry, CommitAncestry.commit_id == Commit.id)
+            .filter(
+                *CommitAncestry.lineage_filters(fork_point_lineage_row.lineage),
+                CommitAncestry.position <= fork_point_lineage_row.position,
+            )
+        )
+
+        # If this commit is on a non-default branch, add all commits since the
+        # fork point, ordered after it.
+        if own_lineage_row is not fork_point_lineage_row:
+            branch_query = (
+                current_session.query(
+                    Commit.id.label("ancestor_id"),
+                    Commit.sha.label("ancestor_hash"),
+                    Commit.timestamp.label("ancestor_timestamp"),
+                    s.sql.expression.literal(False, s.Boolean).label(
+                        "on_default_branch"
+                    ),
+                    (CommitAncestry.position + fork_point_lineage_row.position).label(
+                        "commit_order"
+                    ),
+                )
+                .join(CommitAncestry, CommitAncestry.commit_id == Commit.id)
+                .filter(
+                    *CommitAncestry.lineage_filters(own_lineage_row.lineage),
+                    CommitAncestry.position <= own_lineage_row.position,
+                )
+            )
+            # The two lineages are disjoint: no need to deduplicate.
+            query = query.union_all(branch_query)
+
+        return query
+
+    def _commit_ancestry_query_from_commits(self, fork_point_commit: "Commit") -> Query:
         # Get default branch commits before/including the fork point
         query = current_session.query(
             Commit.id.label("ancestor_id"),
@@ -266,6 +344,37 @@ class Commit(Base, EntityMixin):
 
         return query
 
+    @classmethod
+    def create(cls, data) -> "Commit":
+        """
+        Insert a commit, and add it to its lineage (see ``CommitAncestry``) in
+        the same transaction.
+        """
+        commit = cls(**data)
+        current_session.add(commit)
+        current_session.flush()
+        CommitAncestry.add_commits([commit])
+        current_session.commit()
+        return commit
+
+    @classmethod
+    def upsert_do_nothing(cls, row_list: List[dict]):
+        """
+        Try to insert rows. If there is a conflict on any row, ignore that row.
+        Add the inserted commits to their lineages (see ``CommitAncestry``) in
+        the same transaction.
+        """
+        inserted_ids = current_session.scalars(
+            postgresql.insert(cls)
+            .values(row_list)
+            .on_conflict_do_nothing()
+            .returning(cls.id)
+        ).all()
+        CommitAncestry.add_commits(
+            current_session.scalars(s.select(cls).where(cls.id.in_(inserted_ids)))
+        )
+        current_session.commit()
+
     @staticmethod
     def create_unknown_context(commit_hash: str, repo_url: str) -> "Commit":
         # Note(JP): I think this means "could not verify, could not get further
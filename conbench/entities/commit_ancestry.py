@@ -0,0 +1,187 @@
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+import sqlalchemy as s
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Mapped
+
+from conbench.dbsession import current_session
+
+from ..entities._entity import Base, NotNull, Nullable
+
+if TYPE_CHECKING:
+    from ..entities.commit import Commit
+
+# (repository, branch, fork_point_sha); branch and fork point are None for the
+# default branch.
+TLineage = Tuple[str, Optional[str], Optional[str]]
+
+
+class CommitAncestry(Base):
+    """
+    Materialized commit lineages, for ancestry queries that are index range
+    scans (see `Commit.commit_ancestry_query`).
+
+    A lineage is either the default branch of a repository (all commits with
+    `sha == fork_point_sha`; `branch` and `fork_point_sha` are NULL in that
+    case), or the commits of a non-default branch that have the same fork
+    point. Within a lineage, `position` is a generation number: the distinct
+    commit timestamps are numbered consecutively, starting with 1 for the
+    oldest one (commits with the same timestamp share the position).
+
+    Maintained in the transaction that inserts commits (see `Commit.create()`
+    and `add_commits()`).
+    Commits without timestamp or without fork point information are not part
+    of any lineage.
+    """
+
+    __tablename__ = "commit_ancestry"
+    commit_id: Mapped[str] = NotNull(
+        s.String(50), s.ForeignKey("commit.id", ondelete="CASCADE"), primary_key=True
+    )
+    repository: Mapped[str] = NotNull(s.String(300))
+    branch: Mapped[Optional[str]] = Nullable(s.String(510))
+    fork_point_sha: Mapped[Optional[str]] = Nullable(s.String(50))
+    # Same as Commit.timestamp (tz-naive, UTC).
+    timestamp: Mapped[datetime] = NotNull(s.DateTime(timezone=False))
+    position: Mapped[int] = NotNull(s.BigInteger)
+
+    @property
+    def lineage(self) -> TLineage:
+        return (self.repository, self.branch, self.fork_point_sha)
+
+    @staticmethod
+    def lineage_of(commit: "Commit") -> Optional[TLineage]:
+        """
+        Return the lineage `commit` belongs to, or `None`.
+        """
+        if commit.timestamp is None or not commit.fork_point_sha:
+            return None
+        if commit.sha == commit.fork_point_sha:
+            return (commit.repository, None, None)
+        if not commit.branch:
+            return None
+        return (commit.repository, commit.branch, commit.fork_point_sha)
+
+    @staticmethod
+    def lineage_filters(lineage: TLineage) -> List:
+        repository, branch, fork_point_sha = lineage
+        # Note: `== None` is rendered as `IS NULL` (which can use the index).
+        return [
+            CommitAncestry.repository == repository,
+            CommitAncestry.branch == branch,
+            CommitAncestry.fork_point_sha == fork_point_sha,
+        ]
+
+    @staticmethod
+    def get(commit_id: str) -> Optional["CommitAncestry"]:
+        return current_session.get(CommitAncestry, commit_id)
+
+    @staticmethod
+    def add_commits(commits: Iterable["Commit"]) -> None:
+        """
+        Add `commits` to their lineages (commits that are already in the table
+        are fine, as are commits that are not part of any lineage). Does not
+        commit.
+
+        Positions are assigned by renumbering each affected lineage from the
+        oldest added commit on. Typically, new commits are the most recent
+        ones of their lineage, i.e. only a few rows are renumbered.
+        """
+        since_by_lineage: Dict[TLineage, datetime] = {}
+        rows = []
+        for commit in commits:
+            lineage = CommitAncestry.lineage_of(commit)
+            if lineage is None:
+                continue
+            timestamp = commit.timestamp
+            assert timestamp is not None
+            if timestamp.tzinfo is not None:
+                # Not yet reloaded from the database (tz-naive, UTC).
+                timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+            since = since_by_lineage.get(lineage)
+            if since is None or timestamp < since:
+                since_by_lineage[lineage] = timestamp
+            rows.append(
+                {
+                    "commit_id": commit.id,
+                    "repository": lineage[0],
+                    "branch": lineage[1],
+                    "fork_point_sha": lineage[2],
+                    "timestamp": timestamp,
+                    # Placeholder, see below.
+                    "position": 0,
+                }
+            )
+
+        if not rows:
+            return
+
+        # Serialize renumbering per lineage (in a consistent order, to avoid
+        # deadlocks).
+        for lineage in sorted(since_by_lineage, key=str):
+            current_session.execute(
+                s.select(
+                    s.func.pg_advisory_xact_lock(
+                        s.func.hashtext("commit_ancestry:" + str(lineage))
+                    )
+                )
+            )
+
+        current_session.execute(
+            postgresql.insert(CommitAncestry).values(rows).on_conflict_do_nothing()
+        )
+
+        for lineage, since in since_by_lineage.items():
+            _renumber(lineage, since)
+
+
+def _renumber(lineage: TLineage, since: datetime) -> None:
+    """
+    Assign positions to the commits of `lineage` with a timestamp not older
+    than `since`. Positions of older commits are not affected.
+    """
+    filters = CommitAncestry.lineage_filters(lineage)
+
+    base = current_session.scalar(
+        s.select(s.func.coalesce(s.func.max(CommitAncestry.position), 0)).where(
+            *filters, CommitAncestry.timestamp < since
+        )
+    )
+
+    ranked = (
+        s.select(
+            CommitAncestry.commit_id,
+            (base + s.func.dense_rank().over(order_by=CommitAncestry.timestamp)).label(
+                "position"
+            ),
+        )
+        .where(*filters, CommitAncestry.timestamp >= since)
+        .subquery()
+    )
+
+    current_session.execute(
+        s.update(CommitAncestry)
+        .where(CommitAncestry.commit_id == ranked.c.commit_id)
+        .values(position=ranked.c.position)
+    )
+
+
+# For the ancestry query (the N most recent commits of a lineage up to a
+# position).
+s.Index(
+    "commit_ancestry_lineage_position_index",
+    CommitAncestry.repository,
+    CommitAncestry.branch,
+    CommitAncestry.fork_point_sha,
+    CommitAncestry.position,
+)
+
+# For renumbering (see `_renumber()`).
+s.Index(
+    "commit_ancestry_lineage_timestamp_index",
+    CommitAncestry.repository,
+    CommitAncestry.branch,
+    CommitAncestry.fork_point_sha,
+    CommitAncestry.timestamp,
+)
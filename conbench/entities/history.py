@@ -1,27 +1,50 @@
-import copy
 import dataclasses
 import datetime
 import decimal
+import hashlib
 import logging
 import math
 from collections import defaultdict
-from typing import Dict, List, Optional, Tuple, Union, cast
+from typing import Callable, Dict, List, Optional, Set, Tuple, Union, cast
 
 import numpy as np
 import pandas as pd
 import sqlalchemy as s
+from sqlalchemy.dialects import postgresql
 
+import conbench.metrics
 import conbench.units
+from conbench.cachetools import BoundedLRUCache
 from conbench.dbsession import current_session
+from conbench.quantilesketch import TDigest
 from conbench.types import TBenchmarkName, THistFingerprint
 
 from ..config import Config
-from ..entities.benchmark_result import BenchmarkResult
+from ..entities.benchmark_result import (
+    BenchmarkResult,
+    history_svs_values,
+    svs_sql_expression,
+)
 from ..entities.commit import CantFindAncestorCommitsError, Commit
 from ..entities.hardware import Hardware
+from ..entities.history_sketch import HistorySketch
+from ..entities.history_stats import HistoryStats
+from ..entities.history_version import HistoryVersion
+from ..entities.z_score_inputs import (
+    TDistributionSettings,
+    TDistributionStats,
+    ZScoreInputs,
+)
 
 log = logging.getLogger(__name__)
 
+# Maximum number of histories kept in memory (see `get_history_for_fingerprint()`).
+HISTORY_CACHE_SIZE = 1000
+
+# Maximum number of (baseline ancestry, history fingerprint) distribution stats
+# kept in memory (see `_query_and_calculate_distribution_stats()`).
+DISTRIBUTION_STATS_CACHE_SIZE = 20000
+
 
 def _to_float_or_none(
     number: Optional[Union[decimal.Decimal, float, int]]
@@ -48,8 +71,9 @@ def _to_float_or_none(
 
 
 # NOTE: Unlike other modules in this directory, the concept of "history" is not
-# explicitly represented in the database as a table, but we still need to define common
-# logic for statistical analysis of historic distributions. This module does that.
+# explicitly represented in the database as a table (except for the materialized
+# rolling stats, see history_stats.py), but we still need to define common logic for
+# statistical analysis of historic distributions. This module does that.
 #
 # It includes functions to power the history API, and to set z-scores on
 # BenchmarkResults, because that's fundamentally related to their histories.
@@ -114,7 +138,10 @@ class HistorySample:
     def __str__(self):
         return f"<{self.__class__.__name__}(mean:{self.mean}),data:{self.data}>"
 
-    def _dict_for_api_json(self) -> dict:
+    def _dict_for_api_json(self, fields: Optional[Set[str]] = None) -> dict:
+        """
+        If `fields` is given, include only these keys (see `api_json_keys()`).
+        """
         d = dataclasses.asdict(self)
         # if performance is a concern then https://pypi.org/project/orjson/
         # promises to be among the fastest for serializing python dataclass
@@ -124,17 +151,109 @@ class HistorySample:
         d["commit_timestamp"] = self.commit_timestamp.isoformat()
 
         # Rename SVS for clarity for external consumption.
-        d["single_value_summary"] = d.pop("svs")
-        d["single_value_summary_type"] = d.pop("svs_type")
+        for name, api_name in _API_JSON_RENAMED_FIELDS.items():
+            d[api_name] = d.pop(name)
 
         # Remove new props for now (needs test suite adjustment, and so far
         # usage of new props is internal).
-        d.pop("benchmark_name")
-        d.pop("case_text_id")
+        for name in _API_JSON_OMITTED_FIELDS:
+            d.pop(name)
+
+        if fields is not None:
+            d = {k: v for k, v in d.items() if k in fields}
         return d
 
+    @staticmethod
+    def api_json_keys() -> Set[str]:
+        """
+        Return the keys of the dictionary returned by `_dict_for_api_json()`.
+        """
+        names = {f.name for f in dataclasses.fields(HistorySample)}
+        names -= set(_API_JSON_OMITTED_FIELDS)
+        return {_API_JSON_RENAMED_FIELDS.get(n, n) for n in names}
+
 
-def get_history_for_benchmark(benchmark_result_id: str) -> List[HistorySample]:
+_API_JSON_RENAMED_FIELDS = {
+    "svs": "single_value_summary",
+    "svs_type": "single_value_summary_type",
+}
+_API_JSON_OMITTED_FIELDS = ("benchmark_name", "case_text_id")
+
+
+@dataclasses.dataclass
+class HistoryWindow:
+    """
+    Selects a part of a history: the results with a commit timestamp (tz-naive,
+    UTC) in the closed interval [earliest_commit_timestamp,
+    latest_commit_timestamp], ordered by (commit timestamp, result ID), that
+    come after the (commit timestamp, result ID) key `after`. At most `limit`
+    of them. Each criterion is optional.
+    """
+
+    earliest_commit_timestamp: Optional[datetime.datetime] = None
+    latest_commit_timestamp: Optional[datetime.datetime] = None
+    after: Optional[Tuple[datetime.datetime, str]] = None
+    limit: Optional[int] = None
+
+    def sql_filters(self) -> list:
+        filters = []
+        if self.earliest_commit_timestamp is not None:
+            filters.append(Commit.timestamp >= self.earliest_commit_timestamp)
+        if self.latest_commit_timestamp is not None:
+            filters.append(Commit.timestamp <= self.latest_commit_timestamp)
+        if self.after is not None:
+            filters.append(s.tuple_(Commit.timestamp, BenchmarkResult.id) > self.after)
+        return filters
+
+    def apply_to_df(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Same as `sql_filters()` plus ordering and limit, but for a dataframe
+        with `timestamp` and `benchmark_result_id` columns.
+        """
+        mask = np.ones(len(df), dtype=bool)
+        if self.earliest_commit_timestamp is not None:
+            mask &= df["timestamp"] >= self.earliest_commit_timestamp
+        if self.latest_commit_timestamp is not None:
+            mask &= df["timestamp"] <= self.latest_commit_timestamp
+        if self.after is not None:
+            after_ts, after_id = self.after
+            mask &= (df["timestamp"] > after_ts) | (
+                (df["timestamp"] == after_ts) & (df["benchmark_result_id"] > after_id)
+            )
+        df = df[mask].sort_values(
+            ["timestamp", "benchmark_result_id"], ignore_index=True
+        )
+        if self.limit is not None:
+            df = df.head(self.limit)
+        return df
+
+    def apply_to_samples(self, samples: List["HistorySample"]) -> List["HistorySample"]:
+        """
+        Same as `apply_to_df()`, but for a list of HistorySample objects.
+        """
+        selected = [
+            sample
+            for sample in samples
+            if (
+                self.earliest_commit_timestamp is None
+                or sample.commit_timestamp >= self.earliest_commit_timestamp
+            )
+            and (
+                self.latest_commit_timestamp is None
+                or sample.commit_timestamp <= self.latest_commit_timestamp
+            )
+            and (
+                self.after is None
+                or (sample.commit_timestamp, sample.benchmark_result_id) > self.after
+            )
+        ]
+        selected.sort(key=lambda s: (s.commit_timestamp, s.benchmark_result_id))
+        return selected[: self.limit]
+
+
+def get_history_for_benchmark(
+    benchmark_result_id: str, window: Optional[HistoryWindow] = None
+) -> List[HistorySample]:
     # First, find the history fingerprint based on the input benchmark result ID. This
     # database lookup may raise the `NotFound` exception.
 
@@ -147,11 +266,32 @@ def get_history_for_benchmark(benchmark_result_id: str) -> List[HistorySample]:
         # this is technically represented in the fingerprint, but we want to explicitly
         # store the benchmark name on the resulting objects
         benchmark_name,
+        window,
     )
 
 
+# Complete histories, keyed by (history fingerprint, HistoryVersion). An entry
+# is never stale: a change of the history changes its key. Do not mutate the
+# values.
+_history_cache: BoundedLRUCache[List[HistorySample]] = BoundedLRUCache(
+    HISTORY_CACHE_SIZE
+)
+
+
+def _lookup_history_cache(
+    key: Tuple[THistFingerprint, int]
+) -> Optional[List[HistorySample]]:
+    samples = _history_cache.get(key)
+    conbench.metrics.COUNTER_HISTORY_CACHE_LOOKUPS.labels(
+        result="miss" if samples is None else "hit"
+    ).inc()
+    return samples
+
+
 def get_history_for_fingerprint(
-    history_fingerprint: THistFingerprint, benchmark_name: TBenchmarkName
+    history_fingerprint: THistFingerprint,
+    benchmark_name: TBenchmarkName,
+    window: Optional[HistoryWindow] = None,
 ) -> List[HistorySample]:
     """
     Given a history fingerprint, return all non-errored BenchmarkResults (past, present,
@@ -159,10 +299,214 @@ def get_history_for_fingerprint(
     stats of the distribution as of each BenchmarkResult. Order is not guaranteed. Used
     to power the history API, which also powers the timeseries plots.
 
+    If `window` is given, return only the selected part of the history, in the
+    window's order. The stats are still those of the complete history. If the
+    stats are stored (see `_read_stored_rolling_stats()`), only the selected
+    results are fetched from the database.
+
+    Complete histories are kept in memory (bounded LRU cache) for as long as
+    their `HistoryVersion` does not change. Then, the database query is only
+    the version lookup.
+
     For further detail on the stats columns, see the docs of
     ``_add_rolling_stats_columns_to_history_query()``.
     """
-    history = (
+    # Look up the version before querying the history: if the history changes
+    # in between, the cache entry is older than its content (harmless).
+    key = (history_fingerprint, HistoryVersion.get(history_fingerprint))
+
+    samples = _lookup_history_cache(key)
+    if samples is None:
+        if window is not None:
+            # Do not fetch the complete history for serving a part of it.
+            return _query_history_for_fingerprint(
+                history_fingerprint, benchmark_name, window
+            )
+        samples = _query_history_for_fingerprint(history_fingerprint, benchmark_name)
+        _history_cache.put(key, samples)
+
+    if window is not None:
+        return window.apply_to_samples(samples)
+    return list(samples)
+
+
+def _query_history_for_fingerprint(
+    history_fingerprint: THistFingerprint,
+    benchmark_name: TBenchmarkName,
+    window: Optional[HistoryWindow] = None,
+) -> List[HistorySample]:
+    """
+    Implementation of `get_history_for_fingerprint()`, without the in-memory
+    cache.
+    """
+    history = _history_query(BenchmarkResult.history_fingerprint == history_fingerprint)
+
+    stats_df = None
+    if window is not None:
+        # Cheap: only IDs. Required for validating stored stats.
+        result_ids = set(
+            current_session.scalars(history.with_entities(BenchmarkResult.id))
+        )
+        stats_df = _read_stored_rolling_stats({history_fingerprint: result_ids}).get(
+            history_fingerprint
+        )
+
+    # Calculated stats of the complete history, to be stored.
+    calculated_df: Optional[pd.DataFrame] = None
+    if window is not None and stats_df is not None:
+        # Push the window down into the (expensive) history query.
+        page = (
+            history.filter(*window.sql_filters())
+            .order_by(Commit.timestamp, BenchmarkResult.id)
+            .limit(window.limit)
+        )
+        history_df, bmrs_by_bmrid = execute_history_query_get_dataframe(page.statement)
+        if len(history_df) == 0:
+            return []
+        history_df_rolling_stats = window.apply_to_df(
+            _with_stored_rolling_stats(history_df, stats_df)
+        )
+    else:
+        history_df, bmrs_by_bmrid = execute_history_query_get_dataframe(
+            history.statement
+        )
+        if len(history_df) == 0:
+            return []
+
+        if window is None:
+            stats_df = _read_stored_rolling_stats(
+                {history_fingerprint: set(history_df["benchmark_result_id"])}
+            ).get(history_fingerprint)
+
+        if stats_df is not None:
+            history_df_rolling_stats = _with_stored_rolling_stats(history_df, stats_df)
+        else:
+            history_df_rolling_stats = calculated_df = _add_rolling_stats_columns_to_df(
+                history_df, include_current_commit_in_rolling_stats=False
+            )
+
+        if window is not None:
+            history_df_rolling_stats = window.apply_to_df(history_df_rolling_stats)
+
+    samples = [
+        _history_sample(
+            sample, bmrs_by_bmrid[sample.benchmark_result_id], benchmark_name
+        )
+        for sample in history_df_rolling_stats.itertuples()
+    ]
+
+    # Do this last: committing expires the BenchmarkResult objects used above.
+    if calculated_df is not None:
+        _store_rolling_stats([history_fingerprint], calculated_df)
+
+    return samples
+
+
+def get_history_for_fingerprints(
+    history_fingerprints: List[THistFingerprint],
+) -> Dict[THistFingerprint, List[HistorySample]]:
+    """
+    Batch variant of `get_history_for_fingerprint()`: return the history of
+    each of the given history fingerprints. The histories that are not in the
+    in-memory cache are fetched with one database query, and the rolling stats
+    of those that do not have (valid) stored stats are calculated in one pass.
+
+    History fingerprints without (non-errored, default-branch) results are
+    not represented in the returned dictionary.
+    """
+    versions = HistoryVersion.get_many(history_fingerprints)
+
+    samples_by_fp: Dict[THistFingerprint, List[HistorySample]] = {}
+    for fp, version in versions.items():
+        samples = _lookup_history_cache((fp, version))
+        if samples is not None:
+            samples_by_fp[fp] = list(samples)
+
+    missing_fps = [fp for fp in versions if fp not in samples_by_fp]
+    if missing_fps:
+        queried = _query_histories_for_fingerprints(missing_fps)
+        for fp in missing_fps:
+            samples = queried.get(fp, [])
+            _history_cache.put((fp, versions[fp]), samples)
+            samples_by_fp[fp] = list(samples)
+
+    return {fp: samples for fp, samples in samples_by_fp.items() if samples}
+
+
+def _query_histories_for_fingerprints(
+    history_fingerprints: List[THistFingerprint],
+) -> Dict[THistFingerprint, List[HistorySample]]:
+    """
+    Implementation of `get_history_for_fingerprints()`, without the in-memory
+    cache.
+    """
+    history = _history_query(
+        BenchmarkResult.history_fingerprint
+        == s.any_(
+            s.bindparam(
+                "history_fingerprints",
+                list(history_fingerprints),
+                type_=postgresql.ARRAY(s.Text),
+            )
+        )
+    )
+
+    history_df, bmrs_by_bmrid = execute_history_query_get_dataframe(history.statement)
+    if len(history_df) == 0:
+        return {}
+
+    stats_dfs = _read_stored_rolling_stats(
+        {
+            fp: set(ids)
+            for fp, ids in history_df.groupby("history_fingerprint")[
+                "benchmark_result_id"
+            ]
+        }
+    )
+
+    dfs = [
+        _with_stored_rolling_stats(
+            history_df[history_df["history_fingerprint"] == fp], stats_df
+        )
+        for fp, stats_df in stats_dfs.items()
+    ]
+
+    # Calculated stats of the histories without stored stats, to be stored.
+    calculated_df: Optional[pd.DataFrame] = None
+    missing_df = history_df[~history_df["history_fingerprint"].isin(stats_dfs)]
+    if len(missing_df):
+        calculated_df = _add_rolling_stats_columns_to_df(
+            missing_df.reset_index(drop=True),
+            include_current_commit_in_rolling_stats=False,
+        )
+        dfs.append(calculated_df)
+
+    samples_by_fp: Dict[THistFingerprint, List[HistorySample]] = defaultdict(list)
+    for df in dfs:
+        for sample in df.itertuples():
+            result = bmrs_by_bmrid[sample.benchmark_result_id]
+            samples_by_fp[sample.history_fingerprint].append(
+                _history_sample(
+                    sample, result, cast(TBenchmarkName, str(result.case.name))
+                )
+            )
+
+    # Do this last: committing expires the BenchmarkResult objects used above.
+    if calculated_df is not None:
+        _store_rolling_stats(
+            list(calculated_df["history_fingerprint"].unique()), calculated_df
+        )
+
+    return dict(samples_by_fp)
+
+
+def _history_query(*filters):
+    """
+    Return the query for the non-errored default-branch results matching
+    `filters` (e.g. on the history fingerprint), along with the metadata that
+    `execute_history_query_get_dataframe()` expects.
+    """
+    return (
         current_session.query(
             BenchmarkResult,
             Hardware.hash.label("hardware_hash"),
@@ -179,89 +523,226 @@ def get_history_for_fingerprint(
         .join(Commit, Commit.id == BenchmarkResult.commit_id)
         .filter(
             BenchmarkResult.error.is_(None),
-            BenchmarkResult.history_fingerprint == history_fingerprint,
             # Today this is equivalent to "is on default branch". Note this excludes any
             # "unknown context" commits, where the repo/hash are known but metadata
             # retrieval from the GitHub API failed.
             Commit.sha == Commit.fork_point_sha,
+            *filters,
         )
     )
 
-    history_df, bmrs_by_bmrid = execute_history_query_get_dataframe(history.statement)
 
-    if len(history_df) == 0:
-        return []
+def _history_sample(
+    sample, result: BenchmarkResult, benchmark_name: TBenchmarkName
+) -> HistorySample:
+    """
+    Build a HistorySample from a row (namedtuple) of a dataframe with rolling
+    stats and the corresponding BenchmarkResult.
+    """
+    # Note(JP): the Commit.timestamp is nullable, i.e. not all Commit
+    # entities in the DB have a timestamp (authoring time) attached.
+    # However, in this function I believe there is an invariant that the
+    # query only returns Commits that we have this metadata for (what's the
+    # precise reason for this invariant? I think there is one). Codify this
+    # invariant with an assertion.
+    assert isinstance(sample.timestamp, datetime.datetime)
+
+    zstats = HistorySampleZscoreStats(
+        begins_distribution_change=sample.begins_distribution_change,
+        segment_id=sample.segment_id,
+        rolling_mean_excluding_this_commit=sample.rolling_mean_excluding_this_commit,
+        rolling_mean=_to_float_or_none(sample.rolling_mean),
+        residual=sample.residual,
+        rolling_stddev=_to_float_or_none(sample.rolling_stddev) or 0.0,
+        is_outlier=sample.is_outlier or False,
+    )
+
+    # For both, `sample.data` and `sample.times`, expect either None or a
+    # list. Make it so that in the output object they are always a list,
+    # potentially empty. `data` and `times` contain more than one value if
+    # this was a multi-sample benchmark.
+    data = []
+    if result.data is not None:
+        data = [float(d) if d is not None else math.nan for d in result.data]
+
+    times = []
+    if result.times is not None:
+        times = [float(t) if t is not None else math.nan for t in result.times]
+
+    return HistorySample(
+        benchmark_result_id=sample.benchmark_result_id,
+        benchmark_name=benchmark_name,
+        history_fingerprint=sample.history_fingerprint,
+        case_id=result.case_id,
+        case_text_id=result.case.text_id,
+        context_id=result.context_id,
+        mean=_to_float_or_none(result.mean),
+        svs=result.svs,
+        svs_type=result.svs_type,
+        data=data,
+        times=times,
+        # JSON schema requires unit to be set upon BMR insertion, so I
+        # do not think this 'undefined' is met often. Maybe empty
+        # strings can be inserted into the DB, and this would be
+        # handled here, too.
+        unit=result.unit if result.unit else "undefined",
+        hardware_hash=sample.hash,
+        repository=sample.repository,
+        commit_msg=sample.commit_message,
+        commit_hash=sample.commit_hash,
+        commit_timestamp=sample.timestamp,
+        run_name=sample.run_name,
+        zscorestats=zstats,
+    )
+
+
+# The columns of the history_stats table that hold the output of
+# _add_rolling_stats_columns_to_df().
+_HISTORY_STATS_COLUMNS = [
+    "begins_distribution_change",
+    "segment_id",
+    "is_outlier",
+    "rolling_mean_excluding_this_commit",
+    "rolling_mean",
+    "residual",
+    "rolling_stddev",
+]
+
+
+def _read_stored_rolling_stats(
+    result_ids_by_fp: Dict[THistFingerprint, Set[str]]
+) -> Dict[THistFingerprint, pd.DataFrame]:
+    """
+    Return the stored rolling stats for the histories of the given history
+    fingerprints (per history fingerprint, a dataframe with a
+    `benchmark_result_id` column plus the columns that
+    `_add_rolling_stats_columns_to_df(include_current_commit_in_rolling_stats=False)`
+    adds).
+
+    `result_ids_by_fp` maps each history fingerprint to the IDs of all results
+    in its history. A history fingerprint is not represented in the returned
+    dictionary if its stored rows do not cover exactly these IDs, i.e. if its
+    stats need to be calculated.
+    """
+    stored_df = pd.read_sql(
+        s.select(
+            HistoryStats.history_fingerprint,
+            HistoryStats.benchmark_result_id,
+            *[getattr(HistoryStats, c) for c in _HISTORY_STATS_COLUMNS],
+        ).where(
+            HistoryStats.history_fingerprint.in_(list(result_ids_by_fp)),
+            HistoryStats.distribution_commits == Config.DISTRIBUTION_COMMITS,
+            HistoryStats.change_point_detection == Config.CHANGE_POINT_DETECTION,
+            HistoryStats.svs_type == Config.SVS_TYPE,
+        ),
+        current_session.connection(),
+    )
+
+    # NULL -> NaN, as in the calculated columns.
+    for c in (
+        "rolling_mean_excluding_this_commit",
+        "rolling_mean",
+        "residual",
+        "rolling_stddev",
+    ):
+        stored_df[c] = stored_df[c].astype(np.float64)
+
+    stats_dfs = {}
+    for fp, df in stored_df.groupby("history_fingerprint"):
+        result_ids = result_ids_by_fp[fp]
+        if len(df) == len(result_ids) and set(df["benchmark_result_id"]) == result_ids:
+            stats_dfs[fp] = df.drop(columns="history_fingerprint")
+    return stats_dfs
 
-    history_df_rolling_stats = _add_rolling_stats_columns_to_df(
-        history_df, include_current_commit_in_rolling_stats=False
+
+def _with_stored_rolling_stats(
+    history_df: pd.DataFrame, stats_df: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Return `history_df` with the stats from `_read_stored_rolling_stats()`
+    added, ordered like `_add_rolling_stats_columns_to_df()` would order it.
+    """
+    df = history_df.merge(stats_df, on="benchmark_result_id")
+    return df.sort_values(
+        ["timestamp", "result_timestamp"], ignore_index=True, kind="stable"
     )
 
-    samples: List[HistorySample] = []
-
-    # Iterate over rows of pandas dataframe; get each row as namedtuple.
-    for sample in history_df_rolling_stats.itertuples():
-        # Note(JP): the Commit.timestamp is nullable, i.e. not all Commit
-        # entities in the DB have a timestamp (authoring time) attached.
-        # However, in this function I believe there is an invariant that the
-        # query only returns Commits that we have this metadata for (what's the
-        # precise reason for this invariant? I think there is one). Codify this
-        # invariant with an assertion.
-        assert isinstance(sample.timestamp, datetime.datetime)
-
-        # Restore 'sample' (df row) correspondence to BenchmarkResult objects.
-        result = bmrs_by_bmrid[sample.benchmark_result_id]
-
-        zstats = HistorySampleZscoreStats(
-            begins_distribution_change=sample.begins_distribution_change,
-            segment_id=sample.segment_id,
-            rolling_mean_excluding_this_commit=sample.rolling_mean_excluding_this_commit,
-            rolling_mean=_to_float_or_none(sample.rolling_mean),
-            residual=sample.residual,
-            rolling_stddev=_to_float_or_none(sample.rolling_stddev) or 0.0,
-            is_outlier=sample.is_outlier or False,
+
+def _store_rolling_stats(
+    history_fingerprints: List[THistFingerprint], df: pd.DataFrame
+) -> None:
+    """
+    Replace the history_stats rows of `history_fingerprints` with the rolling
+    stats in `df` (covering the histories of all of them), and commit.
+
+    This is an optimization for subsequent reads: log and carry on upon
+    failure.
+    """
+    rows = [
+        {
+            "benchmark_result_id": row.benchmark_result_id,
+            "history_fingerprint": row.history_fingerprint,
+            "commit_id": row.commit_id,
+            "distribution_commits": Config.DISTRIBUTION_COMMITS,
+            "change_point_detection": Config.CHANGE_POINT_DETECTION,
+            "svs_type": Config.SVS_TYPE,
+            "begins_distribution_change": bool(row.begins_distribution_change),
+            "segment_id": float(row.segment_id),
+            "is_outlier": bool(row.is_outlier),
+            "rolling_mean_excluding_this_commit": _to_float_or_none(
+                row.rolling_mean_excluding_this_commit
+            ),
+            "rolling_mean": _to_float_or_none(row.rolling_mean),
+            "residual": _to_float_or_none(row.residual),
+            "rolling_stddev": _to_float_or_none(row.rolling_stddev),
+        }
+        for row in df.itertuples()
+    ]
+
+    try:
+        HistoryStats.invalidate(*history_fingerprints)
+        # A concurrent writer may have inserted the same rows (with the same
+        # content) in the meantime.
+        current_session.execute(
+            postgresql.insert(HistoryStats).on_conflict_do_nothing(), rows
         )
+        current_session.commit()
+    except s.exc.SQLAlchemyError as exc:
+        log.warning(
+            "could not store rolling stats for %s: %s",
+            ", ".join(history_fingerprints),
+            exc,
+        )
+        current_session.rollback()
 
-        # For both, `sample.data` and `sample.times`, expect either None or a
-        # list. Make it so that in the output object they are always a list,
-        # potentially empty. `data` and `times` contain more than one value if
-        # this was a multi-sample benchmark.
-        data = []
-        if result.data is not None:
-            data = [float(d) if d is not None else math.nan for d in result.data]
-
-        times = []
-        if result.times is not None:
-            times = [float(t) if t is not None else math.nan for t in result.times]
-
-        samples.append(
-            HistorySample(
-                benchmark_result_id=sample.benchmark_result_id,
-                benchmark_name=benchmark_name,
-                history_fingerprint=history_fingerprint,
-                case_id=result.case_id,
-                case_text_id=result.case.text_id,
-                context_id=result.context_id,
-                mean=_to_float_or_none(result.mean),
-                svs=result.svs,
-                svs_type=result.svs_type,
-                data=data,
-                times=times,
-                # JSON schema requires unit to be set upon BMR insertion, so I
-                # do not think this 'undefined' is met often. Maybe empty
-                # strings can be inserted into the DB, and this would be
-                # handled here, too.
-                unit=result.unit if result.unit else "undefined",
-                hardware_hash=sample.hash,
-                repository=sample.repository,
-                commit_msg=sample.commit_message,
-                commit_hash=sample.commit_hash,
-                commit_timestamp=sample.timestamp,
-                run_name=sample.run_name,
-                zscorestats=zstats,
-            )
+
+def get_history_sketch(history_fingerprint: THistFingerprint) -> TDigest:
+    """
+    Return the quantile sketch of the single value summaries in the history of
+    `history_fingerprint` (see `HistorySketch`). Build it from the history
+    (and store it) if there is none yet; it is empty if there is no history.
+    """
+    digest = HistorySketch.get(history_fingerprint)
+    if digest is not None:
+        return digest
+
+    try:
+        HistorySketch.lock(history_fingerprint)
+        # It may have been built in the meantime.
+        digest = HistorySketch.get(history_fingerprint)
+        if digest is None:
+            digest = TDigest.of(history_svs_values(history_fingerprint))
+            if digest.count:
+                HistorySketch.put(history_fingerprint, digest)
+        current_session.commit()
+    except s.exc.SQLAlchemyError as exc:
+        log.warning(
+            "could not store history sketch for %s: %s", history_fingerprint, exc
         )
+        current_session.rollback()
+        digest = TDigest.of(history_svs_values(history_fingerprint))
 
-    return samples
+    return digest
 
 
 def set_z_scores(
@@ -293,8 +774,8 @@ def set_z_scores(
     )
 
     for benchmark_result in contender_benchmark_results:
-        dist_mean, dist_stddev = distribution_stats.get(
-            benchmark_result.history_fingerprint, (None, None)
+        dist_mean, dist_stddev, _ = distribution_stats.get(
+            benchmark_result.history_fingerprint, (None, None, 0)
         )
         benchmark_result.z_score = _calculate_z_score(
             data_point=_to_float_or_none(benchmark_result.svs),
@@ -304,9 +785,26 @@ def set_z_scores(
         )
 
 
+_distribution_stats_cache: BoundedLRUCache[TDistributionStats] = BoundedLRUCache(
+    DISTRIBUTION_STATS_CACHE_SIZE
+)
+
+
+def _lookup_distribution_stats_cache(
+    key: Tuple[str, TDistributionSettings, THistFingerprint, int]
+) -> Optional[TDistributionStats]:
+    stats = _distribution_stats_cache.get(key)
+    conbench.metrics.COUNTER_DISTRIBUTION_STATS_CACHE_LOOKUPS.labels(
+        result="miss" if stats is None else "hit"
+    ).inc()
+    return stats
+
+
 def _query_and_calculate_distribution_stats(
-    baseline_commit: Commit, history_fingerprints: List[THistFingerprint]
-) -> Dict[THistFingerprint, Tuple[Optional[float], Optional[float]]]:
+    baseline_commit: Commit,
+    history_fingerprints: List[THistFingerprint],
+    persist: bool = False,
+) -> Dict[THistFingerprint, TDistributionStats]:
     """Query and calculate rolling stats of the distribution of all BenchmarkResults
     that:
 
@@ -317,12 +815,22 @@ def _query_and_calculate_distribution_stats(
     The calculations are grouped by history fingerprint, returning a dict that looks
     like:
 
-    ``{history_fingerprint: (dist_mean, dist_stddev)}``
+    ``{history_fingerprint: (dist_mean, dist_stddev, n)}``
+
+    where n is the number of (non-outlier) results the stats are based on.
 
     Only do the calculation for the given history_fingerprints.
 
     For further detail on the stats columns, see the docs of
     ``_add_rolling_stats_columns_to_df()``.
+
+    The stats are memoized per history fingerprint, keyed by the ancestor
+    commits that make up the distribution and by the history version (which
+    changes when a result with that fingerprint is created or deleted, or its
+    change annotations are edited). The fingerprints that are not in the cache
+    are then looked up in the z_score_inputs table (see `ZScoreInputs`). Only
+    the remaining ones are queried from the database and calculated; with
+    `persist=True`, their stats are then stored in the z_score_inputs table.
     """
     try:
         commit_ancestry_query = baseline_commit.commit_ancestry_query.order_by(
@@ -337,29 +845,136 @@ def _query_and_calculate_distribution_stats(
         row.ancestor_id: row.ancestor_timestamp for row in commit_ancestry_info
     }
 
+    # The distribution window: the baseline commit and its ancestors (this
+    # changes e.g. when older commits were backfilled).
+    ancestry_digest = hashlib.sha1(
+        "\n".join(row.ancestor_id for row in commit_ancestry_info).encode()
+    ).hexdigest()
+    versions = HistoryVersion.get_many(history_fingerprints)
+
+    # The calculation also depends on these settings.
+    settings: TDistributionSettings = (
+        Config.DISTRIBUTION_COMMITS,
+        Config.SVS_TYPE,
+        Config.CHANGE_POINT_DETECTION,
+    )
+    keys = {
+        fp: (ancestry_digest, settings, fp, versions[fp]) for fp in history_fingerprints
+    }
+    stats: Dict[THistFingerprint, TDistributionStats] = {}
+    missing: List[THistFingerprint] = []
+    for fp, key in keys.items():
+        cached = _lookup_distribution_stats_cache(key)
+        if cached is None:
+            missing.append(fp)
+        else:
+            stats[fp] = cached
+
+    if missing:
+        stored = ZScoreInputs.read(
+            baseline_commit.id,
+            {fp: versions[fp] for fp in missing},
+            ancestry_digest,
+            settings,
+        )
+        for fp, fp_stats in stored.items():
+            stats[fp] = fp_stats
+            _distribution_stats_cache.put(keys[fp], fp_stats)
+        missing = [fp for fp in missing if fp not in stored]
+
+    if missing:
+        calculated = _calculate_distribution_stats(commit_timestamps_by_id, missing)
+        for fp in missing:
+            # Also remember that there is no distribution for `fp`.
+            stats[fp] = calculated.get(fp, (None, None, 0))
+            _distribution_stats_cache.put(keys[fp], stats[fp])
+
+        if persist:
+            _store_z_score_inputs(
+                baseline_commit.id,
+                {fp: stats[fp] for fp in missing},
+                ancestry_digest,
+                max(commit_timestamps_by_id.values()),
+                versions,
+                settings,
+            )
+
+    return stats
+
+
+def _store_z_score_inputs(
+    baseline_commit_id: str,
+    stats: Dict[THistFingerprint, TDistributionStats],
+    ancestry_digest: str,
+    latest_ancestor_timestamp: datetime.datetime,
+    versions: Dict[THistFingerprint, int],
+    settings: TDistributionSettings,
+) -> None:
+    """
+    Store `stats` in the z_score_inputs table, and commit.
+
+    This is an optimization for subsequent comparisons: log and carry on upon
+    failure.
+    """
+    try:
+        ZScoreInputs.store(
+            baseline_commit_id,
+            stats,
+            ancestry_digest,
+            latest_ancestor_timestamp,
+            versions,
+            settings,
+        )
+        current_session.commit()
+    except s.exc.SQLAlchemyError as exc:
+        log.warning(
+            "could not store z-score inputs for %s: %s",
+            ", ".join(stats),
+            exc,
+        )
+        current_session.rollback()
+
+
+def store_z_score_inputs(benchmark_result: BenchmarkResult) -> None:
+    """
+    Calculate the distribution stats of the history fingerprint of
+    `benchmark_result`, with the commit of `benchmark_result` as baseline
+    commit, and store them in the z_score_inputs table (see `ZScoreInputs`).
+
+    Called at ingest time if `Config.Z_SCORE_INPUTS_AT_INGEST` is set, so that
+    comparisons against that commit do not have to calculate them.
+    """
+    if benchmark_result.commit is None:
+        return
+    _query_and_calculate_distribution_stats(
+        baseline_commit=benchmark_result.commit,
+        history_fingerprints=[benchmark_result.history_fingerprint],
+        persist=True,
+    )
+
+
+def _calculate_distribution_stats(
+    commit_timestamps_by_id: Dict[str, datetime.datetime],
+    history_fingerprints: List[THistFingerprint],
+) -> Dict[THistFingerprint, TDistributionStats]:
+    """
+    Query the results with any of `history_fingerprints` on the commits in
+    `commit_timestamps_by_id`, and calculate the distribution stats (see
+    `_query_and_calculate_distribution_stats()`).
+    """
     # Note[austin]: Okay. Pros and cons here. This is not DRY, so we have to maintain
-    # this logic in addition to the SVS logic in benchmark_result.py. Also, the SVS is
-    # not exactly equivalent to the mean/min/max in all cases because of "errored
-    # results", and that's especially true if we change the default definition of SVS in
-    # the future (in which case let's revisit this!). But after careful analysis of the
-    # code, I believe that they are equivalent for BenchmarkResults where error is None
-    # and mean/min/max is not None, at least since #1127 or previous.
+    # svs_sql_expression() in addition to the SVS logic in benchmark_result.py. Also,
+    # the SVS is not exactly equivalent to the mean/min/max in all cases because of
+    # "errored results", and that's especially true if we change the default definition
+    # of SVS in the future (in which case let's revisit this!). But after careful
+    # analysis of the code, I believe that they are equivalent for BenchmarkResults
+    # where error is None and mean/min/max is not None, at least since #1127 or
+    # previous.
     #
     # The benefit of this assumption is we can avoid the time-consuming
     # execute_history_query_get_dataframe() for-loops and SQLAlchemy object
     # instantiation for big data (3e5 results). This goes SO MUCH faster.
-    if Config.SVS_TYPE == "mean":
-        svs_col = BenchmarkResult.mean
-    elif Config.SVS_TYPE == "best":
-        svs_col = s.case(
-            # Min/max are missing when there's 1 rep, but mean is always populated
-            (BenchmarkResult.max.is_(None), BenchmarkResult.mean),
-            # Right now less is always better unless the unit is per second
-            (BenchmarkResult.unit.like("%/s"), BenchmarkResult.max),
-            else_=BenchmarkResult.min,
-        )  # type: ignore
-    else:
-        raise ValueError("server is not configured properly")
+    svs_col = svs_sql_expression()
 
     # Find all historic results in the distribution to analyze.
     history = s.select(
@@ -391,8 +1006,25 @@ def _query_and_calculate_distribution_stats(
         ["history_fingerprint"]
     )
 
+    # The number of non-outlier results in the latest distribution segment of
+    # each history_fingerprint (the ones the latest rolling stats are based on).
+    latest_segment_by_fp = stats_df.set_index("history_fingerprint")["segment_id"]
+    in_latest_segment = (
+        history_df["segment_id"].to_numpy()
+        == history_df["history_fingerprint"].map(latest_segment_by_fp).to_numpy()
+    )
+    n_by_fp = (
+        history_df[in_latest_segment & ~history_df["is_outlier"].to_numpy(dtype=bool)]
+        .groupby("history_fingerprint")
+        .size()
+    )
+
     return {
-        row.history_fingerprint: (row.rolling_mean, row.rolling_stddev)
+        row.history_fingerprint: (
+            row.rolling_mean,
+            row.rolling_stddev,
+            int(n_by_fp.get(row.history_fingerprint, 0)),
+        )
         for row in stats_df.itertuples()
     }
 
@@ -466,6 +1098,7 @@ def execute_history_query_get_dataframe(statement) -> Tuple[pd.DataFrame, Dict]:
                 assert bmr_id == value.id
                 dict_for_df["benchmark_result_id"].append(bmr_id)
                 dict_for_df["case_id"].append(value.case_id)
+                dict_for_df["commit_id"].append(value.commit_id)
                 dict_for_df["context_id"].append(value.context_id)
                 # dict_for_df["mean"].append(value.mean)
                 dict_for_df["svs"].append(value.svs)
@@ -495,9 +1128,69 @@ def execute_history_query_get_dataframe(statement) -> Tuple[pd.DataFrame, Dict]:
     return history_df, bmrs_by_bmrid
 
 
-class _CommitIndexer(pd.api.indexers.BaseIndexer):
-    """pandas isn't great about rolling over ranges, so this class lets us roll over
-    the commit timestamp column correctly (not caring about time between commits)."""
+def _commit_ordinal_windows(
+    is_group_start: np.ndarray, timestamps: np.ndarray, window_size: int, closed: str
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the (start, end) row indexes of the rolling window of each row.
+
+    The rows must be sorted by group, then by commit timestamp; `is_group_start`
+    marks the first row of each group. All rows with the same timestamp in a group
+    belong to the same commit. Windows span `window_size` commits (not rows, and not
+    caring about time between commits) and never extend beyond the start of the
+    group:
+
+    - closed="right": the current commit and the `window_size - 1` commits before it
+    - closed="left": the `window_size` commits before the current commit
+    """
+    n = len(is_group_start)
+    is_commit_start = is_group_start.copy()
+    is_commit_start[1:] |= timestamps[1:] != timestamps[:-1]
+
+    # Dense commit ordinal, counting across all groups (each group covers a range of
+    # consecutive ordinals). Also: the first and the last+1 row of each commit.
+    commit_ordinals = np.cumsum(is_commit_start) - 1
+    commit_start_rows = np.flatnonzero(is_commit_start)
+    commit_end_rows = np.append(commit_start_rows[1:], n)
+
+    group_start_rows = np.flatnonzero(is_group_start)[np.cumsum(is_group_start) - 1]
+    group_first_ordinals = commit_ordinals[group_start_rows]
+
+    if closed == "right":
+        first_ordinals = commit_ordinals - window_size + 1
+        end_rows = commit_end_rows[commit_ordinals]
+    else:
+        first_ordinals = commit_ordinals - window_size
+        end_rows = commit_start_rows[commit_ordinals]
+
+    start_rows = commit_start_rows[np.maximum(first_ordinals, group_first_ordinals)]
+    return start_rows, end_rows
+
+
+def _rolling_commit_window_stats(
+    values: np.ndarray,
+    is_group_start: np.ndarray,
+    timestamps: np.ndarray,
+    window_size: int,
+    closed: str,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the (mean, stddev) of the non-NaN `values` in the rolling window of each
+    row; see `_commit_ordinal_windows()` for the windows.
+
+    All groups are processed in one pass. The mean is NaN for an empty window, the
+    (sample) standard deviation is NaN for a window with less than two values.
+    """
+    start_rows, end_rows = _commit_ordinal_windows(
+        is_group_start, timestamps, window_size, closed
+    )
+    rolling = pd.Series(values).rolling(
+        _PrecomputedWindowIndexer(start_rows=start_rows, end_rows=end_rows),
+        min_periods=1,
+    )
+    return rolling.mean().to_numpy(), rolling.std().to_numpy()
+
+
+class _PrecomputedWindowIndexer(pd.api.indexers.BaseIndexer):
+    """Rolling windows with the given (start, end) row indexes."""
 
     def get_window_bounds(
         self,
@@ -507,22 +1200,10 @@ class _CommitIndexer(pd.api.indexers.BaseIndexer):
         closed: Optional[str] = None,
         step: Optional[int] = None,
     ) -> Tuple[np.ndarray, np.ndarray]:
-        """Return numpy arrays of the respective start and end indexes of all rolling
-        windows for this slice of commit timestamps.
-        """
-        # self.index_array is the (sorted) current slice of the timestamp column,
-        # converted to an int64 np array. Find the dense rank of each timestamp.
-        commit_ranks = pd.Series(self.index_array).rank(method="dense").values
-
-        # np.searchsorted() finds the indices into which values would need to be
-        # inserted to maintain order. We can use that to find the indexes of the end of
-        # the window (same as the current commit) and start of the window (the current
-        # commit minus the window size).
-        end_ixs = np.searchsorted(commit_ranks, commit_ranks, side=closed)  # type: ignore[call-overload]
-        start_ixs = np.searchsorted(
-            commit_ranks, commit_ranks - self.window_size, side=closed
-        )  # type: ignore[call-overload]
-        return start_ixs, end_ixs
+        return (
+            self.start_rows.astype(np.int64, copy=False),
+            self.end_rows.astype(np.int64, copy=False),
+        )
 
 
 def _add_rolling_stats_columns_to_df(
@@ -572,11 +1253,14 @@ def _add_rolling_stats_columns_to_df(
     exclusive on the right side. This is useful if you want to compare each commit to
     the previous commit's rolling stats.
     """
-    df = _detect_shifts_with_trimmed_estimators(df=df)
+    df = CHANGE_POINT_DETECTORS[Config.CHANGE_POINT_DETECTION](df)
 
-    # pandas likes the data to be sorted
+    # The rolling statistics below require the data to be sorted
     df.sort_values(
-        ["history_fingerprint", "timestamp"], inplace=True, ignore_index=True
+        ["history_fingerprint", "timestamp"],
+        inplace=True,
+        ignore_index=True,
+        kind="stable",
     )
 
     # Clean up begins_distribution_change so it's a non-null boolean column
@@ -592,52 +1276,65 @@ def _add_rolling_stats_columns_to_df(
     # # Add in step changes automatically detected
     # df["begins_distribution_change"] = df["begins_distribution_change"] | df["is_step"]
 
-    # Add column with cumulative sum of distribution changes, to identify the segment
-    df["segment_id"] = (
-        df.groupby(["history_fingerprint"])
-        .rolling(
-            _CommitIndexer(window_size=len(df) + 1),
-            on="timestamp",
-            closed="right",
-            min_periods=1,
-        )["begins_distribution_change"]
-        .sum()
-        .values
-    )
+    n = len(df)
+    fingerprints = df["history_fingerprint"].to_numpy()
+    timestamps = df["timestamp"].to_numpy()
+    is_fingerprint_start = np.ones(n, dtype=bool)
+    is_fingerprint_start[1:] = fingerprints[1:] != fingerprints[:-1]
 
-    # Add column with rolling mean of the SVSs (only inside of the segment)
-    df.loc[~df.is_outlier, "rolling_mean_excluding_this_commit"] = (
-        df.loc[~df.is_outlier]
-        .groupby(["history_fingerprint", "segment_id"])
-        .rolling(
-            _CommitIndexer(window_size=Config.DISTRIBUTION_COMMITS),
-            on="timestamp",
-            # Exclude the current commit first...
-            closed="left",
-            min_periods=1,
-        )["svs"]
-        .mean()
-        .values
+    # Add column with cumulative sum of distribution changes (up to and including the
+    # current commit), to identify the segment
+    start_rows, end_rows = _commit_ordinal_windows(
+        is_fingerprint_start, timestamps, window_size=n + 1, closed="right"
+    )
+    change_counts = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(
+        df["begins_distribution_change"].to_numpy(dtype=bool), out=change_counts[1:]
+    )
+    segment_ids = (change_counts[end_rows] - change_counts[start_rows]).astype(
+        np.float64
+    )
+    df["segment_id"] = segment_ids
+
+    # The rolling stats only consider non-outliers (also when counting commits)
+    inlier = ~df["is_outlier"].to_numpy(dtype=bool)
+    timestamps_in = timestamps[inlier]
+    fingerprints_in = fingerprints[inlier]
+    segment_ids_in = segment_ids[inlier]
+    is_fingerprint_start_in = np.ones(len(fingerprints_in), dtype=bool)
+    is_fingerprint_start_in[1:] = fingerprints_in[1:] != fingerprints_in[:-1]
+    is_segment_start_in = is_fingerprint_start_in.copy()
+    is_segment_start_in[1:] |= segment_ids_in[1:] != segment_ids_in[:-1]
+    svs_in = df["svs"].to_numpy(dtype=np.float64)[inlier]
+
+    # Add column with rolling mean of the SVSs (only inside of the segment), excluding
+    # the current commit first...
+    mean_in, _ = _rolling_commit_window_stats(
+        svs_in,
+        is_segment_start_in,
+        timestamps_in,
+        window_size=Config.DISTRIBUTION_COMMITS,
+        closed="left",
     )
     # (and fill NaNs at the beginning of segments with the first value)
-    df.loc[~df.is_outlier, "rolling_mean_excluding_this_commit"] = df.loc[
-        ~df.is_outlier, "rolling_mean_excluding_this_commit"
-    ].combine_first(df.loc[~df.is_outlier, "svs"])
+    rolling_mean_excluding_this_commit = np.full(n, np.nan)
+    rolling_mean_excluding_this_commit[inlier] = np.where(
+        np.isnan(mean_in), svs_in, mean_in
+    )
+    df["rolling_mean_excluding_this_commit"] = rolling_mean_excluding_this_commit
 
     # ...but if requested, include the current commit
     if include_current_commit_in_rolling_stats:
-        df.loc[~df.is_outlier, "rolling_mean"] = (
-            df.loc[~df.is_outlier]
-            .groupby(["history_fingerprint", "segment_id"])
-            .rolling(
-                _CommitIndexer(window_size=Config.DISTRIBUTION_COMMITS),
-                on="timestamp",
-                closed="right",
-                min_periods=1,
-            )["svs"]
-            .mean()
-            .values
+        mean_in, _ = _rolling_commit_window_stats(
+            svs_in,
+            is_segment_start_in,
+            timestamps_in,
+            window_size=Config.DISTRIBUTION_COMMITS,
+            closed="right",
         )
+        rolling_mean = np.full(n, np.nan)
+        rolling_mean[inlier] = mean_in
+        df["rolling_mean"] = rolling_mean
     else:
         df["rolling_mean"] = df["rolling_mean_excluding_this_commit"]
 
@@ -647,18 +1344,16 @@ def _add_rolling_stats_columns_to_df(
 
     # Add column with the rolling standard deviation of the residuals
     # (these can go outside the segment since we assume they don't change much)
-    df.loc[~df.is_outlier, "rolling_stddev"] = (
-        df.loc[~df.is_outlier]
-        .groupby(["history_fingerprint"])  # not segment
-        .rolling(
-            _CommitIndexer(window_size=Config.DISTRIBUTION_COMMITS),
-            on="timestamp",
-            closed="right" if include_current_commit_in_rolling_stats else "left",
-            min_periods=1,
-        )["residual"]
-        .std()
-        .values
+    _, stddev_in = _rolling_commit_window_stats(
+        df["residual"].to_numpy(dtype=np.float64)[inlier],
+        is_fingerprint_start_in,  # not segment
+        timestamps_in,
+        window_size=Config.DISTRIBUTION_COMMITS,
+        closed="right" if include_current_commit_in_rolling_stats else "left",
     )
+    rolling_stddev = np.full(n, np.nan)
+    rolling_stddev[inlier] = stddev_in
+    df["rolling_stddev"] = rolling_stddev
 
     return df
 
@@ -702,56 +1397,244 @@ def _detect_shifts_with_trimmed_estimators(
 
     - `is_step` (bool): Is this point the start of a new segment?
     - `is_outlier` (bool): Is this point an outlier that should be ignored?
-    """
-    tmp_df = copy.deepcopy(df)
 
+    All history groups (history fingerprints) are processed at once: after
+    sorting, each group is a contiguous block of rows, and all operations below
+    are vectorized across these blocks.
+    """
     # skip computation if no history
     if df.shape[0] == 0:
-        tmp_df["is_step"] = pd.Series([], dtype=bool)
-        tmp_df["is_outlier"] = pd.Series([], dtype=bool)
-        return tmp_df
+        out_df = df.copy()
+        out_df["is_step"] = pd.Series([], dtype=bool)
+        out_df["is_outlier"] = pd.Series([], dtype=bool)
+        return out_df
 
     # pandas likes the data to be sorted
-    tmp_df.sort_values(
-        ["history_fingerprint", "timestamp", "result_timestamp"],
-        inplace=True,
-        ignore_index=True,
+    out_df = df.sort_values(
+        ["history_fingerprint", "timestamp", "result_timestamp"], ignore_index=True
+    )
+
+    n = len(out_df)
+    fingerprints = out_df["history_fingerprint"].to_numpy()
+    is_group_start = np.ones(n, dtype=bool)
+    is_group_start[1:] = fingerprints[1:] != fingerprints[:-1]
+    group_ids = np.cumsum(is_group_start) - 1
+    group_starts = np.flatnonzero(is_group_start)
+
+    # Difference to the previous value in the same group (NaN for the first
+    # value in each group).
+    svs = out_df["svs"].to_numpy(dtype=np.float64)
+    svs_diff = np.full(n, np.nan)
+    svs_diff[1:] = svs[1:] - svs[:-1]
+    svs_diff[is_group_start] = np.nan
+
+    # Trim: ignore differences outside of the 5 % - 95 % quantile range of the
+    # group.
+    q05 = _grouped_nanquantile(svs_diff, group_ids, group_starts, 0.05)[group_ids]
+    q95 = _grouped_nanquantile(svs_diff, group_ids, group_starts, 0.95)[group_ids]
+    svs_diff_clipped = svs_diff.copy()
+    svs_diff_clipped[(svs_diff < q05) | (svs_diff > q95)] = np.nan
+
+    rolling = pd.Series(svs_diff_clipped).rolling(
+        _GroupedFixedWindowIndexer(
+            window_size=Config.DISTRIBUTION_COMMITS,
+            group_starts=group_starts[group_ids],
+        ),
+        min_periods=1,
+    )
+    rolling_mean = rolling.mean().to_numpy()
+    rolling_std = rolling.std().to_numpy()
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z_score = (svs_diff - rolling_mean) / rolling_std
+
+    # Comparison with NaN is False.
+    is_shift = np.abs(z_score) > z_score_threshold
+
+    # A shift that is immediately followed by another shift (in the same
+    # group) is an outlier, not a step.
+    is_group_end = np.ones(n, dtype=bool)
+    is_group_end[:-1] = is_group_start[1:]
+    next_is_shift = np.zeros(n, dtype=bool)
+    next_is_shift[:-1] = is_shift[1:]
+    reverts = is_shift & next_is_shift & ~is_group_end
+    prev_reverts = np.zeros(n, dtype=bool)
+    prev_reverts[1:] = reverts[:-1]
+    prev_reverts[is_group_start] = False
+
+    out_df["is_step"] = is_shift & ~reverts & ~prev_reverts
+    out_df["is_outlier"] = is_shift & reverts
+
+    return out_df
+
+
+def _detect_shifts_with_binary_segmentation(
+    df: pd.DataFrame, z_score_threshold=5.0
+) -> pd.DataFrame:
+    """Detect outliers and distribution shifts in historical data
+
+    Alternative to `_detect_shifts_with_trimmed_estimators()`, with the same
+    interface. For each history (group):
+
+    - Estimate the noise level (standard deviation) robustly, from the median
+      absolute deviation of the differences between consecutive values.
+    - Mark the values that deviate from a rolling median (centered window of
+      five) by more than `z_score_threshold` standard deviations as outliers.
+    - Segment the remaining values into pieces of constant mean, with binary
+      segmentation: split at the position that explains the most variance, as
+      long as the means of the two parts differ with a z-score of more than
+      `z_score_threshold`. The first value of each piece (but the first) is a
+      step.
+
+    That is O(n log n) per history (for the typical case of few steps), and
+    detects sustained steps that are small compared to the noise. Histories are
+    processed one at a time, i.e. this is slower than the trimmed-estimators
+    method when there are many short histories.
+    """
+    out_df = df.sort_values(
+        ["history_fingerprint", "timestamp", "result_timestamp"], ignore_index=True
     )
 
-    # split / apply
-    out_group_df_list = []
-    for _, group_df in tmp_df.groupby(["history_fingerprint"]):
-        # clean copy will only get result columns
-        out_group_df = copy.deepcopy(group_df)
-
-        group_df["svs_diff"] = group_df["svs"].diff()
-        svs_diff_clipped = copy.deepcopy(group_df.svs_diff)
-        svs_diff_clipped.loc[
-            (group_df.svs_diff < group_df.svs_diff.quantile(0.05))
-            | (group_df.svs_diff > group_df.svs_diff.quantile(0.95))
-        ] = np.nan
-        group_df["rolling_mean"] = svs_diff_clipped.rolling(
-            Config.DISTRIBUTION_COMMITS, min_periods=1
-        ).mean()
-        group_df["rolling_std"] = svs_diff_clipped.rolling(
-            Config.DISTRIBUTION_COMMITS, min_periods=1
-        ).std()
-        group_df["z_score"] = (
-            group_df.svs_diff - group_df.rolling_mean
-        ) / group_df.rolling_std
-
-        group_df["is_shift"] = group_df.z_score.abs() > z_score_threshold
-        group_df["reverts"] = group_df.is_shift & group_df.is_shift.shift(-1)
-        out_group_df["is_step"] = (
-            group_df.is_shift
-            & ~group_df.reverts
-            & ~group_df.reverts.shift(1, fill_value=False)
+    n = len(out_df)
+    is_step = np.zeros(n, dtype=bool)
+    is_outlier = np.zeros(n, dtype=bool)
+
+    fingerprints = out_df["history_fingerprint"].to_numpy()
+    is_group_start = np.ones(n, dtype=bool)
+    is_group_start[1:] = fingerprints[1:] != fingerprints[:-1]
+    group_starts = np.flatnonzero(is_group_start)
+    group_ends = np.append(group_starts[1:], n)
+
+    svs = out_df["svs"].to_numpy(dtype=np.float64)
+
+    for start, end in zip(group_starts, group_ends):
+        rows = np.arange(start, end)[np.isfinite(svs[start:end])]
+        values = svs[rows]
+        if len(values) < 3:
+            continue
+
+        diffs = np.diff(values)
+        # Differences of two values have sqrt(2) times the standard deviation.
+        sigma = (
+            1.4826 * np.median(np.abs(diffs - np.median(diffs))) / math.sqrt(2)
+        ) or np.std(diffs) / math.sqrt(2)
+        if sigma == 0:
+            # Constant history.
+            continue
+
+        rolling_median = (
+            pd.Series(values).rolling(5, center=True, min_periods=1).median().to_numpy()
         )
-        out_group_df["is_outlier"] = group_df.is_shift & group_df.reverts
+        outlier = np.abs(values - rolling_median) > z_score_threshold * sigma
+        is_outlier[rows[outlier]] = True
 
-        out_group_df_list.append(out_group_df)
+        change_points = _binary_segmentation(
+            values[~outlier], min_gain=(z_score_threshold * sigma) ** 2
+        )
+        is_step[rows[~outlier][change_points]] = True
 
-    # combine
-    out_df = pd.concat(out_group_df_list)
+    out_df["is_step"] = is_step
+    out_df["is_outlier"] = is_outlier
 
     return out_df
+
+
+def _binary_segmentation(values: np.ndarray, min_gain: float) -> np.ndarray:
+    """
+    Return the (sorted) indices at which `values` is split into segments of
+    constant mean, i.e. the index of the first value of each segment but the
+    first one.
+
+    The gain of splitting a segment is the reduction of the sum of squared
+    deviations from the mean. For two parts of sizes n1 and n2 with means m1
+    and m2 that is (m1 - m2)^2 * n1 * n2 / (n1 + n2), i.e. the square of the
+    two-sample z-score of the means, times the variance of the values. Split as
+    long as the gain exceeds `min_gain`.
+    """
+    cumsum = np.zeros(len(values) + 1)
+    np.cumsum(values, out=cumsum[1:])
+
+    change_points = []
+    segments = [(0, len(values))]
+    while segments:
+        a, b = segments.pop()
+        if b - a < 2:
+            continue
+        k = np.arange(a + 1, b)
+        left = cumsum[k] - cumsum[a]
+        right = cumsum[b] - cumsum[k]
+        gain = (
+            left**2 / (k - a)
+            + right**2 / (b - k)
+            - (cumsum[b] - cumsum[a]) ** 2 / (b - a)
+        )
+        best = int(np.argmax(gain))
+        if gain[best] > min_gain:
+            split = a + 1 + best
+            change_points.append(split)
+            segments.extend([(a, split), (split, b)])
+
+    return np.array(sorted(change_points), dtype=np.int64)
+
+
+def _grouped_nanquantile(
+    values: np.ndarray, group_ids: np.ndarray, group_starts: np.ndarray, q: float
+) -> np.ndarray:
+    """
+    Return the `q` quantile of the non-NaN `values` for each group (NaN for a
+    group without non-NaN values). `group_ids` must be sorted (each group is a
+    contiguous block, starting at `group_starts`).
+
+    Same result as `pd.Series.quantile(q)` (i.e. numpy's default 'linear'
+    method) applied to each group.
+    """
+    # Sort values within each group; NaN last.
+    order = np.lexsort((values, group_ids))
+    sorted_values = values[order]
+
+    n_valid = np.add.reduceat((~np.isnan(values)).astype(np.int64), group_starts)
+    has_values = n_valid > 0
+
+    virtual_index = (n_valid - 1) * q
+    prev_index = np.floor(virtual_index)
+    gamma = virtual_index - prev_index
+    prev_index = np.maximum(prev_index.astype(np.int64), 0)
+    next_index = np.minimum(prev_index + 1, np.maximum(n_valid - 1, 0))
+
+    a = sorted_values[group_starts + prev_index]
+    b = sorted_values[group_starts + next_index]
+
+    # Linear interpolation, numerically the same as numpy's (see
+    # numpy.lib._function_base_impl._lerp).
+    diff_b_a = b - a
+    result = np.where(gamma >= 0.5, b - diff_b_a * (1 - gamma), a + diff_b_a * gamma)
+    result[~has_values] = np.nan
+    return result
+
+
+# Change-point detection strategies, selected with Config.CHANGE_POINT_DETECTION.
+# Each takes a dataframe with (at least) the columns history_fingerprint, svs,
+# timestamp and result_timestamp, and returns it sorted by those (but svs),
+# with the boolean columns `is_step` and `is_outlier` added.
+CHANGE_POINT_DETECTORS: Dict[str, Callable[[pd.DataFrame], pd.DataFrame]] = {
+    "trimmed": _detect_shifts_with_trimmed_estimators,
+    "binseg": _detect_shifts_with_binary_segmentation,
+}
+
+
+class _GroupedFixedWindowIndexer(pd.api.indexers.BaseIndexer):
+    """Fixed-size (trailing) rolling windows that do not extend beyond the start of
+    the group a row belongs to. Equivalent to a `rolling(window_size)` applied to each
+    group separately."""
+
+    def get_window_bounds(
+        self,
+        num_values: int = 0,
+        min_periods: Optional[int] = None,
+        center: Optional[bool] = None,
+        closed: Optional[str] = None,
+        step: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        end = np.arange(1, num_values + 1, dtype=np.int64)
+        start = np.maximum(end - self.window_size, self.group_starts).astype(np.int64)
+        return start, end
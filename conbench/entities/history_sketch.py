@@ -0,0 +1,96 @@
+from typing import Optional
+
+import sqlalchemy as s
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Mapped
+
+from conbench.config import Config
+from conbench.dbsession import current_session
+from conbench.quantilesketch import TDigest
+from conbench.types import THistFingerprint
+
+from ..entities._entity import Base, NotNull
+
+
+class HistorySketch(Base):
+    """
+    A quantile sketch (t-digest, see `conbench.quantilesketch`) of the single
+    value summaries of all results in the history of a history fingerprint
+    (the error-free default-branch results, as in the history API). Answers
+    percentile queries without reading the history.
+
+    Built from the history when it is needed first (see
+    `conbench.entities.history.get_history_sketch()`), then updated in the
+    transaction that creates a result (see `BenchmarkResult.create()`). A
+    t-digest cannot forget values: deleting a result deletes the row, which is
+    then rebuilt when it is needed next. Change annotations do not affect it.
+    """
+
+    __tablename__ = "history_sketch"
+    history_fingerprint: Mapped[THistFingerprint] = NotNull(s.Text, primary_key=True)
+    # Config.SVS_TYPE at the time the sketch was built.
+    svs_type: Mapped[str] = NotNull(s.Text)
+    digest: Mapped[bytes] = NotNull(s.LargeBinary)
+
+    @staticmethod
+    def lock(history_fingerprint: THistFingerprint) -> None:
+        """
+        Serialize changes to the sketch of `history_fingerprint` until the end
+        of the transaction. Without this, a sketch built from the history
+        concurrently with the creation of a result could miss that result.
+        """
+        current_session.execute(
+            s.select(
+                s.func.pg_advisory_xact_lock(
+                    s.func.hashtext("history_sketch:" + history_fingerprint)
+                )
+            )
+        )
+
+    @staticmethod
+    def get(history_fingerprint: THistFingerprint) -> Optional[TDigest]:
+        """
+        Return the sketch of `history_fingerprint`, or `None` if there is no
+        (valid) one.
+        """
+        row = current_session.execute(
+            s.select(HistorySketch.svs_type, HistorySketch.digest).where(
+                HistorySketch.history_fingerprint == history_fingerprint
+            )
+        ).first()
+        if row is None or row.svs_type != Config.SVS_TYPE:
+            return None
+        return TDigest.from_bytes(row.digest)
+
+    @staticmethod
+    def put(history_fingerprint: THistFingerprint, digest: TDigest) -> None:
+        """
+        Insert or replace the sketch of `history_fingerprint`. Does not
+        commit.
+        """
+        stmt = postgresql.insert(HistorySketch).values(
+            history_fingerprint=history_fingerprint,
+            svs_type=Config.SVS_TYPE,
+            digest=digest.to_bytes(),
+        )
+        current_session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[HistorySketch.history_fingerprint],
+                set_={
+                    "svs_type": stmt.excluded.svs_type,
+                    "digest": stmt.excluded.digest,
+                },
+            )
+        )
+
+    @staticmethod
+    def invalidate(history_fingerprint: THistFingerprint) -> None:
+        """
+        Delete the sketch of `history_fingerprint`. Does not commit.
+        """
+        HistorySketch.lock(history_fingerprint)
+        current_session.execute(
+            s.delete(HistorySketch).where(
+                HistorySketch.history_fingerprint == history_fingerprint
+            )
+        )
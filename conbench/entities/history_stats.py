@@ -0,0 +1,75 @@
+from typing import Optional
+
+import sqlalchemy as s
+from sqlalchemy.orm import Mapped
+
+from conbench.dbsession import current_session
+from conbench.types import THistFingerprint
+
+from ..entities._entity import Base, NotNull, Nullable
+
+
+class HistoryStats(Base):
+    """
+    Materialized rolling statistics of a history (see
+    `conbench.entities.history._add_rolling_stats_columns_to_df()`, called with
+    `include_current_commit_in_rolling_stats=False`).
+
+    There is one row per benchmark result in the history of a history
+    fingerprint, i.e. the rows for one (history_fingerprint, commit_id) pair
+    carry the statistics as of that commit. One row per result (rather than
+    one per commit) because outlier detection and residuals are per result.
+
+    The rows of a history fingerprint are written as a whole when that history
+    is requested and the stored rows do not exactly cover the results in the
+    history (e.g. because results were added or deleted since), or were
+    calculated with a different `Config.DISTRIBUTION_COMMITS`,
+    `Config.CHANGE_POINT_DETECTION` or `Config.SVS_TYPE`. Edits of change annotations delete the
+    rows of the affected history fingerprint.
+    """
+
+    __tablename__ = "history_stats"
+    benchmark_result_id: Mapped[str] = NotNull(
+        s.String(50),
+        s.ForeignKey("benchmark_result.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    history_fingerprint: Mapped[THistFingerprint] = NotNull(s.Text)
+    commit_id: Mapped[str] = NotNull(
+        s.String(50), s.ForeignKey("commit.id", ondelete="CASCADE")
+    )
+    # The window size (in commits) these stats were calculated with.
+    distribution_commits: Mapped[int] = NotNull(s.Integer)
+    # The change-point detection method these stats were calculated with.
+    change_point_detection: Mapped[str] = NotNull(s.Text)
+    # The single value summary type (Config.SVS_TYPE) these stats were
+    # calculated from.
+    svs_type: Mapped[str] = NotNull(s.Text)
+
+    begins_distribution_change: Mapped[bool] = NotNull(s.Boolean)
+    segment_id: Mapped[float] = NotNull(s.Float)
+    is_outlier: Mapped[bool] = NotNull(s.Boolean)
+    # These are NULL for outliers.
+    rolling_mean_excluding_this_commit: Mapped[Optional[float]] = Nullable(s.Float)
+    rolling_mean: Mapped[Optional[float]] = Nullable(s.Float)
+    residual: Mapped[Optional[float]] = Nullable(s.Float)
+    rolling_stddev: Mapped[Optional[float]] = Nullable(s.Float)
+
+    @staticmethod
+    def invalidate(*history_fingerprints: THistFingerprint) -> None:
+        """
+        Delete the rows of `history_fingerprints` (they are recalculated upon
+        next use). Does not commit.
+        """
+        current_session.execute(
+            s.delete(HistoryStats).where(
+                HistoryStats.history_fingerprint.in_(history_fingerprints)
+            )
+        )
+
+
+s.Index(
+    "history_stats_history_fingerprint_commit_id_index",
+    HistoryStats.history_fingerprint,
+    HistoryStats.commit_id,
+)
@@ -0,0 +1,62 @@
+from typing import Dict, Iterable
+
+import sqlalchemy as s
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Mapped
+
+from conbench.dbsession import current_session
+from conbench.types import THistFingerprint
+
+from ..entities._entity import Base, NotNull
+
+
+class HistoryVersion(Base):
+    """
+    A counter per history fingerprint, incremented with each change of the
+    history: a result with this history fingerprint was created or deleted, or
+    its change annotations were edited. Anything derived from a history (e.g.
+    the history API response) is valid as long as the version is the same.
+
+    A history fingerprint without row has version 0.
+    """
+
+    __tablename__ = "history_version"
+    history_fingerprint: Mapped[THistFingerprint] = NotNull(s.Text, primary_key=True)
+    version: Mapped[int] = NotNull(s.BigInteger)
+
+    @staticmethod
+    def bump(history_fingerprint: THistFingerprint) -> None:
+        """
+        Increment the version of `history_fingerprint`. Does not commit: call
+        this in the transaction that changes the history.
+        """
+        stmt = postgresql.insert(HistoryVersion).values(
+            history_fingerprint=history_fingerprint, version=1
+        )
+        current_session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[HistoryVersion.history_fingerprint],
+                set_={"version": HistoryVersion.version + 1},
+            )
+        )
+
+    @staticmethod
+    def get_many(
+        history_fingerprints: Iterable[THistFingerprint],
+    ) -> Dict[THistFingerprint, int]:
+        """
+        Return the current version of each of `history_fingerprints`.
+        """
+        history_fingerprints = list(history_fingerprints)
+        versions = {fp: 0 for fp in history_fingerprints}
+        for fp, version in current_session.execute(
+            s.select(HistoryVersion.history_fingerprint, HistoryVersion.version).where(
+                HistoryVersion.history_fingerprint.in_(history_fingerprints)
+            )
+        ):
+            versions[fp] = version
+        return versions
+
+    @staticmethod
+    def get(history_fingerprint: THistFingerprint) -> int:
+        return HistoryVersion.get_many([history_fingerprint])[history_fingerprint]
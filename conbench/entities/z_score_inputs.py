@@ -0,0 +1,183 @@
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+import sqlalchemy as s
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Mapped
+
+from conbench.dbsession import current_session
+from conbench.types import THistFingerprint
+
+from ..entities._entity import Base, NotNull, Nullable
+
+# (mean, standard deviation, number of results) of a distribution.
+TDistributionStats = Tuple[Optional[float], Optional[float], int]
+
+# (DISTRIBUTION_COMMITS, SVS_TYPE, CHANGE_POINT_DETECTION)
+TDistributionSettings = Tuple[int, str, str]
+
+
+class ZScoreInputs(Base):
+    """
+    Persisted inputs of the lookback z-score analysis (see
+    `conbench.entities.history.set_z_scores()`): the distribution of the
+    results with a history fingerprint in the ancestry of a baseline commit.
+
+    Written at ingest time if `Config.Z_SCORE_INPUTS_AT_INGEST` is set: for
+    each new result, with the commit of that result as baseline commit.
+    Comparisons against that baseline commit then read these rows instead of
+    calculating the distribution.
+
+    A row is only used if it was calculated for the same distribution window
+    (the same ancestor commits), with the same settings, and from the current
+    version of the history (see `HistoryVersion`): a row calculated
+    concurrently with a change of the history may be written after that
+    change. Creating or deleting a result, or editing its change annotations,
+    also deletes the rows of its history fingerprint that may have that result
+    in their distribution (see `invalidate()`).
+    """
+
+    __tablename__ = "z_score_inputs"
+    history_fingerprint: Mapped[THistFingerprint] = NotNull(s.Text, primary_key=True)
+    baseline_commit_id: Mapped[str] = NotNull(
+        s.String(50), s.ForeignKey("commit.id", ondelete="CASCADE"), primary_key=True
+    )
+    # Digest of the IDs of the ancestor commits (the distribution window).
+    ancestry_digest: Mapped[str] = NotNull(s.Text)
+    # The newest commit timestamp among the ancestor commits (for
+    # invalidation).
+    latest_ancestor_timestamp: Mapped[datetime] = NotNull(s.DateTime(timezone=False))
+    # The HistoryVersion of the history fingerprint these inputs were
+    # calculated from.
+    history_version: Mapped[int] = NotNull(s.BigInteger)
+    # The settings these inputs were calculated with.
+    distribution_commits: Mapped[int] = NotNull(s.Integer)
+    svs_type: Mapped[str] = NotNull(s.Text)
+    change_point_detection: Mapped[str] = NotNull(s.Text)
+
+    # These are NULL if there is no distribution (e.g. no results).
+    dist_mean: Mapped[Optional[float]] = Nullable(s.Float)
+    dist_stddev: Mapped[Optional[float]] = Nullable(s.Float)
+    # The number of results (excluding outliers) in the distribution.
+    n: Mapped[int] = NotNull(s.Integer)
+
+    @staticmethod
+    def read(
+        baseline_commit_id: str,
+        versions: Dict[THistFingerprint, int],
+        ancestry_digest: str,
+        settings: TDistributionSettings,
+    ) -> Dict[THistFingerprint, TDistributionStats]:
+        """
+        Return the stored distribution stats of those history fingerprints in
+        `versions` that have valid rows for the given baseline commit,
+        distribution window and settings, and for their given history version.
+        """
+        distribution_commits, svs_type, change_point_detection = settings
+        rows = current_session.execute(
+            s.select(
+                ZScoreInputs.history_fingerprint,
+                ZScoreInputs.history_version,
+                ZScoreInputs.dist_mean,
+                ZScoreInputs.dist_stddev,
+                ZScoreInputs.n,
+            ).where(
+                ZScoreInputs.history_fingerprint.in_(versions.keys()),
+                ZScoreInputs.baseline_commit_id == baseline_commit_id,
+                ZScoreInputs.ancestry_digest == ancestry_digest,
+                ZScoreInputs.distribution_commits == distribution_commits,
+                ZScoreInputs.svs_type == svs_type,
+                ZScoreInputs.change_point_detection == change_point_detection,
+            )
+        )
+        return {
+            row.history_fingerprint: (row.dist_mean, row.dist_stddev, row.n)
+            for row in rows
+            if row.history_version == versions[row.history_fingerprint]
+        }
+
+    @staticmethod
+    def store(
+        baseline_commit_id: str,
+        stats: Dict[THistFingerprint, TDistributionStats],
+        ancestry_digest: str,
+        latest_ancestor_timestamp: datetime,
+        versions: Dict[THistFingerprint, int],
+        settings: TDistributionSettings,
+    ) -> None:
+        """
+        Insert or replace the rows for `baseline_commit_id` and the history
+        fingerprints in `stats`, calculated from the history versions in
+        `versions`. Does not commit.
+        """
+        if not stats:
+            return
+
+        distribution_commits, svs_type, change_point_detection = settings
+        stmt = postgresql.insert(ZScoreInputs).values(
+            [
+                {
+                    "history_fingerprint": fp,
+                    "baseline_commit_id": baseline_commit_id,
+                    "ancestry_digest": ancestry_digest,
+                    "latest_ancestor_timestamp": latest_ancestor_timestamp,
+                    "history_version": versions[fp],
+                    "distribution_commits": distribution_commits,
+                    "svs_type": svs_type,
+                    "change_point_detection": change_point_detection,
+                    "dist_mean": dist_mean,
+                    "dist_stddev": dist_stddev,
+                    "n": n,
+                }
+                for fp, (dist_mean, dist_stddev, n) in stats.items()
+            ]
+        )
+        current_session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[
+                    ZScoreInputs.history_fingerprint,
+                    ZScoreInputs.baseline_commit_id,
+                ],
+                set_={
+                    col: stmt.excluded[col]
+                    for col in (
+                        "ancestry_digest",
+                        "latest_ancestor_timestamp",
+                        "history_version",
+                        "distribution_commits",
+                        "svs_type",
+                        "change_point_detection",
+                        "dist_mean",
+                        "dist_stddev",
+                        "n",
+                    )
+                },
+            )
+        )
+
+    @staticmethod
+    def invalidate(
+        history_fingerprint: THistFingerprint, commit_timestamp: Optional[datetime]
+    ) -> None:
+        """
+        Delete the rows of `history_fingerprint` whose distribution may
+        contain a result for a commit with `commit_timestamp`: a commit is
+        never newer than the newest of the ancestor commits it is among. Does
+        not commit.
+
+        A commit without timestamp is not in the ancestry of any commit.
+        """
+        if commit_timestamp is None:
+            return
+        if commit_timestamp.tzinfo is not None:
+            # Not yet reloaded from the database (tz-naive, UTC).
+            commit_timestamp = commit_timestamp.astimezone(timezone.utc).replace(
+                tzinfo=None
+            )
+
+        current_session.execute(
+            s.delete(ZScoreInputs).where(
+                ZScoreInputs.history_fingerprint == history_fingerprint,
+                ZScoreInputs.latest_ancestor_timestamp >= commit_timestamp,
+            )
+        )
@@ -65,6 +65,83 @@ GAUGE_BMRT_CACHE_LAST_UPDATE_SECONDS = prometheus_client.Gauge(
     "The time the last iteration of fetch_and_cache_most_recent_results() took",
 )
 
+GAUGE_BMRT_CACHE_PHASE_SECONDS = prometheus_client.Gauge(
+    "conbench_bmrt_cache_phase_seconds",
+    "For the last BMRT cache update: the time spent per phase (fetch: "
+    "database query and row processing, build: building the columnar store, "
+    "merge: merging with the cached results, index: building indexes and the "
+    "timeseries frame).",
+    labelnames=["phase"],
+)
+
+GAUGE_BMRT_CACHE_FETCH_ROWS_PER_SECOND = prometheus_client.Gauge(
+    "conbench_bmrt_cache_fetch_rows_per_second",
+    "For the last BMRT cache update: the number of rows fetched from the "
+    "database divided by the duration of the fetch phase.",
+)
+
+GAUGE_BMRT_CACHE_RESULTS = prometheus_client.Gauge(
+    "conbench_bmrt_cache_results",
+    "The number of benchmark results in the BMRT cache.",
+)
+
+GAUGE_BMRT_CACHE_TIMESERIES = prometheus_client.Gauge(
+    "conbench_bmrt_cache_timeseries",
+    "The number of distinct timeseries (benchmark name, case, context, "
+    "hardware) in the BMRT cache.",
+)
+
+GAUGE_BMRT_CACHE_BENCHMARK_NAMES = prometheus_client.Gauge(
+    "conbench_bmrt_cache_benchmark_names",
+    "The number of distinct benchmark names in the BMRT cache.",
+)
+
+GAUGE_BMRT_CACHE_BYTES = prometheus_client.Gauge(
+    "conbench_bmrt_cache_bytes",
+    "Approximate memory consumption of the BMRT cache, per component (store "
+    "arrays, store objects, and the individual indexes). The size of Python "
+    "objects is estimated by sampling.",
+    labelnames=["component"],
+)
+
+COUNTER_BMRT_SERIES_DF_CACHE_LOOKUPS = prometheus_client.Counter(
+    "conbench_bmrt_series_df_cache_lookups_total",
+    "The total number of lookups of per-timeseries dataframes (built on "
+    "demand from the BMRT cache), by result (hit: found in the LRU cache, "
+    "miss: built).",
+    labelnames=["result"],
+)
+
+COUNTER_HISTORY_CACHE_LOOKUPS = prometheus_client.Counter(
+    "conbench_history_cache_lookups_total",
+    "The total number of lookups of histories in the in-memory history "
+    "cache, by result (hit: served from memory, miss: read from the "
+    "database).",
+    labelnames=["result"],
+)
+
+COUNTER_DISTRIBUTION_STATS_CACHE_LOOKUPS = prometheus_client.Counter(
+    "conbench_distribution_stats_cache_lookups_total",
+    "The total number of lookups of z-score distribution stats (per history "
+    "fingerprint) in the in-memory cache, by result (hit: served from "
+    "memory, miss: calculated from the database).",
+    labelnames=["result"],
+)
+
+GAUGE_BMRT_CACHE_GENERATION = prometheus_client.Gauge(
+    "conbench_bmrt_cache_generation",
+    "The generation number of the currently published BMRT cache (increases "
+    "with each update that changed the cache).",
+)
+
+GAUGE_BMRT_CACHE_DEDUP_RATIO = prometheus_client.Gauge(
+    "conbench_bmrt_cache_dedup_ratio",
+    "For the last BMRT cache refresh: the number of results divided by the "
+    "number of distinct values, per dedup table / categorical column (e.g. "
+    "case, context, hardware, unit). Higher means more sharing.",
+    labelnames=["table"],
+)
+
 
 # The topic of Gauge initiatlization in the Prometheus ecosystem is confusing.
 # The spec says "Gauges MUST start at 0"
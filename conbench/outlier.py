@@ -1,8 +1,11 @@
 import logging
+from typing import Tuple
 
 import numpy as np
 import pandas as pd
 
+from conbench.quantilesketch import TDigest
+
 log = logging.getLogger(__name__)
 
 
@@ -102,3 +105,81 @@ def remove_outliers_by_iqrdist(
     # Mutate the input dataframe: set outliers to NaN.
     df.loc[outlier_index_mask, colname] = np.nan
     return df_outliers
+
+
+def outlier_mask_by_iqrdist_grouped(
+    values: np.ndarray, offsets: np.ndarray, iqdistance=10, keep_last_n=2
+) -> np.ndarray:
+    """
+    Vectorized variant of `remove_outliers_by_iqrdist()`: same method, but
+    applied to many series at once.
+
+    `values` is the concatenation of G (non-empty) series: series `g` is
+    `values[offsets[g]:offsets[g+1]]`, sorted by time (oldest first). As in
+    `remove_outliers_by_iqrdist()`, NaN values are ignored for calculating
+    median and IQR.
+
+    Return boolean mask (same shape as `values`): `True` for outliers. Do not
+    mutate the input.
+    """
+    if len(values) == 0:
+        return np.zeros(0, dtype=bool)
+
+    starts = offsets[:-1]
+    lengths = np.diff(offsets)
+    group_of_row = np.repeat(np.arange(len(lengths)), lengths)
+
+    # Sort values within each series, NaN last. Note that lexsort uses the
+    # last key as the primary one.
+    sorted_values = values[np.lexsort((values, group_of_row))]
+    n_valid = np.add.reduceat((~np.isnan(values)).astype(np.int64), starts)
+
+    def _quantile(q: float) -> np.ndarray:
+        # Linear interpolation between closest ranks (pandas' default).
+        last = np.maximum(n_valid - 1, 0)
+        pos = q * last
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.minimum(lo + 1, last)
+        frac = pos - lo
+        result = (
+            sorted_values[starts + lo] * (1 - frac) + sorted_values[starts + hi] * frac
+        )
+        result[n_valid == 0] = np.nan
+        return result
+
+    median = _quantile(0.5)
+    iqr = _quantile(0.75) - _quantile(0.25)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mask = np.abs((values - median[group_of_row]) / iqr[group_of_row]) > iqdistance
+
+    # Special treatment of the tail end of each series, see
+    # `remove_outliers_by_iqrdist()`.
+    n_from_end = np.repeat(offsets[1:], lengths) - np.arange(len(values))
+    mask[n_from_end <= keep_last_n] = False
+
+    n_outliers = np.add.reduceat(mask.astype(np.int64), starts)
+    for g in np.flatnonzero(n_outliers / lengths > 0.3):
+        log.warning(
+            "many outliers thrown out before lin reg: %s of %s values in series %s",
+            n_outliers[g],
+            lengths[g],
+            g,
+        )
+
+    return mask
+
+
+def iqrdist_bounds_from_sketch(sketch: TDigest, iqdistance=10) -> Tuple[float, float]:
+    """
+    Return the (lower, upper) bounds outside of which `remove_outliers_by_iqrdist()`
+    considers a value an outlier, with median and IQR estimated from a quantile
+    sketch of the series (see `conbench.quantilesketch`) instead of the full
+    series. NaN for an empty sketch.
+
+    Unlike `remove_outliers_by_iqrdist()`, this does not give special treatment
+    to the tail end of the series.
+    """
+    q25, median, q75 = sketch.quantiles([0.25, 0.5, 0.75])
+    iqr = q75 - q25
+    return (float(median - iqdistance * iqr), float(median + iqdistance * iqr))
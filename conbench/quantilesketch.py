@@ -0,0 +1,149 @@
+"""
+Mergeable quantile sketches (t-digest), in numpy.
+
+A t-digest summarizes a (possibly large) collection of values with a bounded
+number of weighted centroids. Quantiles estimated from it are accurate in
+the tails and have a small rank error in between. A digest can be updated
+incrementally, merged with other digests, and serialized compactly (see
+`TDigest.to_bytes()`).
+
+Reference: Dunning, Ertl: Computing Extremely Accurate Quantiles Using
+t-Digests (https://arxiv.org/abs/1902.04023). This is the merging variant
+with the k1 scale function. Instead of merging centroids greedily, one
+vectorized pass groups them by the integer part of the scale function at
+their left edge, so that no group spans more than one unit of the scale
+function.
+"""
+
+import math
+import struct
+from typing import Iterable, Union
+
+import numpy as np
+
+# A digest has at most COMPRESSION / 2 + 1 centroids. For up to roughly 60
+# values, no centroids are merged (quantiles are exact).
+DEFAULT_COMPRESSION = 200
+
+# Format version, compression, min, max, number of centroids.
+_HEADER = struct.Struct("<BHddI")
+_FORMAT_VERSION = 1
+
+
+class TDigest:
+    def __init__(self, compression: int = DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.means = np.zeros(0, dtype=np.float64)
+        self.weights = np.zeros(0, dtype=np.float64)
+        self.min = math.inf
+        self.max = -math.inf
+
+    @classmethod
+    def of(
+        cls, values: Iterable[float], compression: int = DEFAULT_COMPRESSION
+    ) -> "TDigest":
+        digest = cls(compression)
+        digest.update(values)
+        return digest
+
+    @property
+    def count(self) -> int:
+        """
+        The number of values added to this digest.
+        """
+        return int(self.weights.sum())
+
+    def update(self, values: Union[Iterable[float], np.ndarray]) -> None:
+        """
+        Add `values` to this digest. NaN values are ignored.
+        """
+        arr = np.asarray(
+            values if isinstance(values, np.ndarray) else list(values),
+            dtype=np.float64,
+        ).ravel()
+        arr = arr[~np.isnan(arr)]
+        if len(arr) == 0:
+            return
+
+        self.min = min(self.min, float(arr.min()))
+        self.max = max(self.max, float(arr.max()))
+        self._compress(
+            np.concatenate([self.means, arr]),
+            np.concatenate([self.weights, np.ones(len(arr))]),
+        )
+
+    def merge(self, other: "TDigest") -> None:
+        """
+        Add the values summarized by `other` to this digest.
+        """
+        if len(other.weights) == 0:
+            return
+
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(
+            np.concatenate([self.means, other.means]),
+            np.concatenate([self.weights, other.weights]),
+        )
+
+    def quantile(self, q: float) -> float:
+        """
+        See `quantiles()`.
+        """
+        return float(self.quantiles([q])[0])
+
+    def quantiles(self, qs: Iterable[float]) -> np.ndarray:
+        """
+        Estimate the quantiles `qs` (each between 0 and 1) of the values added
+        to this digest. NaN for an empty digest.
+
+        Interpolate linearly between closest ranks (the default of numpy and
+        pandas); this is exact as long as no centroids were merged.
+        """
+        q = np.asarray(list(qs), dtype=np.float64)
+        if len(self.weights) == 0:
+            return np.full(q.shape, np.nan)
+
+        total = self.weights.sum()
+        # The (0.5-based) rank of the center of each centroid, with min and
+        # max as anchors.
+        centers = np.cumsum(self.weights) - self.weights / 2
+        ranks = np.concatenate([[0.5], centers, [total - 0.5]])
+        values = np.concatenate([[self.min], self.means, [self.max]])
+        return np.interp(0.5 + q * (total - 1), ranks, values)
+
+    def to_bytes(self) -> bytes:
+        header = _HEADER.pack(
+            _FORMAT_VERSION, self.compression, self.min, self.max, len(self.means)
+        )
+        return header + self.means.tobytes() + self.weights.tobytes()
+
+    @classmethod
+    def from_bytes(cls, buf: bytes) -> "TDigest":
+        version, compression, min_, max_, n = _HEADER.unpack_from(buf)
+        if version != _FORMAT_VERSION:
+            raise ValueError(f"unsupported t-digest format version: {version}")
+
+        digest = cls(compression)
+        digest.min, digest.max = min_, max_
+        offset = _HEADER.size
+        digest.means = np.frombuffer(buf, dtype=np.float64, count=n, offset=offset)
+        digest.weights = np.frombuffer(
+            buf, dtype=np.float64, count=n, offset=offset + 8 * n
+        )
+        return digest
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray) -> None:
+        order = np.argsort(means, kind="stable")
+        means = means[order]
+        weights = weights[order]
+
+        # The k1 scale function (range: 0 to compression / 2) at the left
+        # edge of each centroid.
+        q_left = (np.cumsum(weights) - weights) / weights.sum()
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q_left - 1)
+        groups = np.floor(k + self.compression / 4).astype(np.int64)
+
+        starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
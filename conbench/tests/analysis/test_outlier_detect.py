@@ -1,6 +1,7 @@
 import os
 from typing import List
 
+import numpy as np
 import pandas as pd
 import pytest
 
@@ -12,7 +13,12 @@ empty_db_tables() called in non-testing mode, skip" warnings in local test
 execution).
 """
 
-from conbench.outlier import remove_outliers_by_iqrdist
+from conbench.outlier import (
+    iqrdist_bounds_from_sketch,
+    outlier_mask_by_iqrdist_grouped,
+    remove_outliers_by_iqrdist,
+)
+from conbench.quantilesketch import TDigest
 
 this_module_dirpath = os.path.dirname(os.path.abspath(__file__))
 
@@ -43,3 +49,32 @@ def test_scenarios(filename: str, expected_outliers: List):
     # print(dfa["svs"].loc[df_outliers.index])
     # print(dfa["svs"])
     assert df["svs"].loc[df_outliers.index].isna().sum() == len((expected_outliers))
+
+
+def test_grouped_equals_per_series():
+    filenames = [f"outlier_{x}.csv" for x in "ABCDE"]
+    dfs = [df_from_datafile(fn) for fn in filenames]
+
+    expected = []
+    for df in dfs:
+        dfc = df.copy()
+        remove_outliers_by_iqrdist(dfc, "svs")
+        expected.append(dfc["svs"].isna().values & df["svs"].notna().values)
+
+    values = np.concatenate([df["svs"].values for df in dfs])
+    offsets = np.cumsum([0] + [len(df) for df in dfs])
+    mask = outlier_mask_by_iqrdist_grouped(values, offsets)
+
+    assert list(mask) == list(np.concatenate(expected))
+    assert mask.sum() == 4
+
+
+@pytest.mark.parametrize("filename", [f"outlier_{x}.csv" for x in "ABCDE"])
+def test_bounds_from_sketch(filename: str):
+    df = df_from_datafile(filename)
+    dfc = df.copy()
+    df_outliers = remove_outliers_by_iqrdist(dfc, "svs")
+
+    lower, upper = iqrdist_bounds_from_sketch(TDigest.of(df["svs"].values))
+    svs = df["svs"].values[:-2]
+    assert list(svs[(svs < lower) | (svs > upper)]) == list(df_outliers["svs"].values)
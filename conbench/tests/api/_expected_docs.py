@@ -1396,6 +1396,109 @@
                 },
                 "description": "OK",
             },
+            "HistoryBatchList": {
+                "content": {
+                    "application/json": {
+                        "example": {
+                            "data": {
+                                "some-hexdigest": [
+                                    {
+                                        "benchmark_result_id": "some-benchmark-uuid-1",
+                                        "case_id": "some-case-uuid-1",
+                                        "commit_hash": "02addad336ba19a654f9c857ede546331be7b631",
+                                        "commit_msg": "ARROW-11771: [Developer][Archery] Move benchmark tests (so CI runs them)",
+                                        "commit_timestamp": "2021-02-25T01:02:51",
+                                        "context_id": "some-context-uuid-1",
+                                        "data": [
+                                            0.099094,
+                                            0.037129,
+                                            0.036381,
+                                            0.148896,
+                                            0.008104,
+                                            0.005496,
+                                            0.009871,
+                                            0.006008,
+                                            0.007978,
+                                            0.004733,
+                                        ],
+                                        "hardware_hash": "diana-2-2-4-17179869184",
+                                        "history_fingerprint": "some-hexdigest",
+                                        "mean": 0.036369,
+                                        "repository": "https://github.com/org/repo",
+                                        "run_name": "some run name",
+                                        "single_value_summary": 0.004733,
+                                        "single_value_summary_type": "min",
+                                        "times": [
+                                            0.099094,
+                                            0.037129,
+                                            0.036381,
+                                            0.148896,
+                                            0.008104,
+                                            0.005496,
+                                            0.009871,
+                                            0.006008,
+                                            0.007978,
+                                            0.004733,
+                                        ],
+                                        "unit": "s",
+                                        "zscorestats": {
+                                            "begins_distribution_change": False,
+                                            "is_outlier": False,
+                                            "residual": 0.0,
+                                            "rolling_mean": 0.004733,
+                                            "rolling_mean_excluding_this_commit": 0.004733,
+                                            "rolling_stddev": 0.0,
+                                            "segment_id": 0.0,
+                                        },
+                                    }
+                                ]
+                            }
+                        }
+                    }
+                },
+                "description": "OK",
+            },
+            "304": {"description": "Not Modified"},
+            "TrendList": {
+                "content": {
+                    "application/json": {
+                        "example": {
+                            "data": [
+                                {
+                                    "benchmark_name": "file-write",
+                                    "case_id": "some-case-uuid-1",
+                                    "context_id": "some-context-uuid-1",
+                                    "hardware_checksum": "some-hardware-checksum",
+                                    "n_points": 42,
+                                    "ordinate": 2.5,
+                                    "r_squared": 0.8,
+                                    "relative_change": 0.1,
+                                    "slope": 0.25,
+                                }
+                            ],
+                            "metadata": {"bmrt_cache_generation": 42},
+                        }
+                    }
+                },
+                "description": "OK",
+            },
+            "HistoryPercentiles": {
+                "content": {
+                    "application/json": {
+                        "example": {
+                            "data": {
+                                "count": 42,
+                                "history_fingerprint": "some-hexdigest",
+                                "max": 2.75,
+                                "min": 1.5,
+                                "outlier_bounds": [-0.5, 4.5],
+                                "quantiles": {"0.5": 2.0, "0.9": 2.25, "0.99": 2.5},
+                            }
+                        }
+                    }
+                },
+                "description": "OK",
+            },
         },
         "schemas": {
             "BenchmarkResultCreate": {
@@ -1707,6 +1810,19 @@
                 },
                 "type": "object",
             },
+            "HistoryBatch": {
+                "properties": {
+                    "history_fingerprints": {
+                        "description": "The history fingerprints to get the history for (at most 100).",
+                        "items": {"type": "string"},
+                        "maxItems": 100,
+                        "minItems": 1,
+                        "type": "array",
+                    }
+                },
+                "required": ["history_fingerprints"],
+                "type": "object",
+            },
         },
     },
     "info": {"title": "local-dev-conbench", "version": "1.0.0"},
@@ -2029,17 +2145,27 @@
         },
         "/api/history/download/{benchmark_result_id}/": {
             "get": {
-                "description": "Download time series",
+                "description": "Download time series (the current full history of the given benchmark\nresult).\n\nThe file is streamed. Formats: `csv` (default; metadata in `#`-prefixed\nheader lines), `parquet` (Apache Parquet) or `arrow` (Apache Arrow IPC\nstream format). For the latter two, the metadata is a JSON document in\nthe `conbench` key of the schema metadata.\n",
                 "parameters": [
                     {
                         "in": "path",
                         "name": "benchmark_result_id",
                         "required": True,
                         "schema": {"type": "string"},
-                    }
+                    },
+                    {
+                        "description": "The file format. Default `csv`.",
+                        "in": "query",
+                        "name": "format",
+                        "schema": {
+                            "enum": ["csv", "parquet", "arrow"],
+                            "type": "string",
+                        },
+                    },
                 ],
                 "responses": {
                     "200": {"$ref": "#/components/responses/HistoryList"},
+                    "400": {"$ref": "#/components/responses/400"},
                     "401": {"$ref": "#/components/responses/401"},
                     "404": {"$ref": "#/components/responses/404"},
                 },
@@ -2048,17 +2174,49 @@
         },
         "/api/history/{benchmark_result_id}/": {
             "get": {
-                "description": "Get details about all error-free benchmark results on the default branch\nthat match the given benchmark result's history fingerprint.\n\nThis endpoint also returns results of the lookback z-score analysis,\ncomparing each result to commits in its git history ending with its parent\ncommit. More details about this analysis can be found at\nhttps://conbench.github.io/conbench/pages/lookback_zscore.html.\n\nThough the response has pagination metadata, pagination is not currently\nimplemented. All matching results will be returned in one page.\n",
+                "description": "Get details about all error-free benchmark results on the default branch\nthat match the given benchmark result's history fingerprint.\n\nThis endpoint also returns results of the lookback z-score analysis,\ncomparing each result to commits in its git history ending with its parent\ncommit. More details about this analysis can be found at\nhttps://conbench.github.io/conbench/pages/lookback_zscore.html.\n\nBy default, all matching results are returned in one page (in no\nparticular order). If any of the `earliest_commit_timestamp`,\n`latest_commit_timestamp`, `cursor` or `page_size` query parameters is\nprovided, results are returned in commit timestamp order (old to new;\nties broken by result ID). The lookback z-score analysis always considers\nthe complete history.\n\nThe response carries a (weak) `ETag` header that changes whenever the\nhistory changes (a matching result is created or deleted, or change\nannotations are edited). Conditional requests (`If-None-Match`) are\nanswered with 304 Not Modified if the history did not change.\n",
                 "parameters": [
                     {
                         "in": "path",
                         "name": "benchmark_result_id",
                         "required": True,
                         "schema": {"type": "string"},
-                    }
+                    },
+                    {
+                        "description": "Return only results for commits authored at or after this time\n(interpreted as UTC if no timezone is given).\n",
+                        "in": "query",
+                        "name": "earliest_commit_timestamp",
+                        "schema": {"format": "date-time", "type": "string"},
+                    },
+                    {
+                        "description": "Return only results for commits authored at or before this time\n(interpreted as UTC if no timezone is given).\n",
+                        "in": "query",
+                        "name": "latest_commit_timestamp",
+                        "schema": {"format": "date-time", "type": "string"},
+                    },
+                    {
+                        "description": "A cursor for pagination through matching results in commit timestamp\norder.\n\nTo get the first page of results, leave out this query parameter or\nsubmit `null`. The response's `metadata` key will contain a\n`next_page_cursor` key, which will contain the cursor to provide to this\nquery parameter in order to get the next page. (If there is expected to\nbe no data in the next page, the `next_page_cursor` will be `null`.)\n",
+                        "in": "query",
+                        "name": "cursor",
+                        "schema": {"nullable": True, "type": "string"},
+                    },
+                    {
+                        "description": "The size of pages for pagination (see `cursor`). Default: no\npagination. Max 10000.\n",
+                        "in": "query",
+                        "name": "page_size",
+                        "schema": {"maximum": 10000, "minimum": 1, "type": "integer"},
+                    },
+                    {
+                        "description": "Comma-separated list of the keys to include in each returned result\nobject (e.g. `benchmark_result_id,commit_timestamp,single_value_summary`).\nDefault: all keys.\n",
+                        "in": "query",
+                        "name": "fields",
+                        "schema": {"type": "string"},
+                    },
                 ],
                 "responses": {
                     "200": {"$ref": "#/components/responses/HistoryList"},
+                    "304": {"$ref": "#/components/responses/304"},
+                    "400": {"$ref": "#/components/responses/400"},
                     "401": {"$ref": "#/components/responses/401"},
                     "404": {"$ref": "#/components/responses/404"},
                 },
@@ -2278,6 +2436,85 @@
                 "tags": ["Users"],
             },
         },
+        "/api/history/batch/": {
+            "post": {
+                "description": "Get the histories of many history fingerprints in one request.\n\nFor each given history fingerprint, the response's `data` object\ncontains a key with the list of error-free benchmark results on the\ndefault branch that have this history fingerprint (in no particular\norder; possibly empty), in the format of `GET /api/history/<id>/`,\nincluding the results of the lookback z-score analysis.\n",
+                "requestBody": {
+                    "content": {
+                        "application/json": {
+                            "schema": {"$ref": "#/components/schemas/HistoryBatch"}
+                        }
+                    }
+                },
+                "responses": {
+                    "200": {"$ref": "#/components/responses/HistoryBatchList"},
+                    "400": {"$ref": "#/components/responses/400"},
+                    "401": {"$ref": "#/components/responses/401"},
+                },
+                "tags": ["History"],
+            }
+        },
+        "/api/trends/": {
+            "get": {
+                "description": "Get the most-changed time series among the most recently submitted\nbenchmark results (the ones in the BMRT cache, also shown in the\nbenchmark trends UI).\n\nA time series is defined by benchmark name, case, context and\nhardware. For each time series with at least 10 data points\n(after outlier removal) and with a result from the last 30 days\n(relative to the newest result for the same benchmark name), a\nleast squares linear fit over time is precomputed.\n`relative_change` is the change of the fit across half of the time\nrange of the series, divided by the value of the fit in the\nmiddle of the time range. `r_squared` is the coefficient of\ndetermination of the fit.\n",
+                "parameters": [
+                    {
+                        "description": "Only consider time series for this benchmark name.",
+                        "in": "query",
+                        "name": "benchmark_name",
+                        "schema": {"type": "string"},
+                    },
+                    {
+                        "description": "Order by relative change (`increasing`: largest first;\n`decreasing`: smallest, i.e. most negative, first) or by the\nabsolute value of the relative change (`absolute`, the\ndefault; largest first).\n",
+                        "in": "query",
+                        "name": "direction",
+                        "schema": {
+                            "enum": ["increasing", "decreasing", "absolute"],
+                            "type": "string",
+                        },
+                    },
+                    {
+                        "description": "The maximum number of time series to return. Default 20.",
+                        "in": "query",
+                        "name": "limit",
+                        "schema": {"maximum": 1000, "minimum": 1, "type": "integer"},
+                    },
+                ],
+                "responses": {
+                    "200": {"$ref": "#/components/responses/TrendList"},
+                    "400": {"$ref": "#/components/responses/400"},
+                    "401": {"$ref": "#/components/responses/401"},
+                },
+                "tags": ["Trends"],
+            }
+        },
+        "/api/history/percentiles/{benchmark_result_id}/": {
+            "get": {
+                "description": "Get percentiles of the single value summaries of all error-free\nbenchmark results on the default branch that match the given benchmark\nresult's history fingerprint (the results of `GET /api/history/<id>/`).\n\nThe percentiles are estimated from a quantile sketch (t-digest) that is\nmaintained as results are submitted, i.e. without reading the history.\nThey are exact for histories of up to about 60 results; beyond that,\nthe rank error is a small fraction of a percent.\n\n`outlier_bounds` are the bounds outside of which a result is more than\n10 interquartile ranges away from the median (as used for outlier\nfiltering).\n\nFor an empty history, `count` is 0 and all values are null. Like\n`GET /api/history/<id>/`, the response carries a (weak) `ETag` header.\n",
+                "parameters": [
+                    {
+                        "in": "path",
+                        "name": "benchmark_result_id",
+                        "required": True,
+                        "schema": {"type": "string"},
+                    },
+                    {
+                        "description": "Comma-separated list of the quantiles to return (each between 0\nand 1). Default: `0.5,0.9,0.99` (p50, p90, p99).\n",
+                        "in": "query",
+                        "name": "quantiles",
+                        "schema": {"type": "string"},
+                    },
+                ],
+                "responses": {
+                    "200": {"$ref": "#/components/responses/HistoryPercentiles"},
+                    "304": {"$ref": "#/components/responses/304"},
+                    "400": {"$ref": "#/components/responses/400"},
+                    "401": {"$ref": "#/components/responses/401"},
+                    "404": {"$ref": "#/components/responses/404"},
+                },
+                "tags": ["History"],
+            }
+        },
     },
     "servers": [{"url": "http://127.0.0.1:5000/"}],
     "tags": [
@@ -2292,9 +2529,10 @@
         {"description": "Benchmark history", "name": "History"},
         {"description": "Benchmark hardware", "name": "Hardware"},
         {"description": "Benchmark runs", "name": "Runs"},
+        {"description": "Recent benchmark trends", "name": "Trends"},
         {"description": "Monitor status", "name": "Ping"},
         {
-            "description": '## BenchmarkResultCreate\n<SchemaDefinition schemaRef="#/components/schemas/BenchmarkResultCreate" />\n\n## BenchmarkResultStats\n<SchemaDefinition schemaRef="#/components/schemas/BenchmarkResultStats" />\n\n## BenchmarkResultUpdate\n<SchemaDefinition schemaRef="#/components/schemas/BenchmarkResultUpdate" />\n\n## ClusterCreate\n<SchemaDefinition schemaRef="#/components/schemas/ClusterCreate" />\n\n## Error\n<SchemaDefinition schemaRef="#/components/schemas/Error" />\n\n## ErrorBadRequest\n<SchemaDefinition schemaRef="#/components/schemas/ErrorBadRequest" />\n\n## ErrorValidation\n<SchemaDefinition schemaRef="#/components/schemas/ErrorValidation" />\n\n## Login\n<SchemaDefinition schemaRef="#/components/schemas/Login" />\n\n## MachineCreate\n<SchemaDefinition schemaRef="#/components/schemas/MachineCreate" />\n\n## Ping\n<SchemaDefinition schemaRef="#/components/schemas/Ping" />\n\n## Register\n<SchemaDefinition schemaRef="#/components/schemas/Register" />\n\n## SchemaGitHubCreate\n<SchemaDefinition schemaRef="#/components/schemas/SchemaGitHubCreate" />\n\n## UserCreate\n<SchemaDefinition schemaRef="#/components/schemas/UserCreate" />\n\n## UserUpdate\n<SchemaDefinition schemaRef="#/components/schemas/UserUpdate" />\n',
+            "description": '## BenchmarkResultCreate\n<SchemaDefinition schemaRef="#/components/schemas/BenchmarkResultCreate" />\n\n## BenchmarkResultStats\n<SchemaDefinition schemaRef="#/components/schemas/BenchmarkResultStats" />\n\n## BenchmarkResultUpdate\n<SchemaDefinition schemaRef="#/components/schemas/BenchmarkResultUpdate" />\n\n## ClusterCreate\n<SchemaDefinition schemaRef="#/components/schemas/ClusterCreate" />\n\n## Error\n<SchemaDefinition schemaRef="#/components/schemas/Error" />\n\n## ErrorBadRequest\n<SchemaDefinition schemaRef="#/components/schemas/ErrorBadRequest" />\n\n## ErrorValidation\n<SchemaDefinition schemaRef="#/components/schemas/ErrorValidation" />\n\n## HistoryBatch\n<SchemaDefinition schemaRef="#/components/schemas/HistoryBatch" />\n\n## Login\n<SchemaDefinition schemaRef="#/components/schemas/Login" />\n\n## MachineCreate\n<SchemaDefinition schemaRef="#/components/schemas/MachineCreate" />\n\n## Ping\n<SchemaDefinition schemaRef="#/components/schemas/Ping" />\n\n## Register\n<SchemaDefinition schemaRef="#/components/schemas/Register" />\n\n## SchemaGitHubCreate\n<SchemaDefinition schemaRef="#/components/schemas/SchemaGitHubCreate" />\n\n## UserCreate\n<SchemaDefinition schemaRef="#/components/schemas/UserCreate" />\n\n## UserUpdate\n<SchemaDefinition schemaRef="#/components/schemas/UserUpdate" />\n',
             "name": "Models",
             "x-displayName": "Object models",
         },
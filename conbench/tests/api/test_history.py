@@ -1,7 +1,10 @@
-from io import StringIO
+import json
+from io import BytesIO, StringIO
 from typing import List
 
 import pandas as pd
+import pyarrow.ipc
+import pyarrow.parquet
 from pandas import DatetimeIndex
 
 from ...api._examples import _api_history_entity
@@ -53,3 +56,217 @@ class TestHistoryGet(_asserts.GetEnforcer):
         )
         assert "svs" in df
         assert isinstance(df.index, DatetimeIndex)
+
+    def test_parquet_and_arrow_download(self, client):
+        self.authenticate(client)
+        benchmark_result = self._create()
+        url = f"/api/history/download/{benchmark_result.id}/"
+
+        response = client.get(url, query_string={"format": "parquet"})
+        assert response.status_code == 200
+        assert response.headers["Content-Disposition"].endswith(".parquet")
+        table = pyarrow.parquet.read_table(BytesIO(response.data))
+        metadata = json.loads(table.schema.metadata[b"conbench"])
+        assert metadata["result_id"] == benchmark_result.id
+        df = table.to_pandas()
+        assert list(df["result_id"]) == [benchmark_result.id]
+
+        response = client.get(url, query_string={"format": "arrow"})
+        assert response.status_code == 200
+        assert pyarrow.ipc.open_stream(response.data).read_all().to_pandas().equals(df)
+
+        response = client.get(url, query_string={"format": "hdf5"})
+        assert response.status_code == 400
+
+    def test_get_history_paginated(self, client):
+        self.authenticate(client)
+        _, benchmark_results = _fixtures.gen_fake_data()
+        url = f"/api/history/{benchmark_results[0].id}/"
+
+        # The first page is served while stats are not yet stored, the next
+        # one from stored stats.
+        pages = []
+        args = {"page_size": 4}
+        while True:
+            response = client.get(url, query_string=args)
+            assert response.status_code == 200
+            pages.append(response.json["data"])
+            args["cursor"] = response.json["metadata"]["next_page_cursor"]
+            if args["cursor"] is None:
+                break
+
+        assert [len(p) for p in pages] == [4, 2]
+
+        full = client.get(url).json["data"]
+        assert [d for p in pages for d in p] == sorted(
+            full, key=lambda d: (d["commit_timestamp"], d["benchmark_result_id"])
+        )
+
+    def test_get_history_time_window(self, client):
+        self.authenticate(client)
+        _, benchmark_results = _fixtures.gen_fake_data()
+        response = client.get(
+            f"/api/history/{benchmark_results[0].id}/",
+            query_string={
+                "earliest_commit_timestamp": "2022-01-04",
+                "latest_commit_timestamp": "2022-01-06T00:00:00Z",
+            },
+        )
+        assert response.status_code == 200
+        assert [d["commit_hash"] for d in response.json["data"]] == [
+            "44444",
+            "66666",
+            "66666",
+            "66666",
+        ]
+        assert response.json["metadata"]["next_page_cursor"] is None
+
+    def test_get_history_fields(self, client):
+        self.authenticate(client)
+        benchmark_result = self._create()
+        url = f"/api/history/{benchmark_result.id}/"
+
+        response = client.get(
+            url, query_string={"fields": "benchmark_result_id,single_value_summary"}
+        )
+        assert response.status_code == 200
+        assert set(response.json["data"][0]) == {
+            "benchmark_result_id",
+            "single_value_summary",
+        }
+
+        response = client.get(url, query_string={"fields": "svs"})
+        assert response.status_code == 400
+
+    def test_get_history_etag(self, client):
+        self.authenticate(client)
+        benchmark_result = self._create()
+        url = f"/api/history/{benchmark_result.id}/"
+
+        response = client.get(url)
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+
+        # Served from memory.
+        response = client.get(url)
+        assert response.headers["ETag"] == etag
+        assert response.json["data"] == _expected_entity(benchmark_result)
+
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+
+        # Editing change annotations changes the history.
+        response = client.put(
+            f"/api/benchmark-results/{benchmark_result.id}/",
+            json={"change_annotations": {"begins_distribution_change": True}},
+        )
+        assert response.status_code == 200
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert response.json["data"][0]["zscorestats"]["begins_distribution_change"]
+
+    def test_get_history_bad_args(self, client):
+        self.authenticate(client)
+        benchmark_result = self._create()
+        url = f"/api/history/{benchmark_result.id}/"
+        for args in (
+            {"page_size": "0"},
+            {"cursor": "foo"},
+            {"earliest_commit_timestamp": "yesterday"},
+        ):
+            assert client.get(url, query_string=args).status_code == 400
+
+
+class TestHistoryBatchPost(_asserts.ApiEndpointTest):
+    url = "/api/history/batch/"
+
+    def test_get_histories(self, client):
+        self.authenticate(client)
+        _, benchmark_results = _fixtures.gen_fake_data()
+        fingerprints = list(
+            dict.fromkeys(r.history_fingerprint for r in benchmark_results)
+        )
+
+        response = client.post(
+            self.url,
+            json={"history_fingerprints": fingerprints + ["unknown-fingerprint"]},
+        )
+        assert response.status_code == 200
+        data = response.json["data"]
+        assert list(data) == fingerprints + ["unknown-fingerprint"]
+        assert data["unknown-fingerprint"] == []
+
+        # Same as what the single-history endpoint returns.
+        for benchmark_result in benchmark_results:
+            expected = client.get(f"/api/history/{benchmark_result.id}/").json["data"]
+            key = lambda d: d["benchmark_result_id"]  # noqa: E731
+            assert sorted(data[benchmark_result.history_fingerprint], key=key) == (
+                sorted(expected, key=key)
+            )
+
+    def test_bad_payload(self, client):
+        self.authenticate(client)
+        for payload in (
+            {},
+            {"history_fingerprints": []},
+            {"history_fingerprints": ["fp"] * 101},
+        ):
+            assert client.post(self.url, json=payload).status_code == 400
+
+
+class TestHistoryPercentilesGet(_asserts.GetEnforcer):
+    url = "/api/history/percentiles/{}/"
+    public = True
+
+    def _create(self):
+        return _fixtures.benchmark_result()
+
+    def test_get_percentiles(self, client):
+        self.authenticate(client)
+        benchmark_results = [
+            _fixtures.benchmark_result(name="pct", results=[v]) for v in range(1, 6)
+        ]
+        url = self.url.format(benchmark_results[0].id)
+
+        response = client.get(url, query_string={"quantiles": "0,0.5,0.75,1"})
+        assert response.status_code == 200, response.text
+        data = response.json["data"]
+        assert data["history_fingerprint"] == benchmark_results[0].history_fingerprint
+        assert data["count"] == 5
+        assert (data["min"], data["max"]) == (1, 5)
+        assert data["quantiles"] == {"0": 1, "0.5": 3, "0.75": 4, "1": 5}
+        # Median 3, IQR 2.
+        assert data["outlier_bounds"] == [-17, 23]
+        etag = response.headers["ETag"]
+
+        response = client.get(url)
+        assert list(response.json["data"]["quantiles"]) == ["0.5", "0.9", "0.99"]
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+
+        # A t-digest cannot forget values: rebuilt from the history.
+        response = client.delete(f"/api/benchmark-results/{benchmark_results[-1].id}/")
+        assert response.status_code == 204
+        response = client.get(url, query_string={"quantiles": "1"})
+        assert response.headers["ETag"] != etag
+        assert response.json["data"]["count"] == 4
+        assert response.json["data"]["quantiles"] == {"1": 4}
+
+        # Added to the stored sketch.
+        _fixtures.benchmark_result(name="pct", results=[10])
+        response = client.get(url, query_string={"quantiles": "1"})
+        assert response.json["data"]["count"] == 5
+        assert response.json["data"]["quantiles"] == {"1": 10}
+
+    def test_bad_args(self, client):
+        self.authenticate(client)
+        benchmark_result = self._create()
+        url = self.url.format(benchmark_result.id)
+        for quantiles in ("foo", "0.5,2", "-0.1", "0.5,"):
+            response = client.get(url, query_string={"quantiles": quantiles})
+            self.assert_400_bad_request(
+                response,
+                "quantiles must be a comma-separated list of numbers between 0 and 1",
+            )
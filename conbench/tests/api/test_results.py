@@ -4,7 +4,10 @@ from typing import Tuple
 
 import pytest
 
+import conbench.api.results
+
 from ...api._examples import _api_benchmark_entity
+from ...config import Config
 from ...entities._entity import NotFound
 from ...entities.benchmark_result import BenchmarkResult
 from ...tests.api import _asserts, _fixtures
@@ -473,6 +476,22 @@ class TestBenchmarkResultPost(_asserts.PostEnforcer):
                     benchmark_result.hardware, attr
                 ) == int(value)
 
+    def test_create_benchmark_z_score_inputs_error(self, client, monkeypatch):
+        def store_z_score_inputs(benchmark_result):
+            raise Exception("could not store z-score inputs")
+
+        monkeypatch.setattr(Config, "Z_SCORE_INPUTS_AT_INGEST", True)
+        monkeypatch.setattr(
+            conbench.api.results, "store_z_score_inputs", store_z_score_inputs
+        )
+
+        self.authenticate(client)
+        response = client.post("/api/benchmarks/", json=self.valid_payload)
+        new_id = response.json["id"]
+        benchmark_result = BenchmarkResult.one(id=new_id)
+        location = "http://localhost/api/benchmarks/%s/" % new_id
+        self.assert_201_created(response, _expected_entity(benchmark_result), location)
+
     def test_create_benchmark_after_run_was_created(self, client):
         for hardware_type, run_payload, benchmark_results_payload in [
             ("machine", _fixtures.VALID_RUN_PAYLOAD, self.valid_payload),
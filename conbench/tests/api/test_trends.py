@@ -0,0 +1,31 @@
+import conbench.bmrt
+
+from ...tests.api import _asserts
+
+
+class TestTrendList(_asserts.ListEnforcer):
+    url = "/api/trends/"
+    public = True
+
+    def test_empty_cache(self, client):
+        conbench.bmrt.reinit()
+        self.authenticate(client)
+        response = client.get(f"{self.url}?benchmark_name=bname&limit=5")
+        assert response.status_code == 200, response.text
+        assert response.json["data"] == []
+        assert response.json["metadata"]["bmrt_cache_generation"] == (
+            conbench.bmrt.get_bmrt_cache().generation
+        )
+        assert response.headers["ETag"] == conbench.bmrt.get_bmrt_cache().etag
+
+    def test_bad_args(self, client):
+        self.authenticate(client)
+        response = client.get(f"{self.url}?direction=sideways")
+        self.assert_400_bad_request(
+            response, "direction must be one of: increasing, decreasing, absolute"
+        )
+        for limit in ("0", "1001", "foo"):
+            response = client.get(f"{self.url}?limit={limit}")
+            self.assert_400_bad_request(
+                response, "limit must be a positive integer no greater than 1000"
+            )
@@ -1,3 +1,4 @@
+import copy
 from datetime import datetime
 
 import pytest
@@ -129,3 +130,100 @@ class TestCBenchmarks(_asserts.AppEndpointTest):
         assert resp.status_code == 200, f"{resp.status_code}\n{resp.text}"
 
         assert "benchmark name not known: `bname`" in resp.text
+
+    def test_cache_incremental_update(self, client):
+        conbench.bmrt.reinit()
+        self.authenticate(client)
+
+        resp = client.post("/api/benchmark-results/", json=benchmark_result_dict)
+        assert resp.status_code == 201, f"{resp.status_code}\n{resp.text}"
+        first_id = resp.json["id"]
+
+        # No high-water mark yet: this performs a full refresh.
+        conbench.bmrt._fetch_and_cache_most_recent_results()
+        assert list(conbench.bmrt.get_bmrt_cache().by_id) == [first_id]
+        assert conbench.bmrt._refresh_state.high_water_mark == first_id
+
+        result_dict = copy.deepcopy(benchmark_result_dict)
+        result_dict["tags"]["name"] = "fun-benchmark-2"
+        resp = client.post("/api/benchmark-results/", json=result_dict)
+        assert resp.status_code == 201, f"{resp.status_code}\n{resp.text}"
+        second_id = resp.json["id"]
+
+        # This is an incremental update, merging the new result into the
+        # cache (and fetching the first one again, as of the overlap).
+        assert not conbench.bmrt._full_refresh_required()
+        generation_before = conbench.bmrt.get_bmrt_cache().generation
+        conbench.bmrt._fetch_and_cache_most_recent_results()
+        cache = conbench.bmrt.get_bmrt_cache()
+        assert cache.generation > generation_before
+        assert set(cache.by_id) == {first_id, second_id}
+        assert set(cache.by_benchmark_name) == {
+            "fun-benchmark",
+            "fun-benchmark-2",
+        }
+        assert len(cache.by_4t_frame) == 2
+        for bname, t4s in cache.t4s_by_bname.items():
+            assert len(t4s) == 1
+            _, case_id, context_id, hwchecksum = t4s[0]
+            series = cache.by_bname_case_hwctx[bname][case_id]
+            assert len(series[(hwchecksum, context_id)]) == 1
+            assert len(cache.series_df(t4s[0])) == 1
+        assert conbench.bmrt._refresh_state.high_water_mark == second_id
+
+        resp = client.get("/c-benchmarks/")
+        assert "2 unique benchmark names seen across the 2 newest results" in resp.text
+        assert resp.headers["ETag"] == cache.etag
+
+    def test_result_created_notification(self, client):
+        self.authenticate(client)
+
+        listener = conbench.bmrt._ResultNotificationListener()
+        # The first call establishes the connection (and reports that as
+        # notification: results might have been missed before).
+        assert listener.wait(0.1)
+        assert listener.listening
+        assert not listener.wait(0.1)
+
+        resp = client.post("/api/benchmark-results/", json=benchmark_result_dict)
+        assert resp.status_code == 201, f"{resp.status_code}\n{resp.text}"
+        assert listener.wait(5)
+        listener.close()
+        assert not listener.listening
+
+    def test_cache_warm_start(self, client, tmp_path):
+        conbench.bmrt.reinit()
+        self.authenticate(client)
+
+        resp = client.post("/api/benchmark-results/", json=benchmark_result_dict)
+        assert resp.status_code == 201, f"{resp.status_code}\n{resp.text}"
+        result_id = resp.json["id"]
+
+        conbench.bmrt._fetch_and_cache_most_recent_results()
+        conbench.bmrt._persist_for_warm_start(str(tmp_path))
+
+        # Simulate process restart.
+        conbench.bmrt.reinit()
+        assert len(conbench.bmrt.get_bmrt_cache().by_id) == 0
+
+        assert conbench.bmrt._warm_start(str(tmp_path))
+        assert list(conbench.bmrt.get_bmrt_cache().by_id) == [result_id]
+        assert conbench.bmrt._refresh_state.high_water_mark == result_id
+        # Catch up incrementally.
+        assert not conbench.bmrt._full_refresh_required()
+
+        resp = client.get("/c-benchmarks/")
+        assert "1 unique benchmark names seen across the 1 newest results" in resp.text
+
+
+def test_uuid7_hex_lower_bound():
+    # Generated at 2023-08-10 (ms since epoch: 0x0189df8ac3a6).
+    uuid7hex = "0189df8ac3a67d5c8000b2c1b5ae1e3a"
+    lb = conbench.bmrt._uuid7_hex_lower_bound(uuid7hex, 1)
+    assert lb == f"{0x0189df8ac3a6 - 1000:012x}" + "0" * 20
+    assert lb < uuid7hex
+
+    assert conbench.bmrt._is_uuid7_hex(uuid7hex)
+    # Legacy (UUID4) primary keys do not advance the high-water mark.
+    assert not conbench.bmrt._is_uuid7_hex("f" * 32)
+    assert conbench.bmrt._newer_high_water_mark(uuid7hex, "f" * 32) == uuid7hex
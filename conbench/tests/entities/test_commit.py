@@ -7,15 +7,18 @@ from datetime import timezone
 import pytest
 import sqlalchemy as s
 
+from ...db import _session as Session
 from ...entities.commit import (
     CantFindAncestorCommitsError,
     Commit,
     GitHubHTTPApiClient,
+    _github,
     backfill_default_branch_commits,
     get_github_commit_metadata,
     repository_to_name,
     repository_to_url,
 )
+from ...entities.commit_ancestry import CommitAncestry
 from ...tests.api import _fixtures
 
 this_dir = os.path.abspath(os.path.dirname(__file__))
@@ -55,8 +58,20 @@ def test_upsert_do_nothing():
     assert commit == commit_2
 
 
-def test_ancestor_commit_query():
+@pytest.mark.parametrize("materialized", [False, True])
+def test_ancestor_commit_query(materialized):
     commits, _ = _fixtures.gen_fake_data()
+    if materialized:
+        # Commit.create() added the commits to their lineages.
+        assert CommitAncestry.get(commits["sha"].id) is None
+        assert CommitAncestry.get(commits["00000"].id).position == 3
+        assert CommitAncestry.get(commits["66666"].id).position == 6
+    else:
+        # Without the materialized lineages, they are derived from the commit
+        # table.
+        Session.execute(s.delete(CommitAncestry))
+        Session.commit()
+
     for commit_sha, expected_ancestor_commit_shas in [
         ("11111", ["11111"]),
         ("22222", ["22222", "11111"]),
@@ -86,6 +101,67 @@ def test_ancestor_commit_query():
         assert actual_ancestor_ids == expected_ancestor_ids
 
 
+def test_commit_ancestry_when_backfill_fails(monkeypatch):
+    def get_default_branch(*args, **kwargs):
+        raise Exception("GitHub API unavailable")
+
+    monkeypatch.setattr(_github, "get_default_branch", get_default_branch)
+
+    repository = "https://github.com/org/repo"
+    default_branch = "org:main"
+    author = "author"
+
+    parent = Commit.create(
+        dict(
+            sha="1" * 40,
+            branch=default_branch,
+            repository=repository,
+            fork_point_sha="1" * 40,
+            message="parent",
+            author_name=author,
+            timestamp=datetime.datetime(2022, 10, 30, tzinfo=timezone.utc),
+        )
+    )
+    commit = Commit.create(
+        dict(
+            sha="2" * 40,
+            branch=default_branch,
+            repository=repository,
+            fork_point_sha="2" * 40,
+            message="child",
+            author_name=author,
+            timestamp=datetime.datetime(2022, 10, 31, tzinfo=timezone.utc),
+        )
+    )
+
+    with pytest.raises(Exception, match="GitHub API unavailable"):
+        backfill_default_branch_commits(repository, commit)
+
+    # The commit is in its lineage nevertheless, and in the ancestry of
+    # the commits after it.
+    assert CommitAncestry.get(commit.id).position == 2
+    child = Commit.create(
+        dict(
+            sha="3" * 40,
+            branch="some_fork:some_branch",
+            repository=repository,
+            fork_point_sha=commit.sha,
+            message="branch commit",
+            author_name=author,
+            timestamp=datetime.datetime(2022, 11, 1, tzinfo=timezone.utc),
+        )
+    )
+    assert [row.ancestor_hash for row in _last_ancestors(child, 3)] == [
+        child.sha,
+        commit.sha,
+        parent.sha,
+    ]
+
+
+def _last_ancestors(commit, n):
+    return commit.commit_ancestry_query.order_by(s.desc("commit_order")).limit(n).all()
+
+
 def test_ancestor_commit_query_bad_input():
     default_kwargs = {"repository": "r", "message": "m", "author_name": "a"}
     kwargs = default_kwargs.copy()
@@ -300,6 +376,12 @@ def test_backfill_default_branch_commits():
     )
     assert len(commits) == 338
     assert commits[1].sha == test_shas[2]
+    # The backfilled commit was numbered in between (generation numbers).
+    assert [CommitAncestry.get(c.id).position for c in commits[:3]] == [
+        338,
+        337,
+        336,
+    ]
 
     # post the next commit and ensure there's no backfill
     commit_3 = Commit.create(
@@ -333,6 +415,11 @@ def test_backfill_default_branch_commits():
     backfill_default_branch_commits_ign_rate_limit(repository, commit_4)
     commits = Commit.all(branch=default_branch, repository=repository)
     assert len(commits) == 339
+    assert CommitAncestry.get(commit_4.id).position == 1
+    assert [row.ancestor_hash for row in _last_ancestors(commit_4, 2)] == [
+        commit_4.sha,
+        test_shas[0],
+    ]
 
 
 def test_parse_commits():
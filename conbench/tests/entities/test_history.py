@@ -1,3 +1,5 @@
+import logging
+import time
 from datetime import datetime
 from typing import Callable, cast
 
@@ -7,18 +9,29 @@ import pytest
 import sigfig
 import sqlalchemy as s
 
+import conbench.entities.history
 from conbench.types import TBenchmarkName
 
 from ...config import Config
 from ...db import _session as Session
 from ...entities.commit import Commit
 from ...entities.history import (
+    CHANGE_POINT_DETECTORS,
+    _add_rolling_stats_columns_to_df,
     _detect_shifts_with_trimmed_estimators,
     get_history_for_fingerprint,
+    get_history_sketch,
     set_z_scores,
+    store_z_score_inputs,
 )
+from ...entities.history_sketch import HistorySketch
+from ...entities.history_stats import HistoryStats
+from ...entities.history_version import HistoryVersion
+from ...entities.z_score_inputs import ZScoreInputs
 from ...tests.api import _fixtures
 
+log = logging.getLogger(__name__)
+
 
 # Some different strategies for choosing a baseline commit to test set_z_scores()
 def _get_closest_defaultbranch_ancestor(commit: Commit) -> Commit:
@@ -223,6 +236,60 @@ def test_get_history():
         assert expected_benchmark_result_ids == actual_benchmark_result_ids
 
 
+def _count_stored_rolling_stats(history_fingerprint: str) -> int:
+    return (
+        Session.query(HistoryStats)
+        .filter(HistoryStats.history_fingerprint == history_fingerprint)
+        .count()
+    )
+
+
+def test_get_history_stores_rolling_stats(monkeypatch):
+    _, benchmark_results = _fixtures.gen_fake_data()
+    benchmark_result = benchmark_results[0]
+    fingerprint = benchmark_result.history_fingerprint
+    benchmark_name = cast(TBenchmarkName, str(benchmark_result.case.name))
+
+    calculated = get_history_for_fingerprint(fingerprint, benchmark_name)
+    assert _count_stored_rolling_stats(fingerprint) == len(calculated) == 6
+
+    # Stored stats are used, with the same outcome (repr(): NaN != NaN).
+    stored = get_history_for_fingerprint(fingerprint, benchmark_name)
+    assert repr(stored) == repr(calculated)
+
+    # Changing annotations invalidates the stored stats of the history.
+    benchmark_result.update(
+        {"change_annotations": {"begins_distribution_change": True}}
+    )
+    assert _count_stored_rolling_stats(fingerprint) == 0
+    recalculated = get_history_for_fingerprint(fingerprint, benchmark_name)
+    assert [s.zscorestats.begins_distribution_change for s in recalculated].count(
+        True
+    ) == 1
+    assert _count_stored_rolling_stats(fingerprint) == 6
+
+    # A new result in the history is noticed.
+    _fixtures.benchmark_result(
+        results=[2.0, 2.1, 2.2], commit=benchmark_result.commit, name=benchmark_name
+    )
+    assert len(get_history_for_fingerprint(fingerprint, benchmark_name)) == 7
+    assert _count_stored_rolling_stats(fingerprint) == 7
+
+    # Stats calculated from a different single value summary are not used.
+    monkeypatch.setattr(Config, "SVS_TYPE", "mean")
+    conbench.entities.history._history_cache.clear()
+    get_history_for_fingerprint(fingerprint, benchmark_name)
+    assert (
+        Session.query(HistoryStats)
+        .filter(
+            HistoryStats.history_fingerprint == fingerprint,
+            HistoryStats.svs_type == "mean",
+        )
+        .count()
+        == 7
+    )
+
+
 @pytest.mark.parametrize(
     ["strategy_name", "get_baseline_func"],
     [
@@ -347,7 +414,8 @@ def test_set_z_scores_with_distribution_change(
         assert_equal_leeway(benchmark_result.z_score, expected_z_score)
 
 
-def test_detect_shifts_with_trimmed_estimators():
+@pytest.mark.parametrize("method", list(CHANGE_POINT_DETECTORS))
+def test_detect_shifts(method):
     np.random.seed(47)
     mean_vals = pd.Series(np.random.randn(100))
 
@@ -374,7 +442,7 @@ def test_detect_shifts_with_trimmed_estimators():
         }
     )
 
-    result_df = _detect_shifts_with_trimmed_estimators(df)
+    result_df = CHANGE_POINT_DETECTORS[method](df)
 
     assert list(result_df.columns) == list(df.columns) + ["is_step", "is_outlier"]
     for i, is_outlier in enumerate(result_df.is_outlier):
@@ -388,6 +456,308 @@ def test_detect_shifts_with_trimmed_estimators():
     assert not np.any(result_df.is_step[51:])
 
 
+def _detect_shifts_per_group(df: pd.DataFrame, z_score_threshold=5.0) -> pd.DataFrame:
+    """
+    Reference implementation for _detect_shifts_with_trimmed_estimators():
+    straightforward, one history group at a time.
+    """
+    df = df.sort_values(
+        ["history_fingerprint", "timestamp", "result_timestamp"], ignore_index=True
+    )
+    out_group_df_list = []
+    for _, group_df in df.groupby(["history_fingerprint"]):
+        out_group_df = group_df.copy()
+        svs_diff = group_df["svs"].diff()
+        svs_diff_clipped = svs_diff.copy()
+        svs_diff_clipped.loc[
+            (svs_diff < svs_diff.quantile(0.05)) | (svs_diff > svs_diff.quantile(0.95))
+        ] = np.nan
+        rolling = svs_diff_clipped.rolling(Config.DISTRIBUTION_COMMITS, min_periods=1)
+        z_score = (svs_diff - rolling.mean()) / rolling.std()
+        is_shift = z_score.abs() > z_score_threshold
+        reverts = is_shift & is_shift.shift(-1, fill_value=False)
+        out_group_df["is_step"] = (
+            is_shift & ~reverts & ~reverts.shift(1, fill_value=False)
+        )
+        out_group_df["is_outlier"] = is_shift & reverts
+        out_group_df_list.append(out_group_df)
+
+    return pd.concat(out_group_df_list)
+
+
+def _gen_histories(n_groups: int, n_points_per_group: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    n = n_groups * n_points_per_group
+    svs = rng.standard_normal(n)
+    # Outliers, and a shift in the second half of each history.
+    svs[rng.random(n) < 0.03] += 30
+    svs[np.arange(n) % n_points_per_group >= n_points_per_group // 2] += 50
+    df = pd.DataFrame(
+        {
+            "history_fingerprint": np.repeat(
+                [f"fingerprint-{g}" for g in range(n_groups)], n_points_per_group
+            ),
+            "timestamp": np.tile(np.arange(n_points_per_group), n_groups),
+            "result_timestamp": rng.integers(0, 10**6, n),
+            "svs": svs,
+        }
+    )
+    # Input order does not matter.
+    return df.sample(frac=1, random_state=seed, ignore_index=True)
+
+
+@pytest.mark.parametrize(
+    "n_groups, n_points_per_group", [(1, 1), (3, 2), (7, 150), (2, 1000)]
+)
+def test_detect_shifts_same_as_per_group(n_groups, n_points_per_group):
+    df = _gen_histories(n_groups, n_points_per_group, seed=n_groups)
+    expected = _detect_shifts_per_group(df)
+    result_df = _detect_shifts_with_trimmed_estimators(df)
+
+    assert expected.is_step.any() or n_points_per_group < 10
+    pd.testing.assert_frame_equal(
+        result_df, expected.reset_index(drop=True), check_exact=True
+    )
+
+
+def test_detect_shifts_same_as_per_group_many_histories(record_property):
+    # 10^5 data points, across 500 histories. Also report the runtimes (see
+    # the log, or the junit XML properties), without asserting on them.
+    df = _gen_histories(500, 200, seed=1)
+
+    t0 = time.perf_counter()
+    expected = _detect_shifts_per_group(df)
+    t_per_group = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    result_df = _detect_shifts_with_trimmed_estimators(df)
+    t_vectorized = time.perf_counter() - t0
+
+    log.info("per group: %.3f s, vectorized: %.3f s", t_per_group, t_vectorized)
+    record_property("runtime_per_group_s", t_per_group)
+    record_property("runtime_vectorized_s", t_vectorized)
+    pd.testing.assert_frame_equal(
+        result_df, expected.reset_index(drop=True), check_exact=True
+    )
+
+
+class _CommitIndexer(pd.api.indexers.BaseIndexer):
+    """Rolling windows over the (dense-ranked) commit timestamps of one group."""
+
+    def get_window_bounds(
+        self, num_values=0, min_periods=None, center=None, closed=None, step=None
+    ):
+        commit_ranks = pd.Series(self.index_array).rank(method="dense").values
+        end_ixs = np.searchsorted(commit_ranks, commit_ranks, side=closed)
+        start_ixs = np.searchsorted(
+            commit_ranks, commit_ranks - self.window_size, side=closed
+        )
+        return start_ixs, end_ixs
+
+
+def _add_rolling_stats_columns_per_group(
+    df: pd.DataFrame, include_current_commit_in_rolling_stats: bool
+) -> pd.DataFrame:
+    """
+    Reference implementation for _add_rolling_stats_columns_to_df(): one
+    groupby().rolling() pass per statistic, with windows found per group.
+    """
+    df = _detect_shifts_with_trimmed_estimators(df=df)
+    df.sort_values(
+        ["history_fingerprint", "timestamp"],
+        inplace=True,
+        ignore_index=True,
+        kind="stable",
+    )
+    df["begins_distribution_change"] = [
+        bool(x.get("begins_distribution_change", False)) if x else False
+        for x in df["change_annotations"]
+    ]
+    df["segment_id"] = (
+        df.groupby(["history_fingerprint"])
+        .rolling(
+            _CommitIndexer(window_size=len(df) + 1),
+            on="timestamp",
+            closed="right",
+            min_periods=1,
+        )["begins_distribution_change"]
+        .sum()
+        .values
+    )
+
+    def rolling_inliers(by, column, closed):
+        return (
+            df.loc[~df.is_outlier]
+            .groupby(by)
+            .rolling(
+                _CommitIndexer(window_size=Config.DISTRIBUTION_COMMITS),
+                on="timestamp",
+                closed=closed,
+                min_periods=1,
+            )[column]
+        )
+
+    segment = ["history_fingerprint", "segment_id"]
+    df.loc[~df.is_outlier, "rolling_mean_excluding_this_commit"] = (
+        rolling_inliers(segment, "svs", "left").mean().values
+    )
+    df.loc[~df.is_outlier, "rolling_mean_excluding_this_commit"] = df.loc[
+        ~df.is_outlier, "rolling_mean_excluding_this_commit"
+    ].combine_first(df.loc[~df.is_outlier, "svs"])
+    if include_current_commit_in_rolling_stats:
+        df.loc[~df.is_outlier, "rolling_mean"] = (
+            rolling_inliers(segment, "svs", "right").mean().values
+        )
+    else:
+        df["rolling_mean"] = df["rolling_mean_excluding_this_commit"]
+    df["residual"] = df["svs"] - df["rolling_mean_excluding_this_commit"]
+    df.loc[~df.is_outlier, "rolling_stddev"] = (
+        rolling_inliers(
+            ["history_fingerprint"],
+            "residual",
+            "right" if include_current_commit_in_rolling_stats else "left",
+        )
+        .std()
+        .values
+    )
+    return df
+
+
+def _gen_step_histories(
+    n_groups: int, n_points_per_group: int, step_size: float, seed: int
+) -> pd.DataFrame:
+    """
+    Histories with noise like in populate_local_conbench.py (normal distribution
+    with lower bound, occasional slowdowns and outliers), and steps of
+    `step_size` (up or down) at random positions. The `is_true_step` column
+    marks the first result after each step.
+    """
+    rng = np.random.default_rng(seed)
+    n = n_groups * n_points_per_group
+    svs = rng.normal(20.0, 2.0, n)
+    while (below_bound := svs < 17.5).any():
+        svs[below_bound] = rng.normal(20.0, 2.0, below_bound.sum())
+    slowdown = rng.random(n) < 0.1
+    svs[slowdown] += 4.0 * rng.random(slowdown.sum())
+    outlier = rng.random(n) < 0.08
+    svs[outlier] += 40.0 * rng.random(outlier.sum())
+
+    position = np.tile(np.arange(n_points_per_group), n_groups)
+    is_true_step = (rng.random(n) < 0.01) & (position > 0)
+    step = is_true_step * rng.choice([-step_size, step_size], n)
+    svs += np.cumsum(step.reshape(n_groups, n_points_per_group), axis=1).ravel()
+
+    return pd.DataFrame(
+        {
+            "history_fingerprint": np.repeat(
+                [f"fingerprint-{g}" for g in range(n_groups)], n_points_per_group
+            ),
+            "timestamp": position,
+            "result_timestamp": position,
+            "svs": svs,
+            "is_true_step": is_true_step,
+        }
+    )
+
+
+# Loose floors for (recall, precision). In practice: about 0.1 for the
+# trimmed-estimators method (it looks at the differences between consecutive
+# results, i.e. it is tuned for steps that are large compared to the noise),
+# and about 0.9 for binary segmentation.
+_CHANGE_POINT_DETECTION_QUALITY_FLOORS = {"trimmed": 0.05, "binseg": 0.8}
+
+
+@pytest.mark.parametrize("method", sorted(CHANGE_POINT_DETECTORS))
+@pytest.mark.parametrize(
+    "n_groups, n_points_per_group", [(1, 10000), (50, 400), (500, 40)]
+)
+def test_change_point_detection_quality(
+    method, n_groups, n_points_per_group, record_property
+):
+    # Steps of five standard deviations. A detected step counts if it is at
+    # most two results away from a true step (and vice versa). Also report the
+    # runtime (see the log, or the junit XML properties), without asserting on
+    # it: this is the accuracy-vs-speed tradeoff of Config.CHANGE_POINT_DETECTION.
+    df = _gen_step_histories(n_groups, n_points_per_group, step_size=10.0, seed=3)
+
+    t0 = time.perf_counter()
+    result_df = CHANGE_POINT_DETECTORS[method](df)
+    runtime = time.perf_counter() - t0
+
+    found = true_steps = correct = detected = 0
+    for _, group_df in result_df.groupby("history_fingerprint"):
+        true_idx = np.flatnonzero(group_df["is_true_step"])
+        detected_idx = np.flatnonzero(group_df["is_step"])
+        true_steps += len(true_idx)
+        detected += len(detected_idx)
+        found += sum(np.abs(detected_idx - i).min(initial=3) <= 2 for i in true_idx)
+        correct += sum(np.abs(true_idx - i).min(initial=3) <= 2 for i in detected_idx)
+    recall = found / true_steps
+    precision = correct / max(detected, 1)
+
+    log.info(
+        "%s: %.3f s, recall: %.2f, precision: %.2f",
+        method,
+        runtime,
+        recall,
+        precision,
+    )
+    record_property("runtime_s", runtime)
+    record_property("recall", recall)
+    record_property("precision", precision)
+    floor = _CHANGE_POINT_DETECTION_QUALITY_FLOORS[method]
+    assert recall >= floor
+    assert precision >= floor
+
+
+def _gen_histories_with_annotations(
+    n_groups: int, n_points_per_group: int, seed: int
+) -> pd.DataFrame:
+    df = _gen_histories(n_groups, n_points_per_group, seed)
+    rng = np.random.default_rng(seed)
+    # Two results per commit, and a few manually marked distribution changes.
+    df["timestamp"] = pd.to_datetime(df["timestamp"] // 2, unit="D")
+    df["change_annotations"] = [
+        {"begins_distribution_change": True} if r < 0.02 else None
+        for r in rng.random(len(df))
+    ]
+    return df
+
+
+@pytest.mark.parametrize("include_current_commit", [True, False])
+@pytest.mark.parametrize(
+    "n_groups, n_points_per_group", [(1, 1), (3, 2), (7, 150), (2, 1000)]
+)
+def test_rolling_stats_same_as_per_group(
+    n_groups, n_points_per_group, include_current_commit
+):
+    df = _gen_histories_with_annotations(n_groups, n_points_per_group, seed=n_groups)
+    expected = _add_rolling_stats_columns_per_group(df.copy(), include_current_commit)
+    result_df = _add_rolling_stats_columns_to_df(df.copy(), include_current_commit)
+
+    pd.testing.assert_frame_equal(result_df, expected, check_exact=False, rtol=1e-12)
+
+
+def test_rolling_stats_same_as_per_group_many_histories(record_property):
+    # 10^5 data points, across 5000 histories. Also report the runtimes (see
+    # the log, or the junit XML properties), without asserting on them.
+    df = _gen_histories_with_annotations(5000, 20, seed=1)
+
+    t0 = time.perf_counter()
+    expected = _add_rolling_stats_columns_per_group(df.copy(), False)
+    t_per_group = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    result_df = _add_rolling_stats_columns_to_df(df.copy(), False)
+    t_vectorized = time.perf_counter() - t0
+
+    log.info("per group: %.3f s, one pass: %.3f s", t_per_group, t_vectorized)
+    record_property("runtime_per_group_s", t_per_group)
+    record_property("runtime_one_pass_s", t_vectorized)
+
+    pd.testing.assert_frame_equal(result_df, expected, check_exact=False, rtol=1e-12)
+
+
 def test_set_z_scores_one_rep():
     """Results with one repetition should be z-scorable."""
     commits, _ = _fixtures.gen_fake_data()
@@ -402,3 +772,160 @@ def test_set_z_scores_one_rep():
         history_fingerprints=[br.history_fingerprint],
     )
     assert_equal_leeway(br.z_score, -2.121)
+
+
+def test_set_z_scores_memoized(monkeypatch):
+    """Distribution stats are served from memory until the history changes."""
+    commits, _ = _fixtures.gen_fake_data()
+
+    _fixtures.benchmark_result(name="m", results=[1], commit=commits["11111"])
+    _fixtures.benchmark_result(name="m", results=[2], commit=commits["22222"])
+    br = _fixtures.benchmark_result(name="m", results=[3], commit=commits["33333"])
+
+    calculated = []
+    calculate = conbench.entities.history._calculate_distribution_stats
+
+    def _calculate(commit_timestamps_by_id, history_fingerprints):
+        calculated.append(history_fingerprints)
+        return calculate(commit_timestamps_by_id, history_fingerprints)
+
+    monkeypatch.setattr(
+        conbench.entities.history, "_calculate_distribution_stats", _calculate
+    )
+
+    for _ in range(2):
+        set_z_scores(
+            contender_benchmark_results=[br],
+            baseline_commit=commits["22222"],
+            history_fingerprints=[br.history_fingerprint],
+        )
+        assert_equal_leeway(br.z_score, -2.121)
+    assert calculated == [[br.history_fingerprint]]
+
+    # A new result in the distribution.
+    _fixtures.benchmark_result(name="m", results=[1.5], commit=commits["11111"])
+    set_z_scores(
+        contender_benchmark_results=[br],
+        baseline_commit=commits["22222"],
+        history_fingerprints=[br.history_fingerprint],
+    )
+    assert len(calculated) == 2
+    assert br.z_score != pytest.approx(-2.121, abs=0.001)
+
+
+def test_set_z_scores_reads_z_score_inputs(monkeypatch):
+    """Stored z-score inputs are used until a result in the distribution changes."""
+    commits, _ = _fixtures.gen_fake_data()
+
+    _fixtures.benchmark_result(name="zi", results=[1], commit=commits["11111"])
+    baseline = _fixtures.benchmark_result(
+        name="zi", results=[2], commit=commits["22222"]
+    )
+    br = _fixtures.benchmark_result(name="zi", results=[3], commit=commits["33333"])
+
+    store_z_score_inputs(baseline)
+    row = Session.scalars(
+        s.select(ZScoreInputs).where(
+            ZScoreInputs.history_fingerprint == br.history_fingerprint
+        )
+    ).one()
+    assert row.baseline_commit_id == commits["22222"].id
+    assert row.n == 2
+    assert_equal_leeway(row.dist_mean, 1.5)
+
+    calculated = []
+    calculate = conbench.entities.history._calculate_distribution_stats
+
+    def _calculate(commit_timestamps_by_id, history_fingerprints):
+        calculated.append(history_fingerprints)
+        return calculate(commit_timestamps_by_id, history_fingerprints)
+
+    monkeypatch.setattr(
+        conbench.entities.history, "_calculate_distribution_stats", _calculate
+    )
+    # Not from memory (e.g. another process).
+    conbench.entities.history._distribution_stats_cache.clear()
+
+    set_z_scores(
+        contender_benchmark_results=[br],
+        baseline_commit=commits["22222"],
+        history_fingerprints=[br.history_fingerprint],
+    )
+    assert_equal_leeway(br.z_score, -2.121)
+    assert calculated == []
+
+    # A new result in the distribution discards the stored inputs.
+    _fixtures.benchmark_result(name="zi", results=[1.5], commit=commits["11111"])
+    assert (
+        Session.scalars(
+            s.select(ZScoreInputs).where(
+                ZScoreInputs.history_fingerprint == br.history_fingerprint
+            )
+        ).all()
+        == []
+    )
+    conbench.entities.history._distribution_stats_cache.clear()
+    set_z_scores(
+        contender_benchmark_results=[br],
+        baseline_commit=commits["22222"],
+        history_fingerprints=[br.history_fingerprint],
+    )
+    assert calculated == [[br.history_fingerprint]]
+
+
+def test_set_z_scores_ignores_stale_z_score_inputs(monkeypatch):
+    """Stored z-score inputs from an older history version are not used."""
+    commits, _ = _fixtures.gen_fake_data()
+
+    baseline = _fixtures.benchmark_result(
+        name="zi", results=[2], commit=commits["22222"]
+    )
+    br = _fixtures.benchmark_result(name="zi", results=[3], commit=commits["33333"])
+    store_z_score_inputs(baseline)
+
+    # As if the row was written after a concurrent change of the history (and
+    # its invalidate()).
+    HistoryVersion.bump(br.history_fingerprint)
+    Session.commit()
+
+    calculated = []
+    calculate = conbench.entities.history._calculate_distribution_stats
+
+    def _calculate(commit_timestamps_by_id, history_fingerprints):
+        calculated.append(history_fingerprints)
+        return calculate(commit_timestamps_by_id, history_fingerprints)
+
+    monkeypatch.setattr(
+        conbench.entities.history, "_calculate_distribution_stats", _calculate
+    )
+    conbench.entities.history._distribution_stats_cache.clear()
+
+    set_z_scores(
+        contender_benchmark_results=[br],
+        baseline_commit=commits["22222"],
+        history_fingerprints=[br.history_fingerprint],
+    )
+    assert calculated == [[br.history_fingerprint]]
+
+
+def test_history_sketch_at_ingest():
+    """Results are only added to existing sketches, and never fail because of them."""
+    br = _fixtures.benchmark_result(name="sketch", results=[1])
+    fp = br.history_fingerprint
+    # Not built at ingest, but when needed.
+    assert HistorySketch.get(fp) is None
+    assert get_history_sketch(fp).count == 1
+
+    _fixtures.benchmark_result(name="sketch", results=[2])
+    assert HistorySketch.get(fp).count == 2
+
+    # A corrupt sketch is deleted (and rebuilt when needed).
+    Session.execute(
+        s.update(HistorySketch)
+        .where(HistorySketch.history_fingerprint == fp)
+        .values(digest=b"corrupt")
+    )
+    Session.commit()
+    _fixtures.benchmark_result(name="sketch", results=[3])
+    assert HistorySketch.get(fp) is None
+    assert get_history_sketch(fp).count == 3
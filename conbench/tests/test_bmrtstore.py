@@ -0,0 +1,150 @@
+import sys
+
+import numpy as np
+
+import conbench.bmrtsnapshot
+from conbench.bmrtstore import (
+    CATEGORICAL_COLUMNS,
+    BMRTStore,
+    BMRTStoreBuilder,
+    approx_sizeof_items,
+    deep_sizeof,
+)
+
+
+def _build(rows):
+    builder = BMRTStoreBuilder()
+    for rid, started_at, bname, case_id, data in rows:
+        cats = {c: "x" for c in CATEGORICAL_COLUMNS}
+        cats.update(benchmark_name=bname, case_id=case_id)
+        builder.append(
+            id=rid,
+            started_at=started_at,
+            svs=float(np.mean(data)),
+            data=data,
+            n_nonnull_samples=len(data),
+            case_dict={"name": bname},
+            case_text_id=case_id,
+            context_dict={},
+            **cats,
+        )
+    return builder.build()
+
+
+def test_build_and_lookup():
+    store = _build(
+        [
+            ("b", 2.0, "bench1", "c1", [1.0, 2.0]),
+            ("a", 1.0, "bench2", "c2", [3.0]),
+        ]
+    )
+    assert len(store) == 2
+    # Rows are sorted by ID.
+    assert store.result(0).id == "a"
+    assert list(store.samples_for_row(store.row_for_id("b"))) == [1.0, 2.0]
+    assert store.row_for_id("nope") is None
+    assert store.result(1).benchmark_name == "bench1"
+    assert len(BMRTStore.empty()) == 0
+
+
+def test_take_concat_and_group_index():
+    s1 = _build(
+        [
+            ("a", 1.0, "bench1", "c1", [1.0]),
+            ("b", 3.0, "bench1", "c1", [2.0, 2.5]),
+        ]
+    )
+    s2 = _build([("c", 2.0, "bench1", "c9", [4.0, 5.0, 6.0])])
+
+    merged = BMRTStore.concat(s1.take(np.array([1])), s2)
+    assert [merged.result(i).id for i in range(len(merged))] == ["b", "c"]
+    assert list(merged.samples_for_row(1)) == [4.0, 5.0, 6.0]
+
+    merged = BMRTStore.concat(s1, s2)
+    idx = merged.group_index("benchmark_name")
+    # Newest first within each group.
+    assert [r.id for r in idx["bench1"]] == ["b", "c", "a"]
+    by_case = idx["bench1"].split_by("case_id")
+    assert sorted(by_case) == ["c1", "c9"]
+    assert [r.id for r in by_case["c1"]] == ["b", "a"]
+
+
+def test_snapshot_generations(tmp_path):
+    store = _build(
+        [
+            ("a", 1.0, "bench1", "c1", [1.0, 2.0]),
+            ("b", 2.0, "bench2", "c2", [3.0]),
+        ]
+    )
+    rootdir = str(tmp_path)
+    assert conbench.bmrtsnapshot.newest_generation(rootdir) is None
+
+    for _ in range(conbench.bmrtsnapshot.BMRT_SNAPSHOT_KEEP_GENERATIONS + 2):
+        gen = conbench.bmrtsnapshot.write_generation(rootdir, store)
+
+    gens = conbench.bmrtsnapshot.list_generations(rootdir)
+    assert gens[-1] == gen
+    assert len(gens) == conbench.bmrtsnapshot.BMRT_SNAPSHOT_KEEP_GENERATIONS
+
+    loaded = conbench.bmrtsnapshot.load_generation(rootdir, gen)
+    assert isinstance(loaded.samples, np.memmap)
+    assert loaded.row_for_id("b") == 1
+    assert list(loaded.samples_for_row(0)) == [1.0, 2.0]
+    assert loaded.result(1).benchmark_name == "bench2"
+    assert loaded.result(0).case_dict == {"name": "bench1"}
+
+
+def test_builder_intern_and_dedup_ratios():
+    builder = BMRTStoreBuilder()
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return {"foo": "bar"}
+
+    objs = [builder.intern("case", "c1", factory) for _ in range(4)]
+    assert len(calls) == 1
+    assert all(o is objs[0] for o in objs)
+
+    builder.intern("case", "c2", factory)
+    assert builder.dedup_ratios()["case"] == 5 / 2
+
+
+def test_timeseries_frame():
+    store = _build(
+        [
+            ("a", 3.0, "bench1", "c1", [1.0]),
+            ("b", 1.0, "bench1", "c1", [2.0]),
+            ("c", 2.0, "bench2", "c2", [3.0]),
+            ("d", 0.5, "bench1", "c3", [4.0]),
+        ]
+    )
+    frame = store.series_frame("benchmark_name", "case_id")
+    assert len(frame) == 3
+    assert frame.keys == [("bench1", "c1"), ("bench1", "c3"), ("bench2", "c2")]
+
+    # Oldest first within a series.
+    t, svs = frame.series(("bench1", "c1"))
+    assert list(t) == [1.0, 3.0]
+    assert list(svs) == [2.0, 1.0]
+    assert np.shares_memory(svs, frame.svs)
+
+    assert frame.series_range_for("bench1") == (0, 2)
+    assert frame.series_range_for("nope") == (0, 0)
+    assert list(frame.to_tsdf(("bench2", "c2"))["svs"]) == [3.0]
+
+
+def test_approx_nbytes():
+    store = _build(
+        [(f"{i:04d}", float(i), f"b{i % 3}", "c1", [1.0]) for i in range(50)]
+    )
+    assert store.approx_nbytes() > 0
+    assert store.approx_object_nbytes() > 0
+    assert store.group_index("benchmark_name").approx_nbytes() > 0
+    assert store.series_frame("benchmark_name").approx_nbytes() > 0
+
+    # Sampling: extrapolate from evenly spaced items.
+    items = ["x" * 10] * 1000
+    assert approx_sizeof_items(items) == 1000 * sys.getsizeof(items[0])
+    assert approx_sizeof_items([]) == 0
+    assert deep_sizeof({"a": [1]}) > sys.getsizeof({"a": [1]})
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from conbench.bmrtstore import CATEGORICAL_COLUMNS, BMRTStoreBuilder
+from conbench.bmrttrends import build_trend_table
+
+T4_COLUMNS = ("benchmark_name", "case_id", "context_id", "hardware_checksum")
+DAY = 86400.0
+
+
+def _build_frame(series):
+    """
+    `series`: dict (benchmark name, case ID) -> list of (started_at, svs).
+    """
+    builder = BMRTStoreBuilder()
+    for (bname, case_id), points in series.items():
+        for i, (started_at, svs) in enumerate(points):
+            cats = {c: "x" for c in CATEGORICAL_COLUMNS}
+            cats.update(benchmark_name=bname, case_id=case_id)
+            builder.append(
+                id=f"{bname}-{case_id}-{i:04d}",
+                started_at=started_at,
+                svs=svs,
+                data=[svs],
+                n_nonnull_samples=1,
+                case_dict={"name": bname},
+                case_text_id=case_id,
+                context_dict={},
+                **cats,
+            )
+    return builder.build().series_frame(*T4_COLUMNS)
+
+
+def test_trend_table():
+    t = np.arange(20) * DAY
+    rng = np.random.default_rng(1)
+    noise = rng.normal(0, 0.01, len(t))
+    series = {
+        ("bench1", "up"): list(zip(t, 1.0 + 0.1 * t / DAY + noise)),
+        ("bench1", "down"): list(zip(t, 5.0 - 0.1 * t / DAY + noise)),
+        ("bench1", "flat"): list(zip(t, 3.0 + noise)),
+        # Too few data points.
+        ("bench1", "short"): list(zip(t[:5], [1.0, 2.0, 3.0, 4.0, 5.0])),
+        # Not recent: newest result 60 days older than the newest result for
+        # this benchmark name.
+        ("bench1", "old"): list(zip(t - 80 * DAY, 1.0 + t / DAY)),
+        # Recency is per benchmark name.
+        ("bench2", "old"): list(zip(t - 80 * DAY, 2.0 - 0.1 * t / DAY)),
+    }
+    frame = _build_frame(series)
+    trends = build_trend_table(frame)
+
+    def case_ids(rows):
+        return [frame.keys[trends.series[r]][1] for r in rows]
+
+    assert len(trends) == 4
+    assert case_ids(trends.top(10, "increasing", "bench1")) == ["up", "flat", "down"]
+    assert case_ids(trends.top(1, "decreasing", "bench1")) == ["down"]
+    assert case_ids(trends.top(2, "absolute", "bench1")) == ["up", "down"]
+    assert len(trends.top(10, "increasing", "nope")) == 0
+    assert [frame.keys[trends.series[r]][:2] for r in trends.top(2, "decreasing")] == [
+        ("bench2", "old"),
+        ("bench1", "down"),
+    ]
+
+    # Same result as a fit of the individual series.
+    r = trends.top(1, "increasing", "bench1")[0]
+    ts, ys = zip(*series[("bench1", "up")])
+    fit = np.polynomial.Polynomial.fit(ts, ys, 1)
+    ordinate, slope = fit.coef
+    assert trends.slope[r] == pytest.approx(slope)
+    assert trends.ordinate[r] == pytest.approx(ordinate)
+    assert trends.relchange[r] == pytest.approx(slope / ordinate)
+    assert trends.n_points[r] == 20
+    assert trends.r_squared[r] > 0.99
+    assert trends.r_squared[trends.top(1, "increasing", "bench1")[0] + 1] < 0.5
+
+
+def test_trend_table_empty():
+    trends = build_trend_table(_build_frame({}))
+    assert len(trends) == 0
+    assert len(trends.top(10, "absolute")) == 0
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from conbench.quantilesketch import TDigest
+
+QS = [0.001, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 0.999]
+
+
+def _rank_errors(digest: TDigest, values: np.ndarray) -> np.ndarray:
+    estimates = digest.quantiles(QS)
+    return np.abs(np.searchsorted(np.sort(values), estimates) / len(values) - QS)
+
+
+def test_exact_for_small_inputs():
+    values = np.random.default_rng(1).lognormal(size=50)
+    digest = TDigest.of(values)
+    assert digest.count == 50
+    assert len(digest.means) == 50
+    np.testing.assert_allclose(digest.quantiles(QS), np.quantile(values, QS))
+    assert digest.quantile(0) == values.min()
+    assert digest.quantile(1) == values.max()
+
+
+def test_accuracy_and_size():
+    values = np.random.default_rng(2).lognormal(size=100000)
+    digest = TDigest.of(values)
+    assert digest.count == 100000
+    assert len(digest.means) <= digest.compression // 2 + 1
+    assert _rank_errors(digest, values).max() < 0.001
+
+    # Incremental updates and merges are less accurate, but still good.
+    incremental = TDigest()
+    for value in values[:3000]:
+        incremental.update([value])
+    assert incremental.count == 3000
+    assert _rank_errors(incremental, values[:3000]).max() < 0.01
+
+    merged = TDigest.of(values[:50000])
+    merged.merge(TDigest.of(values[50000:]))
+    assert merged.count == 100000
+    assert _rank_errors(merged, values).max() < 0.001
+
+
+def test_serialization():
+    digest = TDigest.of(np.random.default_rng(3).normal(size=10000))
+    buf = digest.to_bytes()
+    assert len(buf) < 2000
+
+    restored = TDigest.from_bytes(buf)
+    assert (restored.min, restored.max, restored.count) == (
+        digest.min,
+        digest.max,
+        digest.count,
+    )
+    np.testing.assert_array_equal(restored.quantiles(QS), digest.quantiles(QS))
+
+    restored.update([100.0])
+    assert restored.count == 10001
+    assert restored.quantile(1) == 100.0
+
+    with pytest.raises(ValueError, match="unsupported t-digest format version"):
+        TDigest.from_bytes(b"\x02" + buf[1:])
+
+
+def test_empty_and_nan():
+    digest = TDigest.of([np.nan])
+    assert digest.count == 0
+    assert np.isnan(digest.quantile(0.5))
+
+    digest.update([2.0, np.nan, 1.0])
+    assert digest.count == 2
+    assert digest.quantile(0.5) == 1.5
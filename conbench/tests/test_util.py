@@ -4,6 +4,7 @@ from typing import Tuple
 import pytest
 
 import conbench.util
+from conbench.cachetools import BoundedLRUCache
 
 
 @pytest.mark.parametrize(
@@ -44,3 +45,29 @@ def test_tznaive_iso8601_to_tzaware_dt(teststring: str):
 )
 def test_tznaive_dt_to_aware_iso8601_for_api(param: Tuple[datetime, str]):
     assert conbench.util.tznaive_dt_to_aware_iso8601_for_api(param[0]) == param[1]
+
+
+def test_bounded_lru_cache():
+    cache: BoundedLRUCache[int] = BoundedLRUCache(maxsize=2)
+    assert cache.get_or_compute("a", lambda: 1) == (1, False)
+    assert cache.get_or_compute("a", lambda: 2) == (1, True)
+    cache.get_or_compute("b", lambda: 3)
+    # Use "a", so that "b" is the least recently used entry.
+    cache.get_or_compute("a", lambda: 4)
+    cache.get_or_compute("c", lambda: 5)
+    assert len(cache) == 2
+    assert cache.get_or_compute("b", lambda: 6) == (6, False)
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_bounded_lru_cache_get_put():
+    cache: BoundedLRUCache[int] = BoundedLRUCache(maxsize=2)
+    assert cache.get("a") is None
+    cache.put("a", 1)
+    cache.put("b", 2)
+    # Use "a", so that "b" is the least recently used entry.
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get_or_compute("c", lambda: 4) == (3, True)
@@ -0,0 +1,82 @@
+"""commit_ancestry table
+
+Revision ID: 3b8f0c52d1e9
+Revises: e7b2d94c1f06
+Create Date: 2026-10-18 20:12:37.415520
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3b8f0c52d1e9"
+down_revision = "e7b2d94c1f06"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "commit_ancestry",
+        sa.Column("commit_id", sa.String(length=50), nullable=False),
+        sa.Column("repository", sa.String(length=300), nullable=False),
+        sa.Column("branch", sa.String(length=510), nullable=True),
+        sa.Column("fork_point_sha", sa.String(length=50), nullable=True),
+        sa.Column("timestamp", sa.DateTime(timezone=False), nullable=False),
+        sa.Column("position", sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(["commit_id"], ["commit.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("commit_id"),
+    )
+    op.create_index(
+        "commit_ancestry_lineage_position_index",
+        "commit_ancestry",
+        ["repository", "branch", "fork_point_sha", "position"],
+        unique=False,
+    )
+    op.create_index(
+        "commit_ancestry_lineage_timestamp_index",
+        "commit_ancestry",
+        ["repository", "branch", "fork_point_sha", "timestamp"],
+        unique=False,
+    )
+
+    # Number the existing commits (see conbench.entities.commit_ancestry): the
+    # default branch lineage of each repository, and the lineages of
+    # non-default branches (by fork point).
+    op.execute(
+        """
+        INSERT INTO commit_ancestry
+            (commit_id, repository, branch, fork_point_sha, timestamp, position)
+        SELECT id, repository, NULL, NULL, timestamp,
+            dense_rank() OVER (PARTITION BY repository ORDER BY timestamp)
+        FROM commit
+        WHERE sha = fork_point_sha AND timestamp IS NOT NULL
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO commit_ancestry
+            (commit_id, repository, branch, fork_point_sha, timestamp, position)
+        SELECT id, repository, branch, fork_point_sha, timestamp,
+            dense_rank() OVER (
+                PARTITION BY repository, branch, fork_point_sha ORDER BY timestamp
+            )
+        FROM commit
+        WHERE sha != fork_point_sha
+            AND fork_point_sha != ''
+            AND branch IS NOT NULL
+            AND branch != ''
+            AND timestamp IS NOT NULL
+        """
+    )
+
+
+def downgrade():
+    op.drop_index(
+        "commit_ancestry_lineage_timestamp_index", table_name="commit_ancestry"
+    )
+    op.drop_index(
+        "commit_ancestry_lineage_position_index", table_name="commit_ancestry"
+    )
+    op.drop_table("commit_ancestry")
@@ -0,0 +1,54 @@
+"""history_stats table
+
+Revision ID: 5c2e8a1f7b3d
+Revises: b8a3e65efb9d
+Create Date: 2026-10-18 10:12:41.318210
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5c2e8a1f7b3d"
+down_revision = "b8a3e65efb9d"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The table starts out empty: rows are calculated upon first use of a
+    # history.
+    op.create_table(
+        "history_stats",
+        sa.Column("benchmark_result_id", sa.String(length=50), nullable=False),
+        sa.Column("history_fingerprint", sa.Text(), nullable=False),
+        sa.Column("commit_id", sa.String(length=50), nullable=False),
+        sa.Column("distribution_commits", sa.Integer(), nullable=False),
+        sa.Column("begins_distribution_change", sa.Boolean(), nullable=False),
+        sa.Column("segment_id", sa.Float(), nullable=False),
+        sa.Column("is_outlier", sa.Boolean(), nullable=False),
+        sa.Column("rolling_mean_excluding_this_commit", sa.Float(), nullable=True),
+        sa.Column("rolling_mean", sa.Float(), nullable=True),
+        sa.Column("residual", sa.Float(), nullable=True),
+        sa.Column("rolling_stddev", sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["benchmark_result_id"], ["benchmark_result.id"], ondelete="CASCADE"
+        ),
+        sa.ForeignKeyConstraint(["commit_id"], ["commit.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("benchmark_result_id"),
+    )
+    op.create_index(
+        "history_stats_history_fingerprint_commit_id_index",
+        "history_stats",
+        ["history_fingerprint", "commit_id"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index(
+        "history_stats_history_fingerprint_commit_id_index",
+        table_name="history_stats",
+    )
+    op.drop_table("history_stats")
@@ -0,0 +1,42 @@
+"""z_score_inputs table
+
+Revision ID: 8d41a7c3e5f2
+Revises: 3b8f0c52d1e9
+Create Date: 2026-10-18 21:47:05.118302
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8d41a7c3e5f2"
+down_revision = "3b8f0c52d1e9"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "z_score_inputs",
+        sa.Column("history_fingerprint", sa.Text(), nullable=False),
+        sa.Column("baseline_commit_id", sa.String(length=50), nullable=False),
+        sa.Column("ancestry_digest", sa.Text(), nullable=False),
+        sa.Column(
+            "latest_ancestor_timestamp", sa.DateTime(timezone=False), nullable=False
+        ),
+        sa.Column("distribution_commits", sa.Integer(), nullable=False),
+        sa.Column("svs_type", sa.Text(), nullable=False),
+        sa.Column("change_point_detection", sa.Text(), nullable=False),
+        sa.Column("dist_mean", sa.Float(), nullable=True),
+        sa.Column("dist_stddev", sa.Float(), nullable=True),
+        sa.Column("n", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["baseline_commit_id"], ["commit.id"], ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("history_fingerprint", "baseline_commit_id"),
+    )
+
+
+def downgrade():
+    op.drop_table("z_score_inputs")
@@ -0,0 +1,30 @@
+"""history_version table
+
+Revision ID: 9d41c6e0a2b7
+Revises: 5c2e8a1f7b3d
+Create Date: 2026-10-18 14:37:05.902114
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9d41c6e0a2b7"
+down_revision = "5c2e8a1f7b3d"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The table starts out empty (all histories at version 0).
+    op.create_table(
+        "history_version",
+        sa.Column("history_fingerprint", sa.Text(), nullable=False),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("history_fingerprint"),
+    )
+
+
+def downgrade():
+    op.drop_table("history_version")
@@ -0,0 +1,30 @@
+"""z_score_inputs: history_version column
+
+Revision ID: a7d3e5b19c42
+Revises: f4a9c2d7e813
+Create Date: 2026-10-19 10:02:51.267340
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a7d3e5b19c42"
+down_revision = "f4a9c2d7e813"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # It is not known which history version the existing rows were calculated
+    # from. They are recalculated upon next use (or ingest).
+    op.execute("DELETE FROM z_score_inputs")
+    op.add_column(
+        "z_score_inputs",
+        sa.Column("history_version", sa.BigInteger(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_column("z_score_inputs", "history_version")
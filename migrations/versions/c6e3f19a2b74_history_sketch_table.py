@@ -0,0 +1,32 @@
+"""history_sketch table
+
+Revision ID: c6e3f19a2b74
+Revises: 8d41a7c3e5f2
+Create Date: 2026-10-18 23:05:41.602187
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c6e3f19a2b74"
+down_revision = "8d41a7c3e5f2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Sketches are built from the history when they are needed first (see
+    # conbench.entities.history.get_history_sketch()).
+    op.create_table(
+        "history_sketch",
+        sa.Column("history_fingerprint", sa.Text(), nullable=False),
+        sa.Column("svs_type", sa.Text(), nullable=False),
+        sa.Column("digest", sa.LargeBinary(), nullable=False),
+        sa.PrimaryKeyConstraint("history_fingerprint"),
+    )
+
+
+def downgrade():
+    op.drop_table("history_sketch")
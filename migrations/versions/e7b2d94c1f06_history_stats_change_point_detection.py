@@ -0,0 +1,35 @@
+"""history_stats: change_point_detection column
+
+Revision ID: e7b2d94c1f06
+Revises: 9d41c6e0a2b7
+Create Date: 2026-10-18 17:21:48.640337
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e7b2d94c1f06"
+down_revision = "9d41c6e0a2b7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing rows were calculated with the (then only) trimmed-estimators
+    # method.
+    op.add_column(
+        "history_stats",
+        sa.Column(
+            "change_point_detection",
+            sa.Text(),
+            nullable=False,
+            server_default="trimmed",
+        ),
+    )
+    op.alter_column("history_stats", "change_point_detection", server_default=None)
+
+
+def downgrade():
+    op.drop_column("history_stats", "change_point_detection")
@@ -0,0 +1,27 @@
+"""history_stats: svs_type column
+
+Revision ID: f4a9c2d7e813
+Revises: c6e3f19a2b74
+Create Date: 2026-10-19 09:14:27.503916
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "f4a9c2d7e813"
+down_revision = "c6e3f19a2b74"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # It is not known which SVS_TYPE the existing rows were calculated with.
+    # They are recalculated upon next use.
+    op.execute("DELETE FROM history_stats")
+    op.add_column("history_stats", sa.Column("svs_type", sa.Text(), nullable=False))
+
+
+def downgrade():
+    op.drop_column("history_stats", "svs_type")